@@ -14,10 +14,10 @@ THIS SOFTWARE IS PROVIDED BY THE COPYRIGHT HOLDERS AND CONTRIBUTORS "AS IS" AND
 """
 from .orm.EntityService import EntityService
 from .WaveUiServices import WaveUIServices
-from wave_common.utils import read_file, save_file
+from wave_common.utils import save_file
 
 class UiManager:
-    def __init__(self, db_config, output, template_path, saql_path, download, environment):
+    def __init__(self, db_config, output, template_path, saql_path, download, environment, debug=False, workers=1):
         self._db_conf = db_config
         self._entity_service = EntityService(self._db_conf)
         self.output = output
@@ -26,7 +26,8 @@ class UiManager:
         self.download = download
         self.environment = environment
 
-        self._wave_ui_service = WaveUIServices(self._db_conf, self.output, self.template_path, self.saql_path, self.environment)
+        self._wave_ui_service = WaveUIServices(self._db_conf, self.output, self.template_path, self.saql_path, self.environment,
+                                               debug, workers)
 
     def get_dashboards(self, env):
         """
@@ -43,7 +44,7 @@ class UiManager:
         :param dashboard_env:
         :return:
         """
-        template_name = self._wave_ui_service.execute(ds_name)
+        dashboard = self._wave_ui_service.generate(ds_name)
         dashboard_name = self._entity_service.get_dashboard_by_name(ds_name).display_name
 
         datasets = self._entity_service.get_datasets_by_env(dashboard_env)
@@ -51,7 +52,6 @@ class UiManager:
         for ds in datasets:
             data[ds.type] = ds.name
 
-        dashboard = read_file(template_name)
         for key, value in data.items():
             dashboard = dashboard.replace("%(" + key + ")s", value)
 
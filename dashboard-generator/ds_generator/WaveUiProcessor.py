@@ -62,6 +62,8 @@ class WaveUiProcessor:
         self.environment = parser.get('Wave_Config', 'environment')
         download = parser.get('Paths', 'download')
         output = parser.get('Paths', 'output')
+        debug = parser.getboolean('Paths', 'debug_artifacts', fallback=False)
+        workers = parser.getint('Paths', 'render_workers', fallback=1)
         self.download = download + "/" + self.environment
         self.output = output + "/" + self.environment
         
@@ -69,7 +71,7 @@ class WaveUiProcessor:
         self.login_config = LoginInfo('login', parser)
         self.wave_config = DashboardInfo(parser)
         self._ui_mgr = UiManager(self._db_conf, self.output, self.template_path, self.saql_path, self.download,
-                                 self.environment)
+                                 self.environment, debug, workers)
         self._entity_service = EntityService(self._db_conf)
         self.conn = WaveConnector(self.login_config, self.wave_config.authUrl, self.wave_config.resource_url)
         self.conn.login()
@@ -17,18 +17,45 @@ from ds_generator.Models import Property, Step, Widget, Container, Dashboard, Pa
 from ds_generator.orm.EntityService import EntityService
 from wave_common.utils import read_file, save_file, is_valid_json, exception_handler, Logger, filter_disabled
 from ds_generator.types import *
-from jinja2 import Template
+from jinja2 import BaseLoader, Environment
 import json
+import os
+from concurrent.futures import ThreadPoolExecutor
 from jsonweb.encode import dumper
 
+logger = Logger.logger
+LAYOUT_TEMPLATE = "widget_layout.json"
+
+
+class JsonTemplateLoader(BaseLoader):
+    """
+    Jinja loader that reads JSON/SAQL templates by file path; the Environment recompiles a template only when the
+    modification time of its file changes
+    """
+    def get_source(self, environment, template):
+        mtime = os.path.getmtime(template) if os.path.isfile(template) else None
+        source = read_file(template)
+
+        def uptodate():
+            return os.path.isfile(template) and os.path.getmtime(template) == mtime
+        return source, template, uptodate
+
+
+# process-wide cache of compiled templates, keyed by file path and checked against the file's mtime on each lookup;
+# variables are written as {_{ name }_} so that the literal {{ }} bindings Wave expects pass through untouched
+template_environment = Environment(loader=JsonTemplateLoader(), cache_size=-1, auto_reload=True,
+                                   variable_start_string='{_{', variable_end_string='}_}')
+
 
 class WaveUIServices:
-    def __init__(self, db_config, output, template_path, saql_path, env):
+    def __init__(self, db_config, output, template_path, saql_path, env, debug=False, workers=1):
         self._entity_service = EntityService(db_config)
         self.output = output
         self.template_path = template_path
         self.saql_path = saql_path
         self.environment = env
+        self.debug = debug
+        self.workers = workers
 
     def populate_model_from_database(self, ds_name):
         """
@@ -37,21 +64,7 @@ class WaveUIServices:
         :return page_list, display_name:
         """
         display_name = self._entity_service.get_dashboard_by_name(ds_name).display_name
-        page_list = self._entity_service.get_dashboard_pages(ds_name)
-        for page in page_list:
-            container_list = self._entity_service.get_page_containers(page.get_name())
-            page.add_containers(container_list)
-            for c in container_list:
-                widget_list = self._entity_service.get_container_widgets(c.get_name())
-                c.add_widgets(widget_list)
-                for w in widget_list:
-                    property_list = self._entity_service.get_widget_properties(w.get_name())
-                    step_list = self._entity_service.get_widget_steps(w.get_name())
-                    w.add_properties(property_list)
-                    w.add_steps(step_list)
-                    for p in step_list:
-                        step_properties = self._entity_service.get_step_properties(p.get_name())
-                        p.add_properties(step_properties)
+        page_list = self._entity_service.get_dashboard_tree(ds_name)
         return page_list, display_name
 
     def generate_metadata(self, page_list, display_name):
@@ -94,21 +107,49 @@ class WaveUIServices:
             json_content = dumper(dashboard_pages)
             save_file(self.output + "/" + display_name + "_dashboard_metadata.json", json_content)
 
+    @staticmethod
+    def metadata_from_model(page_list):
+        """
+        Method returns the metadata of a Dashboard as the list of dicts generate_metadata would write to file
+        :param page_list:
+        :return metadata:
+        """
+        def properties(property_list):
+            return [{KEY: p.get_key(), VAL: p.get_value()} for p in property_list]
+
+        metadata = []
+        for page in page_list:
+            containers = []
+            for container in page.get_containers():
+                widgets = []
+                for widget in container.get_widgets():
+                    steps = [{NAME: step.get_name(), DISP_NAME: step.get_display_name(), TYPE: step.get_type(),
+                              TEMPLATE: step.get_template(), PROPERTIES: properties(step.get_properties())}
+                             for step in widget.get_steps()]
+                    widgets.append({NAME: widget.get_name(), DISP_NAME: widget.get_display_name(),
+                                    FONT_SIZE: widget.get_font_size(), TEMPLATE: widget.get_template(),
+                                    TYPE: widget.get_type(), COLSPAN: widget.get_colspan(), COL: widget.get_column(),
+                                    ROW: widget.get_row(), ROWSPAN: widget.get_rowspan(),
+                                    PROPERTIES: properties(widget.get_properties()), STEPS: steps})
+                containers.append({NAME: container.get_name(), DISP_NAME: container.get_display_name(),
+                                   TEMPLATE: container.get_template(), COLSPAN: container.get_colspan(),
+                                   COL: container.get_column(), ROW: container.get_row(),
+                                   ROWSPAN: container.get_rowspan(), WIDGETS: widgets})
+            metadata.append({NAME: page.get_name(), DISP_NAME: page.get_display_name(), TEMPLATE: page.get_template(),
+                             CONTAINERS: containers})
+        return metadata
+
     @staticmethod
     def data_replacement_json(file_name, dataset):
         """
-        Method uses Jinja Templates to replace a set of values in provided JSON file and returns replaced JSON
+        Method uses Jinja Templates to replace a set of values in provided JSON file and returns replaced JSON; the
+        compiled template is cached in template_environment until the file changes
         :param file_name:
         :param dataset:
         :return json:
         """
-        template_file = read_file(file_name)
-        template_file = template_file.replace('\\', 'BACKSLASH').replace('{{', 'OPEN_BRACKET').replace('}}', 'CLOSE_BRACKET')
-        template_file = template_file.replace('{_{', '{{').replace('}_}', '}}')
-        template = Template(template_file)
-        json = template.render(dataset)
-        json = json.replace('BACKSLASH', '\\').replace('OPEN_BRACKET', '{{').replace('CLOSE_BRACKET', '}}')
-        return json
+        template = template_environment.get_template(file_name)
+        return template.render(dataset)
 
     # methods to generate sections of JSON
     def generate_page_json(self, name, display_name, template_file, widgets):
@@ -184,220 +225,269 @@ class WaveUIServices:
         :return json:
         """
         try:
-            file_name = self.template_path + "/widget_layout.json"
+            file_name = self.template_path + "/" + LAYOUT_TEMPLATE
             dataset = {COLSPAN: colspan, COL: column, NAME: name, ROW: row, ROWSPAN: rowspan, STYLE: style}
 
             return self.data_replacement_json(file_name, dataset)
         except Exception as e:
             exception_handler("", e)
 
-    def generate_dashboard_json(self, display_name, dashboard_name):
+    @staticmethod
+    def parse_fragment(fragment, template_file, members=False):
         """
-        Method returns generated layouts, widgets, and steps JSON from metadata
-        :param display_name:
+        Method parses JSON rendered from a template; widget, container and step templates render object members,
+        which are parsed as one object when members is set
+        :param fragment:
+        :param template_file:
+        :param members:
+        :return dict:
+        """
+        try:
+            return json.loads("{" + fragment + "}" if members else fragment)
+        except ValueError as e:
+            exception_handler("Template %s rendered invalid JSON" % template_file, e)
+
+    def render_members(self, template_file, dataset):
+        """
+        Method returns the widgets/steps rendered from the provided template and dataset as a dict
+        :param template_file:
+        :param dataset:
+        :return dict:
+        """
+        return self.parse_fragment(self.generate_widget_step_json(template_file, dataset), template_file, members=True)
+
+    def render_page(self, page, dashboard_name):
+        """
+        Method returns the layout page, widgets and steps of the dashboard state generated from the metadata of a
+        single Page
+        :param page:
         :param dashboard_name:
-        :return layouts, widgets, steps:
+        :return page_state, widgets, steps:
         """
         try:
-            #layouts = []
-            widgets = []
-            steps = []
-            pages = []
-            file_content = read_file(self.output + "/" + display_name + "_dashboard_metadata.json")
-            metadata = json.loads(file_content)
-            metadata.sort(key=lambda x: x[NAME].lower())
-
-            for p_index, page in enumerate(metadata):
-                layouts = []
-                p_name = page[NAME]
-                p_display = page[DISP_NAME]
-                p_template = page[TEMPLATE]
-                p_containers = page[CONTAINERS]
-
-                for c_index, container in enumerate(p_containers):
-                    c_name = container[NAME]
-                    c_template = container[TEMPLATE]
-                    c_widgets = container[WIDGETS]
-
-                    layouts.append(
-                        self.generate_layouts_json(c_name, container[COLSPAN], container[COL], container[ROW],
-                                                   container[ROWSPAN])
-                    )
-                    # add widget_properties
-                    for w_index, widget in enumerate(c_widgets):
-                        w_name = widget[NAME]
-                        w_display = widget[DISP_NAME]
-                        w_steps = widget[STEPS]
-                        w_properties = widget[PROPERTIES]
-                        w_type = widget[TYPE]
-                        w_template = widget[TEMPLATE]
-                        w_font = widget[FONT_SIZE]
-
-                        w_prop_dict = {}
-                        for wp_index, w_property in enumerate(w_properties):
-                            w_prop_dict[w_property[KEY]] = w_property[VAL]
-
-                        # generating static text widgets
-                        if w_type == STATIC_TEXT:
-                            text_widget_dataset = {NAME: w_name, TEXT: w_prop_dict[TEXT], FONT_SIZE: w_font,
-                                                   TEXT_CLR: w_prop_dict[TEXT_CLR], ALIGN: w_prop_dict[ALIGN]}
-                            widgets.append(
-                                self.generate_widget_step_json(w_template, text_widget_dataset)
-                            )
-
-                        # generating link widgets
-                        if w_type == LINK:
-                            link_widget_dataset = {NAME: w_name, DISP_NAME: w_display, URL: w_prop_dict[URL],
-                                                   DEST_TYPE: w_prop_dict[DEST_TYPE], FONT_SIZE: w_font,
-                                                   TEXT_CLR: w_prop_dict[TEXT_CLR], ALIGN: w_prop_dict[ALIGN],
-                                                   DASH_LINK: w_prop_dict[self.environment + "_" + DASH_LINK]}
-                            widgets.append(
-                                self.generate_widget_step_json(w_template, link_widget_dataset)
-                            )
-
-                        # generating navigation widgets
-                        if w_type == NAVIGATION:
-                            nav_widget_dataset = {NAME: w_name, DISP_NAME: w_display, FONT_SIZE: w_font}
-                            widgets.append(
-                                self.generate_widget_step_json(w_template, nav_widget_dataset)
-                            )
-
-                        for s_index, step in enumerate(w_steps):
-                            s_name = step[NAME]
-                            s_prop = step[PROPERTIES]
-                            s_type = step[TYPE]
-                            s_template = step[TEMPLATE]
-
-                            # generating listselector widgets
-                            if w_type == LISTSELECTOR:
-                                listselector_widget_dataset = {NAME: w_name, STEP_NAME: s_name, DISP_NAME: w_display}
-                                widgets.append(
-                                  self.generate_widget_step_json(w_template, listselector_widget_dataset)
-                                )
-
-                            if w_type == BAR_CHART:
-                                # generating chart widgets
-                                bar_chart_dataset = {NAME: w_name, STEP_NAME: s_name, BINS: w_prop_dict[BINS],
-                                                     AXIS_MODE: w_prop_dict[AXIS_MODE], VIS_TYPE: w_prop_dict[VIS_TYPE],
-                                                     CHART_TITLE: w_prop_dict[CHART_TITLE], TITLE_1: w_prop_dict[TITLE_1],
-                                                     SUM: w_prop_dict[SUM], SHOW_TITLE: w_prop_dict[SHOW_TITLE],
-                                                     SHOW_AXIS: w_prop_dict[SHOW_AXIS], SHOW_ACT: w_prop_dict[SHOW_ACT],
-                                                     FONT_SIZE: w_font, COL_MAP: w_prop_dict[COL_MAP],
-                                                     SHOW_LGND: w_prop_dict[SHOW_LGND]}
-                                widgets.append(
-                                    self.generate_widget_step_json(w_template, bar_chart_dataset)
-                                )
-                            if w_type == LINE_CHART:
-                                # generating line chart widgets
-                                line_chart_dataset = {NAME: w_name, STEP_NAME: s_name, AXIS_MODE: w_prop_dict[AXIS_MODE],
-                                                      VIS_TYPE: w_prop_dict[VIS_TYPE], MEASURE: w_prop_dict[MEASURE],
-                                                      SHOW_DASH: w_prop_dict[SHOW_DASH], FILL_AREA: w_prop_dict[FILL_AREA],
+            layouts = []
+            widgets = {}
+            steps = {}
+            p_name = page[NAME]
+            p_display = page[DISP_NAME]
+            p_template = page[TEMPLATE]
+            p_containers = page[CONTAINERS]
+
+            for c_index, container in enumerate(p_containers):
+                c_name = container[NAME]
+                c_template = container[TEMPLATE]
+                c_widgets = container[WIDGETS]
+
+                layouts.append(self.parse_fragment(
+                    self.generate_layouts_json(c_name, container[COLSPAN], container[COL], container[ROW],
+                                               container[ROWSPAN]), LAYOUT_TEMPLATE))
+                # add widget_properties
+                for w_index, widget in enumerate(c_widgets):
+                    w_name = widget[NAME]
+                    w_display = widget[DISP_NAME]
+                    w_steps = widget[STEPS]
+                    w_properties = widget[PROPERTIES]
+                    w_type = widget[TYPE]
+                    w_template = widget[TEMPLATE]
+                    w_font = widget[FONT_SIZE]
+
+                    w_prop_dict = {}
+                    for wp_index, w_property in enumerate(w_properties):
+                        w_prop_dict[w_property[KEY]] = w_property[VAL]
+
+                    # generating static text widgets
+                    if w_type == STATIC_TEXT:
+                        text_widget_dataset = {NAME: w_name, TEXT: w_prop_dict[TEXT], FONT_SIZE: w_font,
+                                               TEXT_CLR: w_prop_dict[TEXT_CLR], ALIGN: w_prop_dict[ALIGN]}
+                        widgets.update(self.render_members(w_template, text_widget_dataset))
+
+                    # generating link widgets
+                    if w_type == LINK:
+                        link_widget_dataset = {NAME: w_name, DISP_NAME: w_display, URL: w_prop_dict[URL],
+                                               DEST_TYPE: w_prop_dict[DEST_TYPE], FONT_SIZE: w_font,
+                                               TEXT_CLR: w_prop_dict[TEXT_CLR], ALIGN: w_prop_dict[ALIGN],
+                                               DASH_LINK: w_prop_dict[self.environment + "_" + DASH_LINK]}
+                        widgets.update(self.render_members(w_template, link_widget_dataset))
+
+                    # generating navigation widgets
+                    if w_type == NAVIGATION:
+                        nav_widget_dataset = {NAME: w_name, DISP_NAME: w_display, FONT_SIZE: w_font}
+                        widgets.update(self.render_members(w_template, nav_widget_dataset))
+
+                    for s_index, step in enumerate(w_steps):
+                        s_name = step[NAME]
+                        s_prop = step[PROPERTIES]
+                        s_type = step[TYPE]
+                        s_template = step[TEMPLATE]
+
+                        # generating listselector widgets
+                        if w_type == LISTSELECTOR:
+                            listselector_widget_dataset = {NAME: w_name, STEP_NAME: s_name, DISP_NAME: w_display}
+                            widgets.update(self.render_members(w_template, listselector_widget_dataset))
+
+                        if w_type == BAR_CHART:
+                            # generating chart widgets
+                            bar_chart_dataset = {NAME: w_name, STEP_NAME: s_name, BINS: w_prop_dict[BINS],
+                                                 AXIS_MODE: w_prop_dict[AXIS_MODE], VIS_TYPE: w_prop_dict[VIS_TYPE],
+                                                 CHART_TITLE: w_prop_dict[CHART_TITLE], TITLE_1: w_prop_dict[TITLE_1],
+                                                 SUM: w_prop_dict[SUM], SHOW_TITLE: w_prop_dict[SHOW_TITLE],
+                                                 SHOW_AXIS: w_prop_dict[SHOW_AXIS], SHOW_ACT: w_prop_dict[SHOW_ACT],
+                                                 FONT_SIZE: w_font, COL_MAP: w_prop_dict[COL_MAP],
+                                                 SHOW_LGND: w_prop_dict[SHOW_LGND]}
+                            widgets.update(self.render_members(w_template, bar_chart_dataset))
+                        if w_type == LINE_CHART:
+                            # generating line chart widgets
+                            line_chart_dataset = {NAME: w_name, STEP_NAME: s_name, AXIS_MODE: w_prop_dict[AXIS_MODE],
+                                                  VIS_TYPE: w_prop_dict[VIS_TYPE], MEASURE: w_prop_dict[MEASURE],
+                                                  SHOW_DASH: w_prop_dict[SHOW_DASH], FILL_AREA: w_prop_dict[FILL_AREA],
+                                                  CHART_TITLE: w_prop_dict[CHART_TITLE], TITLE_1: w_prop_dict[TITLE_1],
+                                                  SHOW_TITLE: w_prop_dict[SHOW_TITLE], SHOW_AXIS: w_prop_dict[SHOW_AXIS],
+                                                  SHOW_ACT: w_prop_dict[SHOW_ACT], SHOW_LGND: w_prop_dict[SHOW_LGND],
+                                                  SHOW_ZERO: w_prop_dict[SHOW_ZERO], FONT_SIZE: w_font}
+                            widgets.update(self.render_members(w_template, line_chart_dataset))
+
+                        if s_type == CHART:
+                            ch_prop_dict = {}
+                            for ch_index, ch_property in enumerate(s_prop):
+                                ch_prop_dict[ch_property[KEY]] = ch_property[VAL]
+
+                            saql_json = self.saql_path + "/" + dashboard_name + "/" + ch_prop_dict[SAQL_NAME]
+                            saql_json = read_file(saql_json)
+                            saql_json = json.dumps(saql_json).strip('"')
+                            # generation of chart steps
+                            if w_type == BAR_CHART or w_type == LINE_CHART:
+                                chart_step_dataset = {STEP_NAME: s_name, SAQL_QUERY: saql_json,
+                                                      AXIS_MODE: w_prop_dict[AXIS_MODE], VIS_TYPE: w_prop_dict[VIS_TYPE],
                                                       CHART_TITLE: w_prop_dict[CHART_TITLE], TITLE_1: w_prop_dict[TITLE_1],
                                                       SHOW_TITLE: w_prop_dict[SHOW_TITLE], SHOW_AXIS: w_prop_dict[SHOW_AXIS],
-                                                      SHOW_ACT: w_prop_dict[SHOW_ACT], SHOW_LGND: w_prop_dict[SHOW_LGND],
-                                                      SHOW_ZERO: w_prop_dict[SHOW_ZERO], FONT_SIZE: w_font}
-                                widgets.append(
-                                    self.generate_widget_step_json(w_template, line_chart_dataset)
-                                )
-
-                            if s_type == CHART:
-                                ch_prop_dict = {}
-                                for ch_index, ch_property in enumerate(s_prop):
-                                    ch_prop_dict[ch_property[KEY]] = ch_property[VAL]
-
-                                saql_json = self.saql_path + "/" + dashboard_name + "/" + ch_prop_dict[SAQL_NAME]
-                                saql_json = read_file(saql_json)
-                                saql_json = json.dumps(saql_json).strip('"')
-                                # generation of chart steps
-                                if w_type == BAR_CHART or w_type == LINE_CHART:
-                                    chart_step_dataset = {STEP_NAME: s_name, SAQL_QUERY: saql_json,
-                                                          AXIS_MODE: w_prop_dict[AXIS_MODE], VIS_TYPE: w_prop_dict[VIS_TYPE],
-                                                          CHART_TITLE: w_prop_dict[CHART_TITLE], TITLE_1: w_prop_dict[TITLE_1],
-                                                          SHOW_TITLE: w_prop_dict[SHOW_TITLE], SHOW_AXIS: w_prop_dict[SHOW_AXIS],
-                                                          SHOW_ACT: w_prop_dict[SHOW_ACT], FONT_SIZE: w_font,
-                                                          SHOW_LGND: w_prop_dict[SHOW_LGND]}
-                                else:
-                                    chart_step_dataset = {STEP_NAME: s_name, SAQL_QUERY: saql_json}
-
-                                steps.append(
-                                    self.generate_widget_step_json(s_template, chart_step_dataset)
-                                )
-
-                                # generation of cost bucket/MoM calculations
-                                if w_type == DYN_TEXT:
-                                    dyn_text_dataset = {NAME: w_name, STEP_NAME: s_name, VAR: ch_prop_dict[VAR],
-                                                        FONT_SIZE: w_font}
-                                    widgets.append(
-                                        self.generate_widget_step_json(w_template, dyn_text_dataset)
-                                    )
-
-                                if w_type == NUM:
-                                    num_dataset = {NAME: w_name, STEP_NAME: s_name, VAR: ch_prop_dict[VAR],
-                                                   COMPACT: ch_prop_dict[COMPACT], FONT_SIZE: w_font}
-                                    widgets.append(
-                                        self.generate_widget_step_json(w_template, num_dataset)
-                                    )
-
-                            # for dropdown/filtering steps
+                                                      SHOW_ACT: w_prop_dict[SHOW_ACT], FONT_SIZE: w_font,
+                                                      SHOW_LGND: w_prop_dict[SHOW_LGND]}
                             else:
-                                s_prop_dict = {}
-                                for p_index, property in enumerate(s_prop):
-                                    s_prop_dict[property[KEY]] = property[VAL]
-                                saql_json = self.generate_saql_step_json(dashboard_name, s_prop_dict[SAQL_NAME],
-                                                                                      s_prop_dict[GROUP])
-                                saql_json = json.dumps(saql_json).strip('"')
-                                listselector_step_dataset = {STEP_NAME: s_name, GROUP: s_prop_dict[GROUP], SAQL_QUERY: saql_json,
-                                                             SELECT_MODE: s_prop_dict[SELECT_MODE]}
-                                steps.append(
-                                    self.generate_widget_step_json(s_template, listselector_step_dataset)
-                                )
-
-                        layouts.append(
-                            self.generate_layouts_json(w_name, widget[COLSPAN], widget[COL], widget[ROW],
-                                                       widget[ROWSPAN], w_prop_dict.get(STYLE, ""))
-                        )
-                    widgets.append(
-                        self.generate_container_json(c_template, c_name)
-                    )
-
-                layouts = ",".join(layouts)
-
-                pages.append(
-                    self.generate_page_json(p_name, p_display, p_template, layouts)
-                )
-
-            widgets = ",".join(widgets)
-            steps = ",".join(steps)
-            pages = ",".join(pages)
-
-            return pages, widgets, steps
+                                chart_step_dataset = {STEP_NAME: s_name, SAQL_QUERY: saql_json}
+
+                            steps.update(self.render_members(s_template, chart_step_dataset))
+
+                            # generation of cost bucket/MoM calculations
+                            if w_type == DYN_TEXT:
+                                dyn_text_dataset = {NAME: w_name, STEP_NAME: s_name, VAR: ch_prop_dict[VAR],
+                                                    FONT_SIZE: w_font}
+                                widgets.update(self.render_members(w_template, dyn_text_dataset))
+
+                            if w_type == NUM:
+                                num_dataset = {NAME: w_name, STEP_NAME: s_name, VAR: ch_prop_dict[VAR],
+                                               COMPACT: ch_prop_dict[COMPACT], FONT_SIZE: w_font}
+                                widgets.update(self.render_members(w_template, num_dataset))
+
+                        # for dropdown/filtering steps
+                        else:
+                            s_prop_dict = {}
+                            for p_index, property in enumerate(s_prop):
+                                s_prop_dict[property[KEY]] = property[VAL]
+                            saql_json = self.generate_saql_step_json(dashboard_name, s_prop_dict[SAQL_NAME],
+                                                                                  s_prop_dict[GROUP])
+                            saql_json = json.dumps(saql_json).strip('"')
+                            listselector_step_dataset = {STEP_NAME: s_name, GROUP: s_prop_dict[GROUP], SAQL_QUERY: saql_json,
+                                                         SELECT_MODE: s_prop_dict[SELECT_MODE]}
+                            steps.update(self.render_members(s_template, listselector_step_dataset))
+
+                    layouts.append(self.parse_fragment(
+                        self.generate_layouts_json(w_name, widget[COLSPAN], widget[COL], widget[ROW],
+                                                   widget[ROWSPAN], w_prop_dict.get(STYLE, "")), LAYOUT_TEMPLATE))
+                widgets.update(self.parse_fragment(self.generate_container_json(c_template, c_name), c_template,
+                                                   members=True))
+
+            page_state = self.parse_fragment(self.generate_page_json(p_name, p_display, p_template, ""), p_template)
+            page_state[WIDGETS] = layouts
+            return page_state, widgets, steps
 
         except Exception as e:
             exception_handler("", e)
 
-    def run(self, ds_name):
+    def generate_dashboard_state(self, display_name, dashboard_name, metadata=None):
         """
-        Method inserts layouts, widgets, steps into provided dashboard template and outputs to file; returns file name
-        :param wave_id:
-        :return file_name:
+        Method returns generated pages, widgets, and steps of the dashboard state from metadata; the metadata file
+        written by generate_metadata is read when no metadata is provided. Pages are rendered independently, in
+        parallel when workers is greater than one
+        :param display_name:
+        :param dashboard_name:
+        :param metadata:
+        :return pages, widgets, steps:
         """
-        display_name = self._entity_service.get_dashboard_by_name(ds_name).display_name
-        dashboard_name = self._entity_service.get_dashboard_by_name(ds_name).dashboard_name
+        if metadata is None:
+            file_content = read_file(self.output + "/" + display_name + "_dashboard_metadata.json")
+            metadata = json.loads(file_content)
+        metadata = sorted(metadata, key=lambda x: x[NAME].lower())
+
+        if self.workers > 1:
+            with ThreadPoolExecutor(max_workers=self.workers) as executor:
+                rendered = list(executor.map(lambda page: self.render_page(page, dashboard_name), metadata))
+        else:
+            rendered = [self.render_page(page, dashboard_name) for page in metadata]
+
+        pages = []
+        widgets = {}
+        steps = {}
+        for page_state, page_widgets, page_steps in rendered:
+            pages.append(page_state)
+            widgets.update(page_widgets)
+            steps.update(page_steps)
+        return pages, widgets, steps
+
+    @staticmethod
+    def validate_state(state):
+        """
+        Method logs page layouts that refer to a widget missing from the dashboard state
+        :param state:
+        :return missing:
+        """
+        missing = []
+        for grid_layout in state["gridLayouts"]:
+            for page in grid_layout["pages"]:
+                for layout in page[WIDGETS]:
+                    if layout[NAME] not in state[WIDGETS]:
+                        logger.warning("Layout of page %s refers to unknown widget %s" % (page[NAME], layout[NAME]))
+                        missing.append(layout[NAME])
+        return missing
+
+    def render_dashboard(self, ds_name, metadata=None):
+        """
+        Method inserts layouts, widgets, steps into provided dashboard template and returns the dashboard JSON
+        :param ds_name:
+        :param metadata:
+        :return dashboard_content:
+        """
+        dashboard = self._entity_service.get_dashboard_by_name(ds_name)
         file_name = self.template_path + "/dashboard_template.json"
-        page_content, widget_content, step_content = self.generate_dashboard_json(display_name, dashboard_name)
+        pages, widgets, steps = self.generate_dashboard_state(dashboard.display_name, dashboard.dashboard_name,
+                                                              metadata)
 
         try:
             data = {
-                "dashboard_name": display_name,
-                "pages": page_content,
-                "steps": step_content,
-                "widgets": widget_content,
-                "folder_id": self._entity_service.get_dashboard_by_name(ds_name).folder_id
+                "dashboard_name": dashboard.display_name,
+                "pages": "",
+                "steps": "",
+                "widgets": "",
+                "folder_id": dashboard.folder_id
             }
-            dashboard_content = self.data_replacement_json(file_name, data)
+            dashboard_json = self.parse_fragment(self.data_replacement_json(file_name, data), file_name)
+            state = dashboard_json["state"]
+            state["gridLayouts"][0]["pages"] = pages
+            state[STEPS] = steps
+            state[WIDGETS] = widgets
+            self.validate_state(state)
+            return json.dumps(dashboard_json, indent=4)
         except Exception as e:
             exception_handler("", e)
 
+    def run(self, ds_name):
+        """
+        Method inserts layouts, widgets, steps into provided dashboard template and outputs to file; returns file name
+        :param wave_id:
+        :return file_name:
+        """
+        display_name = self._entity_service.get_dashboard_by_name(ds_name).display_name
+        dashboard_content = self.render_dashboard(ds_name)
+
         file_name = self.output + "/" + display_name + "_dashboard_dataset_replacement.json"
         save_file(file_name, dashboard_content)
         return file_name
@@ -411,3 +501,18 @@ class WaveUIServices:
         container_list, display_name = self.populate_model_from_database(ds_name)
         self.generate_metadata(container_list, display_name)
         return self.run(ds_name)
+
+    def generate(self, ds_name):
+        """
+        Method generates complete dashboard JSON from the database without writing the intermediate metadata and
+        dataset replacement files; they are only written when debug is set
+        :param ds_name:
+        :return dashboard_content:
+        """
+        page_list, display_name = self.populate_model_from_database(ds_name)
+        if self.debug:
+            self.generate_metadata(page_list, display_name)
+        dashboard_content = self.render_dashboard(ds_name, self.metadata_from_model(page_list))
+        if self.debug:
+            save_file(self.output + "/" + display_name + "_dashboard_dataset_replacement.json", dashboard_content)
+        return dashboard_content
@@ -205,13 +205,72 @@ class EntityService:
         :param dashboard_id:
         :return pages:
         """
-        page_names = self.session.query(AssociationEntity).filter_by(dashboard_name=dashboard_name).all()
+        page_list = self._query_dashboard_pages(dashboard_name)
         pages = []
-        for name in page_names:
-            pe = self.session.query(PageEntity).filter_by(name=name.page_name).one()
+        for pe in page_list:
             pages.append(Page(pe.name, pe.display_name, pe.template_file))
         return pages
 
+    def get_dashboard_tree(self, dashboard_name):
+        """
+        Method returns list of Pages belonging to provided Dashboard with their Containers, Widgets, Steps and
+        Properties attached; the tree is loaded with one query per level instead of one query per parent
+        :param dashboard_name:
+        :return pages:
+        """
+        page_list = self._query_dashboard_pages(dashboard_name)
+        page_names = [pe.name for pe in page_list]
+        container_list = self._query_children(ContainerEntity, ContainerEntity.page_name, page_names)
+        container_names = [ce.name for ce in container_list]
+        widget_list = self._query_children(WidgetEntity, WidgetEntity.container_name, container_names)
+        widget_names = [we.name for we in widget_list]
+        widget_property_list = self._query_children(WidgetPropertyEntity, WidgetPropertyEntity.widget_name,
+                                                    widget_names)
+        step_list = self._query_children(StepEntity, StepEntity.widget_name, widget_names)
+        step_property_list = self._query_children(StepPropertyEntity, StepPropertyEntity.step_name,
+                                                  [se.name for se in step_list])
+
+        step_properties = {}
+        for sp in step_property_list:
+            step_properties.setdefault(sp.step_name, []).append(Property(sp.id, sp.key, sp.value))
+        widget_properties = {}
+        for wp in widget_property_list:
+            widget_properties.setdefault(wp.widget_name, []).append(Property(wp.id, wp.key, wp.value))
+        steps = {}
+        for se in step_list:
+            step = Step(se.name, se.display_name, se.type, se.template_file)
+            step.add_properties(step_properties.get(se.name, []))
+            steps.setdefault(se.widget_name, []).append(step)
+        widgets = {}
+        for we in widget_list:
+            widget = Widget(we.name, we.display_name, we.font_size, we.template_file, we.type, we.colspan, we.col,
+                            we.row, we.rowspan)
+            widget.add_properties(widget_properties.get(we.name, []))
+            widget.add_steps(steps.get(we.name, []))
+            widgets.setdefault(we.container_name, []).append(widget)
+        containers = {}
+        for ce in container_list:
+            container = Container(ce.name, ce.display_name, ce.template_file, ce.colspan, ce.col, ce.row,
+                                  ce.rowspan)
+            container.add_widgets(widgets.get(ce.name, []))
+            containers.setdefault(ce.page_name, []).append(container)
+        pages = []
+        for pe in page_list:
+            page = Page(pe.name, pe.display_name, pe.template_file)
+            page.add_containers(containers.get(pe.name, []))
+            pages.append(page)
+        return pages
+
+    def _query_dashboard_pages(self, dashboard_name):
+        return self.session.query(PageEntity) \
+            .join(AssociationEntity, AssociationEntity.page_name == PageEntity.name) \
+            .filter(AssociationEntity.dashboard_name == dashboard_name).all()
+
+    def _query_children(self, entity, parent_column, parent_names):
+        if not parent_names:
+            return []
+        return self.session.query(entity).filter(parent_column.in_(parent_names)).all()
+
     def get_dashboards_by_env(self, env):
         """
         Method returns list of Dashboards belonging to provided environment
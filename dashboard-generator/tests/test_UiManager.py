@@ -115,16 +115,17 @@ class UiManagerTestSuite(unittest.TestCase):
         # testing generate_json()
         mock_entity_service_in_ui_mgr.get_dashboard_by_id(self.mock_wave_id).display_name.return_value = "replacement"
         mock_entity_service_in_ui_mgr.get_datasets_by_env(self.mock_environment).return_value = self.mock_dataset_list
-        mock_wave_ui_service_in_ui_mgr.execute(self.mock_wave_id).return_value = self.mock_template_path + "/test_replacement.json"
+        mock_entity_service_in_ui_mgr.get_datasets_by_env.return_value = self.mock_dataset_list
+        mock_wave_ui_service_in_ui_mgr.generate.return_value = "%(cost_data)s" \
+                                                               "%(breakdown)s" \
+                                                               "%(period)s"
 
-        with mock.patch('ds_generator.UiManager.read_file') as mock_read_file:
-            with mock.patch('ds_generator.UiManager.open') as mock_open:
-                mock_read_file.return_value = "%(cost_data)s" \
-                                              "%(breakdown)s" \
-                                              "%(period)s"
+        with mock.patch('ds_generator.UiManager.open') as mock_open:
+            mock_open.__enter__ = mock.Mock(return_value=(mock.Mock(), None))
+            mock_open.__exit__ = mock.Mock(return_value=None)
 
-                mock_open.__enter__ = mock.Mock(return_value=(mock.Mock(), None))
-                mock_open.__exit__ = mock.Mock(return_value=None)
+            dashboard = self.ui_mgr.generate_json(self.mock_wave_id, self.mock_environment)
 
-                self.ui_mgr.generate_json(self.mock_wave_id, self.mock_environment)
+        self.assertEquals(dashboard, "CTSFPDATAbreakdownperiod")
+        mock_wave_ui_service_in_ui_mgr.generate.assert_called_with(self.mock_wave_id)
 
@@ -16,13 +16,16 @@ THIS SOFTWARE IS PROVIDED BY THE COPYRIGHT HOLDERS AND CONTRIBUTORS "AS IS" AND
 import unittest
 import json
 import mock
+from jinja2 import Template, meta
 import os
+import shutil
+import tempfile
 
 from wave_common.utils import read_file
 from ds_generator.Models import Property, Step, Widget, Container, Dashboard, Page
 from ds_generator.orm.EntityModels import StepEntity, StepPropertyEntity, WidgetEntity, WidgetPropertyEntity, \
     ContainerEntity, DashboardEntity
-from ds_generator.WaveUiServices import WaveUIServices
+from ds_generator.WaveUiServices import WaveUIServices, template_environment
 from ds_generator.types import *
 
 
@@ -211,6 +214,85 @@ class WaveUIServiceTestSuite(unittest.TestCase):
 
         self.assertEquals(link_json["link_3"]["parameters"]["destinationType"], "url")
 
+    def test_generate_in_memory(self):
+        file_name = self.generator.execute('Dashboard1')
+        expected = json.loads(read_file(file_name))
+
+        self.generator.output = tempfile.mkdtemp()
+        content = self.generator.generate('Dashboard1')
+        self.assertEquals(json.loads(content), expected)
+        self.assertEquals(os.listdir(self.generator.output), [])
+
+        # debug artifacts are only written on request
+        self.generator.debug = True
+        self.assertEquals(self.generator.generate('Dashboard1'), content)
+        self.assertEquals(sorted(os.listdir(self.generator.output)), ["Dashboard #1_dashboard_dataset_replacement.json",
+                                                                      "Dashboard #1_dashboard_metadata.json"])
+        shutil.rmtree(self.generator.output)
+
+    def test_dashboard_state(self):
+        page_list, display_name = self.generator.populate_model_from_database('Dashboard1')
+        metadata = self.generator.metadata_from_model(page_list)
+
+        pages, widgets, steps = self.generator.generate_dashboard_state(display_name, 'Dashboard1', metadata)
+        self.assertEquals([p["name"] for p in pages], ['page_1', 'page_2'])
+        self.assertEquals(len(pages[0]["widgets"]), 10)
+        self.assertEquals(sorted(steps), ['Period_3', 'Period_Year_Period_M_1', 'kingdom_1', 'lens_4'])
+        self.assertTrue("container_2" in widgets and "text_15" in widgets)
+
+        # pages render independently, so parallel rendering gives the same state
+        self.generator.workers = 4
+        self.assertEquals(self.generator.generate_dashboard_state(display_name, 'Dashboard1', metadata),
+                          (pages, widgets, steps))
+
+        state = {"gridLayouts": [{"pages": pages}], "widgets": widgets, "steps": steps}
+        self.assertEquals(self.generator.validate_state(state), [])
+        del widgets["text_15"]
+        self.assertEquals(self.generator.validate_state(state), ["text_15"])
+
+    def test_template_cache(self):
+        file_name = os.path.join(self.output, "cached_widget.json")
+        if not os.path.exists(self.output):
+            os.makedirs(self.output)
+        with open(file_name, 'w') as fout:
+            fout.write('"{_{name}_}": {"text": "{{value}}"}')
+
+        self.assertEquals(self.generator.data_replacement_json(file_name, {NAME: "widget_1"}),
+                          '"widget_1": {"text": "{{value}}"}')
+        template = template_environment.get_template(file_name)
+        self.generator.data_replacement_json(file_name, {NAME: "widget_2"})
+        self.assertIs(template_environment.get_template(file_name), template)
+
+        # a modified template is recompiled
+        with open(file_name, 'w') as fout:
+            fout.write('"{_{name}_}_v2": {}')
+        stat = os.stat(file_name)
+        os.utime(file_name, (stat.st_atime, stat.st_mtime + 1))
+        self.assertEquals(self.generator.data_replacement_json(file_name, {NAME: "widget_1"}), '"widget_1_v2": {}')
+        os.remove(file_name)
+
+    def test_template_delimiters_compatibility(self):
+        def legacy_replacement_json(file_name, dataset):
+            template_file = read_file(file_name)
+            template_file = template_file.replace('\\', 'BACKSLASH').replace('{{', 'OPEN_BRACKET') \
+                .replace('}}', 'CLOSE_BRACKET')
+            template_file = template_file.replace('{_{', '{{').replace('}_}', '}}')
+            output = Template(template_file).render(dataset)
+            return output.replace('BACKSLASH', '\\').replace('OPEN_BRACKET', '{{').replace('CLOSE_BRACKET', '}}')
+
+        template_files = []
+        for folder in ['templates', 'saql', self.template_path, self.saql_path]:
+            for root, dirs, files in os.walk(folder):
+                template_files.extend(os.path.join(root, f) for f in files)
+        self.assertTrue(len(template_files) > 19)
+
+        for file_name in template_files:
+            source = template_environment.loader.get_source(template_environment, file_name)[0]
+            variables = meta.find_undeclared_variables(template_environment.parse(source))
+            dataset = dict((v, 'value of ' + v + ' with \\"quotes\\" and {{binding}}') for v in variables)
+            self.assertEquals(self.generator.data_replacement_json(file_name, dataset),
+                              legacy_replacement_json(file_name, dataset), file_name)
+
     def test_generate_json(self):
         self.generator.execute('Dashboard1')
         name = self.generator._entity_service.get_dashboard_by_name('Dashboard1').display_name
@@ -14,6 +14,7 @@ THIS SOFTWARE IS PROVIDED BY THE COPYRIGHT HOLDERS AND CONTRIBUTORS "AS IS" AND
 """
 
 import unittest
+from sqlalchemy.event import listen
 from ds_generator.orm.EntityService import EntityService
 from ds_generator.Models import Property, Step, Widget, Container, Dashboard, Dataset, Page
 from ds_generator.orm.EntityModels import StepEntity, StepPropertyEntity, WidgetEntity, WidgetPropertyEntity, \
@@ -203,3 +204,45 @@ class EntityServiceTestSuite(unittest.TestCase):
 
         self.assertEqual(len(es.get_datasets_by_env("org62")), 1)
         self.assertEqual(es.get_datasets_by_env("org62")[0].name, "period")
+
+    def test_Dashboard_tree(self):
+        es = EntityService()
+
+        DashboardEntity.metadata.create_all(es.engine)
+
+        es.add_page(Page(name='page_1', display_name='Page 1', template_file='page_template.json'))
+        es.add_page(Page(name='page_2', display_name='Page 2', template_file='page_template.json'))
+        es.add_page(Page(name='page_3', display_name='Page 3', template_file='page_template.json'))
+        es.add_relationship('1P', 'page_1')
+        es.add_relationship('1P', 'page_2')
+        es.add_relationship('MoFo', 'page_3')
+        es.add_container_to_page(Container(name='container_1', display_name='Container 1',
+                                           template_file='container_widget.json', colspan=0, col=0, row=9,
+                                           rowspan=8), 'page_1')
+        es.add_container_to_page(Container(name='container_3', display_name='Container 3',
+                                           template_file='container_widget.json', colspan=0, col=0, row=9,
+                                           rowspan=8), 'page_3')
+        es.add_widget_to_container(Widget(name='link_2', display_name='Link 2', font_size=14,
+                                          template_file='link_widget.json', type='link', colspan=1, col=1, row=2,
+                                          rowspan=2), 'container_1')
+        es.add_widget_to_container(Widget(name='chart_1', display_name='Chart 1', font_size=0,
+                                          template_file='bar_chart_widget.json', type='chart', colspan=20, col=3,
+                                          row=5, rowspan=10), 'container_1')
+        es.add_property_to_widget(Property(id=None, key='dest_type', value='url'), 'link_2')
+        es.add_step_to_widget(Step(name='step_3', display_name='Step 3', type='chart',
+                                   template_file='chart_step.json'), 'chart_1')
+        es.add_property_to_step(Property(id=None, key='saql_name', value='chart.saql'), 'step_3')
+        es.add_property_to_step(Property(id=None, key='var_name', value='mom'), 'step_3')
+
+        statements = []
+        listen(es.engine, 'before_cursor_execute', lambda *args: statements.append(args[2]))
+        pages = es.get_dashboard_tree('1P')
+
+        self.assertEqual(len(statements), 6)
+        self.assertEqual([p.name for p in pages], ['page_1', 'page_2'])
+        self.assertEqual(pages[1].get_containers(), [])
+        widgets = pages[0].get_containers()[0].get_widgets()
+        self.assertEqual([w.name for w in widgets], ['link_2', 'chart_1'])
+        self.assertEqual([p.value for p in widgets[0].get_properties()], ['url'])
+        self.assertEqual(widgets[0].get_steps(), [])
+        self.assertEqual([p.key for p in widgets[1].get_steps()[0].get_properties()], ['saql_name', 'var_name'])
@@ -16,17 +16,12 @@ THIS SOFTWARE IS PROVIDED BY THE COPYRIGHT HOLDERS AND CONTRIBUTORS "AS IS" AND
 """
 This producer object generate capad csv files by querying the hive table.
 """
-from wave_common.db_connector import DatabaseConnector
+from wave_uploader.sql_data_producer import SqlWaveDataProducer
+from wave_common.utils import read_file, get_current_file_path
 
-from wave_uploader.wave_data_producer import WaveDataProducer
-from wave_common.utils import create_timestamp_csv, create_dirs, read_file, get_current_file_path, save_as_csv
-from wave_common.core_logger import Logger
-
-class YearlyDemoProducer(WaveDataProducer):
+class YearlyDemoProducer(SqlWaveDataProducer):
     def __init__(self, dbConfig):
-        self._logger = Logger.logger
-        self.dbConfig = dbConfig
-        self._db_connector = DatabaseConnector(dbConfig)
+        super().__init__(dbConfig)
         self.sql_file_name = "yearly_demo.sql"
         self.headers = ["year", "REGION", "STATE", "CENSUS2010POP", "DOMESTICMIG", "POPESTIMATE", "DEATHS", "BIRTHS", "INTERNATIONALMIG", "ESTIMATESBASE", "NATURALINC"]
         print('INIT')
@@ -34,12 +29,8 @@ class YearlyDemoProducer(WaveDataProducer):
     def name(self):
         return "YearlyDemoProducer"
 
-    def pull(self, targetFolder):
-        create_dirs(targetFolder)
-        file_name = create_timestamp_csv(targetFolder)
-        self._logger.info('create file:' + file_name)
+    def query(self):
         query = read_file(get_current_file_path(__file__) + "/" + self.sql_file_name)
         self._logger.info('the query is: ' + query)
         print(query)
-        [rows, _] = self._db_connector.execute_query(query)
-        save_as_csv(file_name, self.headers, rows)
+        return query
@@ -16,27 +16,18 @@ THIS SOFTWARE IS PROVIDED BY THE COPYRIGHT HOLDERS AND CONTRIBUTORS "AS IS" AND
 """
 This producer object generate csv files by copying static csv file.
 """
-from wave_common.db_connector import DatabaseConnector
-from wave_uploader.wave_data_producer import WaveDataProducer
-from wave_common.utils import create_timestamp_csv, create_dirs, read_file, get_current_file_path, save_as_csv
-from wave_common.core_logger import Logger
+from wave_uploader.sql_data_producer import SqlWaveDataProducer
+from wave_common.utils import read_file, get_current_file_path
 
-class PeriodDataProducer(WaveDataProducer):
+class PeriodDataProducer(SqlWaveDataProducer):
     def __init__(self, dbConfig):
-        self._logger = Logger.logger
-        self.dbConfig = dbConfig
-        self._db_connector = DatabaseConnector(dbConfig)
+        super().__init__(dbConfig)
         self.headers = ["Period"]
 
     def name(self):
         return "PeriodDataProducer"
 
-    def pull(self, targetFolder):
-        create_dirs(targetFolder)
-        file_name = create_timestamp_csv(targetFolder)
-        self._logger.info('create file:' + file_name)
-
+    def query(self):
         query = read_file(get_current_file_path(__file__) + "/period.sql")
         self._logger.info('the query is: ' + query)
-        [rows, _] = self._db_connector.execute_query(query)
-        save_as_csv(file_name, self.headers, rows)
\ No newline at end of file
+        return query
@@ -0,0 +1,498 @@
+"""
+Copyright (c) 2018, Salesforce.com, Inc.
+All rights reserved.
+
+Redistribution and use in source and binary forms, with or without modification, are permitted provided that the following conditions are met:
+
+* Redistributions of source code must retain the above copyright notice, this list of conditions and the following disclaimer.
+
+* Redistributions in binary form must reproduce the above copyright notice, this list of conditions and the following disclaimer in the documentation and/or other materials provided with the distribution.
+
+* Neither the name of Salesforce.com nor the names of its contributors may be used to endorse or promote products derived from this software without specific prior written permission.
+
+THIS SOFTWARE IS PROVIDED BY THE COPYRIGHT HOLDERS AND CONTRIBUTORS "AS IS" AND ANY EXPRESS OR IMPLIED WARRANTIES, INCLUDING, BUT NOT LIMITED TO, THE IMPLIED WARRANTIES OF MERCHANTABILITY AND FITNESS FOR A PARTICULAR PURPOSE ARE DISCLAIMED. IN NO EVENT SHALL THE COPYRIGHT HOLDER OR CONTRIBUTORS BE LIABLE FOR ANY DIRECT, INDIRECT, INCIDENTAL, SPECIAL, EXEMPLARY, OR CONSEQUENTIAL DAMAGES (INCLUDING, BUT NOT LIMITED TO, PROCUREMENT OF SUBSTITUTE GOODS OR SERVICES; LOSS OF USE, DATA, OR PROFITS; OR BUSINESS INTERRUPTION) HOWEVER CAUSED AND ON ANY THEORY OF LIABILITY, WHETHER IN CONTRACT, STRICT LIABILITY, OR TORT (INCLUDING NEGLIGENCE OR OTHERWISE) ARISING IN ANY WAY OUT OF THE USE OF THIS SOFTWARE, EVEN IF ADVISED OF THE POSSIBILITY OF SUCH DAMAGE.
+"""
+
+# -*- coding: utf-8 -*-
+
+import base64
+import gzip
+import hashlib
+import json
+import os
+import shutil
+import tempfile
+import unittest
+from mock import Mock, patch
+from wave_uploader.data_uploader import WaveUploader, MultipartPartBody, FileSlice, UploadManifest, \
+    JobTracker, UploadFingerprints, MetadataCache, pendingUploads, fileFingerprint, checkUpsertMetadata, \
+    metadataObjectName
+
+
+class WaveUploaderPartTest(unittest.TestCase):
+    def setUp(self):
+        self.tmp_dir = tempfile.mkdtemp()
+        self.csv_file = os.path.join(self.tmp_dir, 'test.csv')
+        with open(self.csv_file, 'w') as f:
+            f.write('header1,header2\nl11,l12\nl21,l22\n')
+        self.mock_connector = Mock()
+        self.mock_connector.get_api_url.return_value = 'https://fake'
+        self.mock_connector.postInsightsExternalData.return_value = 'fake_parent_id'
+        self.mock_connector.get_access_token.return_value = 'fake_token'
+        self.mock_setup = Mock(resource_url='/services/data/v47.0', is_verify='false',
+                               upload_concurrency=1, upload_retries=1, upload_compression='none',
+                               upload_part_encoding='base64', skip_unchanged=False)
+        self.done_dir = tempfile.mkdtemp()
+        self.uploader = WaveUploader(self.mock_connector, 'fake_id', 'testDataSet', 'Overwrite',
+                                     Mock(dataFolder=self.tmp_dir, doneFolder=self.done_dir), self.mock_setup)
+
+    def tearDown(self):
+        shutil.rmtree(self.tmp_dir)
+        shutil.rmtree(self.done_dir)
+
+    def _mock_session(self, content):
+        session = Mock()
+        session.post.return_value = Mock(status_code=200, content=content)
+        session.post.return_value.json.return_value = json.loads(content)
+        self.mock_connector.send_request.side_effect = lambda method, url, **kwargs: session.post(url, **kwargs)
+        return session
+
+    def test_split_file_is_lazy(self):
+        parts = self.uploader.splitFile(self.csv_file, 10)
+        self.assertFalse(isinstance(parts, list))
+        decoded = b''.join(base64.b64decode(part) for _, part in parts)
+        with open(self.csv_file, 'rb') as f:
+            self.assertEqual(decoded, f.read())
+
+    def test_split_file_part_size(self):
+        parts = list(self.uploader.splitFile(self.csv_file, 10))
+        self.assertEqual([partNumber for partNumber, _ in parts], [1, 2, 3, 4])
+        self.assertEqual(base64.b64decode(parts[0][1]), b'header1,he')
+
+    def test_split_file_skip_parts(self):
+        parts = list(self.uploader.splitFile(self.csv_file, 10, {1, 2}))
+        self.assertEqual([partNumber for partNumber, _ in parts], [3, 4])
+        self.assertEqual(base64.b64decode(parts[0][1]), b'l12\nl21,l2')
+
+    def test_split_empty_file(self):
+        open(self.csv_file, 'w').close()
+        self.assertEqual(list(self.uploader.splitFile(self.csv_file)), [(1, b'')])
+
+    def test_compress_file(self):
+        compressed = self.uploader.compressFile(self.csv_file)
+        self.assertEqual(compressed, self.csv_file + '.gz')
+        with gzip.open(compressed, 'rb') as f, open(self.csv_file, 'rb') as raw:
+            self.assertEqual(f.read(), raw.read())
+        with open(compressed, 'rb') as f:
+            first = f.read()
+        with open(self.uploader.compressFile(self.csv_file), 'rb') as f:
+            self.assertEqual(f.read(), first)
+
+    def test_upload_gzip_parts(self):
+        self.mock_setup.upload_compression = 'gzip'
+        session = self._mock_session(b'{"id": "fake_part_id"}')
+        with patch.object(self.uploader, '_metadata_for_dataset', return_value=None), \
+                patch.object(self.uploader, 'send_data_request'):
+            self.uploader.uploadToWave(self.csv_file, 'fake_token')
+        part = json.loads(session.post.call_args[1]['data'])
+        with open(self.csv_file, 'rb') as f:
+            self.assertEqual(gzip.decompress(base64.b64decode(part['DataFile'])), f.read())
+        self.assertFalse(os.path.exists(self.csv_file + '.gz'))
+
+    def test_slice_file(self):
+        slices = list(self.uploader.sliceFile(self.csv_file, 10))
+        self.assertEqual([(s.offset, s.length) for s in slices], [(0, 10), (10, 10), (20, 10), (30, 2)])
+        open(self.csv_file, 'w').close()
+        self.assertEqual(list(self.uploader.sliceFile(self.csv_file)), [FileSlice(self.csv_file, 0, 0)])
+
+    def test_multipart_body(self):
+        body = MultipartPartBody(FileSlice(self.csv_file, 16, 8), 'fake_parent_id', 3)
+        content = body.read(5) + body.read()
+        body.close()
+        self.assertEqual(len(content), len(body))
+        self.assertTrue(body.content_type().endswith(body.boundary))
+        self.assertIn(b'name="entity_content"', content)
+        self.assertIn(b'{"InsightsExternalDataId": "fake_parent_id", "PartNumber": 3}', content)
+        self.assertIn(b'filename="test.csv"\r\nContent-Type: application/octet-stream\r\n\r\nl11,l12\n\r\n', content)
+        self.assertTrue(content.endswith(('--%s--\r\n' % body.boundary).encode('ascii')))
+
+    def test_upload_multipart_parts(self):
+        self.mock_setup.upload_part_encoding = 'multipart'
+        session = self._mock_session(b'{"id": "fake_part_id"}')
+        with patch.object(self.uploader, '_metadata_for_dataset', return_value=None), \
+                patch.object(self.uploader, 'send_data_request'):
+            self.uploader.uploadToWave(self.csv_file, 'fake_token')
+        body = session.post.call_args[1]['data']
+        self.assertIsInstance(body, MultipartPartBody)
+        self.assertEqual(session.post.call_args[1]['headers']['Content-Type'], body.content_type())
+
+    @patch('wave_uploader.data_uploader.JobTracker')
+    def test_upload_csv_tracks_all_jobs(self, mock_tracker_class):
+        self.mock_setup.is_verify = 'true'
+        shutil.copy(self.csv_file, os.path.join(self.tmp_dir, 'test2.csv'))
+        tracker = mock_tracker_class.return_value
+        tracker.failed.return_value = {}
+        with patch.object(self.uploader, 'uploadToWave', side_effect=['job1', 'job2']):
+            self.uploader.uploadCsv('fake_id')
+        self.assertEqual(sorted(c[0][0] for c in tracker.add.call_args_list), ['job1', 'job2'])
+        tracker.wait.assert_called_once()
+        self.assertEqual(sorted(os.listdir(self.done_dir)), ['test.csv', 'test2.csv'])
+
+    @patch('wave_uploader.data_uploader.JobTracker')
+    def test_upload_csv_failed_job(self, mock_tracker_class):
+        self.mock_setup.is_verify = 'true'
+        mock_tracker_class.return_value.failed.return_value = {'job1': ('Failed', 'bad data')}
+        with patch.object(self.uploader, 'uploadToWave', return_value='job1'):
+            with self.assertRaises(Exception):
+                self.uploader.uploadCsv('fake_id')
+        self.assertEqual(os.listdir(self.done_dir), [])
+
+    def test_upload_csv_empty_folder(self):
+        self.mock_setup.skip_unchanged = True
+        self.uploader._fingerprints = Mock()
+        os.remove(self.csv_file)
+        with patch.object(self.uploader, 'uploadToWave') as mock_upload:
+            self.uploader.uploadCsv('fake_id')
+        mock_upload.assert_not_called()
+        self.uploader._fingerprints.assert_not_called()
+        self.mock_connector.get_access_token.assert_not_called()
+
+    def test_file_fingerprint(self):
+        with open(self.csv_file, 'rb') as f:
+            content = f.read()
+        self.assertEqual(fileFingerprint(self.csv_file), hashlib.sha256(content).hexdigest())
+
+    @patch('wave_uploader.data_uploader.JobTracker')
+    def test_upload_csv_skips_unchanged(self, mock_tracker_class):
+        self.mock_setup.skip_unchanged = True
+        self.mock_setup.is_verify = 'true'
+        self.uploader._fingerprints = lambda: UploadFingerprints(os.path.join(self.done_dir, 'record'))
+        mock_tracker_class.return_value.failed.return_value = {}
+        with open(self.csv_file, 'rb') as f:
+            content = f.read()
+        with patch.object(self.uploader, 'uploadToWave', return_value='job1') as mock_upload:
+            self.uploader.uploadCsv('fake_id')
+            self.assertEqual(mock_upload.call_count, 1)
+
+            # the same extract again is not uploaded, but still moved to the done folder
+            with open(os.path.join(self.tmp_dir, 'test2.csv'), 'wb') as f:
+                f.write(content)
+            self.uploader.uploadCsv('fake_id')
+            self.assertEqual(mock_upload.call_count, 1)
+            self.assertEqual(sorted(os.listdir(self.done_dir)), ['record', 'test.csv', 'test2.csv'])
+
+            # changed content is uploaded
+            with open(os.path.join(self.tmp_dir, 'test3.csv'), 'wb') as f:
+                f.write(content + b'l31,l32\n')
+            self.uploader.uploadCsv('fake_id')
+            self.assertEqual(mock_upload.call_count, 2)
+
+            # as is the same content in another operation
+            self.uploader._mode = 'Append'
+            with open(os.path.join(self.tmp_dir, 'test4.csv'), 'wb') as f:
+                f.write(content + b'l31,l32\n')
+            self.uploader.uploadCsv('fake_id')
+            self.assertEqual(mock_upload.call_count, 3)
+
+    @patch('wave_uploader.data_uploader.JobTracker')
+    def test_failed_upload_keeps_fingerprints(self, mock_tracker_class):
+        self.mock_setup.skip_unchanged = True
+        self.uploader._fingerprints = lambda: UploadFingerprints(os.path.join(self.tmp_dir, 'record'))
+        self.mock_setup.is_verify = 'true'
+        mock_tracker_class.return_value.failed.return_value = {'job1': ('Failed', 'bad data')}
+        with patch.object(self.uploader, 'uploadToWave', return_value='job1') as mock_upload:
+            with self.assertRaises(Exception):
+                self.uploader.uploadCsv('fake_id')
+            mock_tracker_class.return_value.failed.return_value = {}
+            self.uploader.uploadCsv('fake_id')
+        self.assertEqual(mock_upload.call_count, 2)
+
+    def test_metadata_object_name(self):
+        self.assertEqual(metadataObjectName('/a/b/20200101-10-00-00.csv'), 'X20200101_10_00_00')
+        self.assertEqual(metadataObjectName('data/x-y.csv'), 'Xx_y')
+
+    def test_metadata_cache(self):
+        template = os.path.join(self.done_dir, 'metadata.json')
+        with open(template, 'w') as f:
+            json.dump({"objects": [{"name": "template", "fields": []}]}, f)
+        cache = MetadataCache()
+        metadataJson, encoded = cache.metadata(template, 'Xfile1')
+        self.assertEqual(json.loads(metadataJson)["objects"][0]["name"], 'Xfile1')
+        self.assertEqual(base64.b64decode(encoded).decode('utf-8'), metadataJson)
+        self.assertIsNone(cache.metadata(os.path.join(self.done_dir, 'missing.json'), 'Xfile1'))
+
+        # the template is parsed once, even for other object names
+        with patch('wave_uploader.data_uploader.json.load') as mock_load:
+            self.assertEqual(cache.metadata(template, 'Xfile1')[1], encoded)
+            self.assertEqual(json.loads(cache.metadata(template, 'Xfile2')[0])["objects"][0]["name"], 'Xfile2')
+            self.assertEqual(cache.template(template)["objects"][0]["name"], 'template')
+            mock_load.assert_not_called()
+
+        # a changed template is reloaded
+        with open(template, 'w') as f:
+            json.dump({"objects": [{"name": "template", "fields": [{"name": "a"}]}]}, f)
+        os.utime(template, (0, 0))
+        self.assertEqual(json.loads(cache.metadata(template, 'Xfile1')[0])["objects"][0]["fields"], [{"name": "a"}])
+
+    def test_create_external_data_metadata(self):
+        with patch.object(self.uploader, '_metadata_for_dataset', return_value=('{}', 'e30=')):
+            self.uploader._create_external_data(self.csv_file)
+        self.assertEqual(self.mock_connector.postInsightsExternalData.call_args[0][0]['MetadataJson'], 'e30=')
+
+    def _check_upsert(self, fields):
+        # a new template file for every check, the parsed templates are cached by file
+        fd, template = tempfile.mkstemp(suffix='.json', dir=self.done_dir)
+        os.close(fd)
+        with open(template, 'w') as f:
+            json.dump({"objects": [{"fields": fields}]}, f)
+        with patch('wave_uploader.data_uploader.metadataTemplate', return_value=template):
+            return checkUpsertMetadata('testDataSet')
+
+    def test_check_upsert_metadata(self):
+        key = {"name": "Id", "type": "Text", "isUniqueId": True}
+        value = {"name": "Value", "type": "Numeric", "isUniqueId": False}
+        self.assertEqual(self._check_upsert([key, value]), "Id")
+        with self.assertRaises(Exception):
+            self._check_upsert([value])
+        with self.assertRaises(Exception):
+            self._check_upsert([key, dict(key, name="Other")])
+        with self.assertRaises(Exception):
+            self._check_upsert([dict(value, isUniqueId=True)])
+        with self.assertRaises(Exception):
+            checkUpsertMetadata('dataset_without_metadata')
+
+    def _stream_upload(self, chunks, partSize):
+        session = self._mock_session(b'{"id": "fake_part_id"}')
+        with patch.object(self.uploader, '_metadata_for_dataset', return_value=None), \
+                patch.object(self.uploader, 'send_data_request') as mock_send:
+            self.uploader.uploadStream(chunks, 'fake_id', partSize)
+        return mock_send, [json.loads(c[1]['data']) for c in session.post.call_args_list]
+
+    def test_upload_stream(self):
+        os.remove(self.csv_file)
+        chunks = [b'header1,header2\n', b'l11,l12\n', b'l21,l22\n', b'l31,l32\n']
+        mock_send, part_requests = self._stream_upload(iter(chunks), 10)
+        mock_send.assert_called_once()
+        self.mock_connector.postInsightsExternalData.assert_called_once()
+        self.assertEqual([r['PartNumber'] for r in part_requests], [1, 2, 3, 4])
+        data = b''.join(base64.b64decode(r['DataFile']) for r in part_requests)
+        self.assertEqual(data, b''.join(chunks))
+        done_files = os.listdir(self.done_dir)
+        self.assertEqual(len(done_files), 1)
+        with open(os.path.join(self.done_dir, done_files[0]), 'rb') as f:
+            self.assertEqual(f.read(), b''.join(chunks))
+
+    def test_upload_gzip_stream(self):
+        os.remove(self.csv_file)
+        self.mock_setup.upload_compression = 'gzip'
+        chunks = [b'header1,header2\n'] + [('%d,%s\n' % (i, hashlib.sha256(str(i).encode()).hexdigest())).encode()
+                                            for i in range(2000)]
+        mock_send, part_requests = self._stream_upload(iter(chunks), 4096)
+        mock_send.assert_called_once()
+        self.assertTrue(len(part_requests) > 1)
+        data = b''.join(base64.b64decode(r['DataFile']) for r in part_requests)
+        self.assertEqual(gzip.decompress(data), b''.join(chunks))
+        self.assertEqual(os.listdir(self.tmp_dir), [])
+
+    def test_upload_empty_stream(self):
+        mock_send, part_requests = self._stream_upload(iter([]), 10)
+        self.assertEqual(part_requests, [])
+        mock_send.assert_not_called()
+        self.mock_connector.postInsightsExternalData.assert_not_called()
+
+    def test_send_data_request(self):
+        self.mock_connector.send_request.return_value = Mock(status_code=204)
+        self.uploader.send_data_request({}, 'fake_parent_id')
+        method, url = self.mock_connector.send_request.call_args[0]
+        self.assertEqual(method, 'PATCH')
+        self.assertTrue(url.endswith('/sobjects/InsightsExternalData/fake_parent_id'))
+        self.assertEqual(json.loads(self.mock_connector.send_request.call_args[1]['data']), {'Action': 'Process'})
+
+        self.mock_connector.send_request.return_value = Mock(status_code=400, text='fake error')
+        with self.assertRaises(Exception):
+            self.uploader.send_data_request({}, 'fake_parent_id')
+
+    def _upload_two_parts(self):
+        with patch.object(self.uploader, 'splitFile',
+                          return_value=iter([(1, b'cGFydDE='), (2, b'cGFydDI=')])), \
+                patch.object(self.uploader, '_metadata_for_dataset', return_value=None), \
+                patch.object(self.uploader, 'send_data_request') as mock_send:
+            self.uploader.uploadToWave(self.csv_file, 'fake_token')
+            mock_send.assert_called_once()
+
+    def test_upload_parts_in_order(self):
+        session = self._mock_session(b'{"id": "fake_part_id"}')
+        self._upload_two_parts()
+        part_requests = [json.loads(c[1]['data']) for c in session.post.call_args_list]
+        self.assertEqual([r['PartNumber'] for r in part_requests], [1, 2])
+        self.assertEqual(part_requests[1]['DataFile'], 'cGFydDI=')
+        self.assertEqual(part_requests[0]['InsightsExternalDataId'], 'fake_parent_id')
+
+    def test_upload_parts_concurrently(self):
+        self.mock_setup.upload_concurrency = 4
+        session = self._mock_session(b'{"id": "fake_part_id"}')
+        self._upload_two_parts()
+        part_requests = [json.loads(c[1]['data']) for c in session.post.call_args_list]
+        self.assertEqual(sorted(r['PartNumber'] for r in part_requests), [1, 2])
+
+    @patch('wave_uploader.data_uploader.time.sleep')
+    def test_upload_part_retry(self, mock_sleep):
+        session = self._mock_session(b'{"id": "fake_part_id"}')
+        ok_response = session.post.return_value
+        session.post.side_effect = [Exception('connection reset'), ok_response]
+        self.assertEqual(self.uploader._upload_part({}, 'fake_parent_id', 1, b'cGFydDE='), 'fake_part_id')
+        self.assertEqual(session.post.call_count, 2)
+        mock_sleep.assert_called_once()
+
+    @patch('wave_uploader.data_uploader.time.sleep')
+    def test_upload_part_failure(self, mock_sleep):
+        session = self._mock_session(b'{"errors": "fake"}')
+        with self.assertRaises(Exception):
+            self.uploader._upload_part({}, 'fake_parent_id', 1, b'cGFydDE=')
+        self.assertEqual(session.post.call_count, 2)
+
+    @patch('wave_uploader.data_uploader.time.sleep')
+    def test_no_process_after_failed_part(self, mock_sleep):
+        self.mock_setup.upload_concurrency = 4
+        self._mock_session(b'{"errors": "fake"}')
+        with patch.object(self.uploader, 'send_data_request') as mock_send:
+            with self.assertRaises(Exception):
+                self._upload_two_parts()
+            mock_send.assert_not_called()
+
+    def test_manifest_removed_after_upload(self):
+        self._mock_session(b'{"id": "fake_part_id"}')
+        self._upload_two_parts()
+        self.assertFalse(os.path.exists(self.csv_file + '.manifest'))
+        self.assertEqual(pendingUploads(self.tmp_dir), [])
+
+    @patch('wave_uploader.data_uploader.time.sleep')
+    def test_manifest_kept_after_failure(self, mock_sleep):
+        session = self._mock_session(b'{"id": "fake_part_id"}')
+        ok_response = session.post.return_value
+        session.post.side_effect = [ok_response, Exception('connection reset'), Exception('connection reset')]
+        with self.assertRaises(Exception):
+            self._upload_two_parts()
+        manifest = UploadManifest(self.csv_file)
+        self.assertTrue(manifest.load())
+        self.assertEqual(manifest.parentId, 'fake_parent_id')
+        self.assertEqual(manifest.parts, {1: 0})
+        self.assertFalse(manifest.processed)
+        self.assertEqual(pendingUploads(self.tmp_dir), [self.csv_file])
+
+    def test_resume_upload(self):
+        manifest = UploadManifest(self.csv_file)
+        manifest.start('old_parent_id', 10, self.uploader._manifest_source(self.csv_file))
+        manifest.acknowledge(1)
+        manifest.acknowledge(2)
+        session = self._mock_session(b'{"id": "fake_part_id"}')
+        with patch.object(self.uploader, 'send_data_request') as mock_send:
+            self.uploader.uploadToWave(self.csv_file, 'fake_token')
+            mock_send.assert_called_once_with(mock_send.call_args[0][0], 'old_parent_id')
+        self.mock_connector.postInsightsExternalData.assert_not_called()
+        part_requests = [json.loads(c[1]['data']) for c in session.post.call_args_list]
+        self.assertEqual([r['PartNumber'] for r in part_requests], [3, 4])
+        self.assertEqual(base64.b64decode(part_requests[0]['DataFile']), b'l12\nl21,l2')
+        self.assertFalse(os.path.exists(manifest.fileName))
+
+    def _processed_manifest(self, status):
+        manifest = UploadManifest(self.csv_file)
+        manifest.start('old_parent_id', 10, self.uploader._manifest_source(self.csv_file))
+        manifest.acknowledge(1)
+        manifest.markProcessed()
+        response = Mock(status_code=200)
+        response.json.return_value = {'records': [{'Id': 'old_parent_id', 'Status': status}]}
+        self.mock_connector.send_request.return_value = response
+        return manifest
+
+    def test_resume_after_process(self):
+        manifest = self._processed_manifest('InProgress')
+        with patch.object(self.uploader, 'send_data_request') as mock_send:
+            self.assertEqual(self.uploader.uploadToWave(self.csv_file, 'fake_token'), 'old_parent_id')
+            mock_send.assert_not_called()
+        self.assertEqual(self.mock_connector.send_request.call_args[0][0], 'GET')
+        self.assertFalse(os.path.exists(manifest.fileName))
+
+    def test_resume_process_not_received(self):
+        manifest = self._processed_manifest('New')
+        with patch.object(self.uploader, 'send_data_request') as mock_send:
+            self.uploader.uploadToWave(self.csv_file, 'fake_token')
+            self.assertEqual(mock_send.call_args[0][1], 'old_parent_id')
+        # no part is sent again
+        self.assertEqual(self.mock_connector.send_request.call_count, 1)
+        self.assertFalse(os.path.exists(manifest.fileName))
+
+    def test_resume_unknown_job(self):
+        manifest = self._processed_manifest(None)
+        status_response = Mock(status_code=200)
+        status_response.json.return_value = {'records': []}
+        part_response = Mock(status_code=200, content=b'{"id": "fake_part_id"}')
+        part_response.json.return_value = {'id': 'fake_part_id'}
+        self.mock_connector.send_request.side_effect = \
+            lambda method, url, **kwargs: status_response if method == 'GET' else part_response
+        # the job was deleted from Wave, the file is uploaded into a new one
+        with patch.object(self.uploader, '_metadata_for_dataset', return_value=None), \
+                patch.object(self.uploader, 'send_data_request') as mock_send:
+            self.assertEqual(self.uploader.uploadToWave(self.csv_file, 'fake_token'), 'fake_parent_id')
+            self.assertEqual(mock_send.call_args[0][1], 'fake_parent_id')
+        self.mock_connector.postInsightsExternalData.assert_called_once()
+        self.assertEqual([c[0][0] for c in self.mock_connector.send_request.call_args_list], ['GET', 'POST'])
+        self.assertFalse(os.path.exists(manifest.fileName))
+
+    def test_ignore_stale_manifest(self):
+        manifest = UploadManifest(self.csv_file)
+        manifest.start('old_parent_id', 10, {'size': 1})
+        manifest.acknowledge(1)
+        self._mock_session(b'{"id": "fake_part_id"}')
+        with patch.object(self.uploader, '_metadata_for_dataset', return_value=None), \
+                patch.object(self.uploader, 'send_data_request') as mock_send:
+            self.uploader.uploadToWave(self.csv_file, 'fake_token')
+            self.assertEqual(mock_send.call_args[0][1], 'fake_parent_id')
+
+
+
+class JobTrackerTest(unittest.TestCase):
+    def setUp(self):
+        self.mock_connector = Mock()
+        self.tracker = JobTracker(self.mock_connector, 'https://fake/query/', initialDelay=1, maxDelay=4, timeout=100)
+
+    def _statuses(self, *records):
+        response = Mock(status_code=200)
+        response.json.return_value = {'records': [{'Id': i, 'Status': s, 'StatusMessage': None} for i, s in records]}
+        return response
+
+    def test_poll_many_jobs_in_one_query(self):
+        self.tracker.add('job1')
+        self.tracker.add('job2')
+        self.mock_connector.send_request.return_value = self._statuses(('job1', 'Completed'), ('job2', 'InProgress'))
+        self.assertEqual(self.tracker.poll(), {'job1': ('Completed', None)})
+        self.assertEqual(self.tracker.pending(), ['job2'])
+        self.assertEqual(self.mock_connector.send_request.call_count, 1)
+        soql = self.mock_connector.send_request.call_args[1]['params']['q']
+        self.assertIn("Id IN ('job1','job2')", soql)
+
+    @patch('wave_uploader.data_uploader.time.sleep')
+    def test_wait_with_backoff(self, mock_sleep):
+        self.tracker.add('job1')
+        self.mock_connector.send_request.side_effect = [
+            self._statuses(('job1', 'Queued')),
+            self._statuses(('job1', 'InProgress')),
+            self._statuses(('job1', 'InProgress')),
+            self._statuses(('job1', 'InProgress')),
+            self._statuses(('job1', 'Failed'))]
+        self.assertEqual(self.tracker.wait(), {'job1': ('Failed', None)})
+        self.assertEqual([c[0][0] for c in mock_sleep.call_args_list], [1, 2, 4, 4])
+        self.assertEqual(list(self.tracker.failed()), ['job1'])
+
+    @patch('wave_uploader.data_uploader.time.sleep')
+    def test_wait_timeout(self, mock_sleep):
+        self.tracker = JobTracker(self.mock_connector, 'https://fake/query/', initialDelay=60, timeout=10)
+        self.tracker.add('job1')
+        self.mock_connector.send_request.return_value = self._statuses(('job1', 'InProgress'))
+        with self.assertRaises(Exception):
+            self.tracker.wait()
+        mock_sleep.assert_not_called()
+
+
+if __name__ == '__main__':
+    unittest.main()
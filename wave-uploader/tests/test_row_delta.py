@@ -0,0 +1,103 @@
+"""
+Copyright (c) 2018, Salesforce.com, Inc.
+All rights reserved.
+
+Redistribution and use in source and binary forms, with or without modification, are permitted provided that the following conditions are met:
+
+* Redistributions of source code must retain the above copyright notice, this list of conditions and the following disclaimer.
+
+* Redistributions in binary form must reproduce the above copyright notice, this list of conditions and the following disclaimer in the documentation and/or other materials provided with the distribution.
+
+* Neither the name of Salesforce.com nor the names of its contributors may be used to endorse or promote products derived from this software without specific prior written permission.
+
+THIS SOFTWARE IS PROVIDED BY THE COPYRIGHT HOLDERS AND CONTRIBUTORS "AS IS" AND ANY EXPRESS OR IMPLIED WARRANTIES, INCLUDING, BUT NOT LIMITED TO, THE IMPLIED WARRANTIES OF MERCHANTABILITY AND FITNESS FOR A PARTICULAR PURPOSE ARE DISCLAIMED. IN NO EVENT SHALL THE COPYRIGHT HOLDER OR CONTRIBUTORS BE LIABLE FOR ANY DIRECT, INDIRECT, INCIDENTAL, SPECIAL, EXEMPLARY, OR CONSEQUENTIAL DAMAGES (INCLUDING, BUT NOT LIMITED TO, PROCUREMENT OF SUBSTITUTE GOODS OR SERVICES; LOSS OF USE, DATA, OR PROFITS; OR BUSINESS INTERRUPTION) HOWEVER CAUSED AND ON ANY THEORY OF LIABILITY, WHETHER IN CONTRACT, STRICT LIABILITY, OR TORT (INCLUDING NEGLIGENCE OR OTHERWISE) ARISING IN ANY WAY OUT OF THE USE OF THIS SOFTWARE, EVEN IF ADVISED OF THE POSSIBILITY OF SUCH DAMAGE.
+"""
+# -*- coding: utf-8 -*-
+
+import os
+import shutil
+import tempfile
+import unittest
+from wave_uploader.row_delta import RowDeltaIndex
+
+
+class RowDeltaIndexTest(unittest.TestCase):
+    def setUp(self):
+        self.tmp_dir = tempfile.mkdtemp()
+        self.index_dir = os.path.join(self.tmp_dir, 'delta')
+        self.csv_file = os.path.join(self.tmp_dir, 'data.csv')
+
+    def tearDown(self):
+        shutil.rmtree(self.tmp_dir)
+
+    def write(self, content):
+        with open(self.csv_file, 'w', newline='') as f:
+            f.write(content)
+
+    def read(self):
+        with open(self.csv_file, 'r', newline='') as f:
+            return f.read()
+
+    def test_append_only_new_rows(self):
+        index = RowDeltaIndex(self.index_dir)
+        self.write('id,name\r\n1,a\r\n2,"b\r\nc"\r\n')
+        self.assertEqual(index.filter(self.csv_file), (2, 0))
+        index.commit()
+
+        # rows are copied unchanged, including quoted line breaks
+        self.write('id,name\r\n2,"b\r\nc"\r\n3,d\r\n1,a\r\n3,d\r\n')
+        self.assertEqual(index.filter(self.csv_file), (2, 2))
+        self.assertEqual(self.read(), 'id,name\r\n3,d\r\n3,d\r\n')
+
+    def test_uncommitted_rows_are_sent_again(self):
+        index = RowDeltaIndex(self.index_dir)
+        self.write('id,name\n1,a\n')
+        index.filter(self.csv_file)
+        # the upload failed, the next run starts over
+        index.discard_pending()
+        self.write('id,name\n1,a\n')
+        self.assertEqual(index.filter(self.csv_file), (1, 0))
+
+    def test_key_columns(self):
+        index = RowDeltaIndex(self.index_dir, ['id'])
+        self.write('id,name\n1,a\n2,b\n')
+        index.filter(self.csv_file)
+        index.commit()
+
+        self.write('id,name\n1,changed\n3,c\n')
+        self.assertEqual(index.filter(self.csv_file), (1, 1))
+        self.assertEqual(self.read(), 'id,name\n3,c\n')
+
+    def test_rows_of_an_earlier_file_of_the_run(self):
+        index = RowDeltaIndex(self.index_dir)
+        self.write('id\n1\n')
+        index.filter(self.csv_file)
+        self.write('id\n1\n2\n')
+        self.assertEqual(index.filter(self.csv_file), (1, 1))
+
+    def test_overwrite_replaces_index(self):
+        index = RowDeltaIndex(self.index_dir)
+        self.write('id\n1\n2\n')
+        index.filter(self.csv_file)
+        index.commit()
+
+        self.write('id\n2\n3\n')
+        self.assertEqual(index.filter(self.csv_file, append=False), (2, 0))
+        index.commit()
+
+        self.write('id\n1\n2\n3\n')
+        self.assertEqual(index.filter(self.csv_file), (1, 2))
+        self.assertEqual(self.read(), 'id\n1\n')
+
+    def test_many_rows(self):
+        index = RowDeltaIndex(self.index_dir)
+        self.write('id\n' + ''.join('%d\n' % i for i in range(5000)))
+        index.filter(self.csv_file)
+        index.commit()
+        self.write('id\n' + ''.join('%d\n' % i for i in range(4990, 5010)))
+        self.assertEqual(index.filter(self.csv_file), (10, 10))
+        self.assertEqual(self.read(), 'id\n' + ''.join('%d\n' % i for i in range(5000, 5010)))
+
+
+if __name__ == '__main__':
+    unittest.main()
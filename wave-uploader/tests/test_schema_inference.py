@@ -0,0 +1,92 @@
+"""
+Copyright (c) 2018, Salesforce.com, Inc.
+All rights reserved.
+
+Redistribution and use in source and binary forms, with or without modification, are permitted provided that the following conditions are met:
+
+* Redistributions of source code must retain the above copyright notice, this list of conditions and the following disclaimer.
+
+* Redistributions in binary form must reproduce the above copyright notice, this list of conditions and the following disclaimer in the documentation and/or other materials provided with the distribution.
+
+* Neither the name of Salesforce.com nor the names of its contributors may be used to endorse or promote products derived from this software without specific prior written permission.
+
+THIS SOFTWARE IS PROVIDED BY THE COPYRIGHT HOLDERS AND CONTRIBUTORS "AS IS" AND ANY EXPRESS OR IMPLIED WARRANTIES, INCLUDING, BUT NOT LIMITED TO, THE IMPLIED WARRANTIES OF MERCHANTABILITY AND FITNESS FOR A PARTICULAR PURPOSE ARE DISCLAIMED. IN NO EVENT SHALL THE COPYRIGHT HOLDER OR CONTRIBUTORS BE LIABLE FOR ANY DIRECT, INDIRECT, INCIDENTAL, SPECIAL, EXEMPLARY, OR CONSEQUENTIAL DAMAGES (INCLUDING, BUT NOT LIMITED TO, PROCUREMENT OF SUBSTITUTE GOODS OR SERVICES; LOSS OF USE, DATA, OR PROFITS; OR BUSINESS INTERRUPTION) HOWEVER CAUSED AND ON ANY THEORY OF LIABILITY, WHETHER IN CONTRACT, STRICT LIABILITY, OR TORT (INCLUDING NEGLIGENCE OR OTHERWISE) ARISING IN ANY WAY OUT OF THE USE OF THIS SOFTWARE, EVEN IF ADVISED OF THE POSSIBILITY OF SUCH DAMAGE.
+"""
+# -*- coding: utf-8 -*-
+
+import json
+import os
+import shutil
+import tempfile
+import unittest
+from wave_uploader.schema_inference import infer_field, infer_metadata, field_name, sample_rows, \
+    write_metadata_template
+
+
+class SchemaInferenceTest(unittest.TestCase):
+    def setUp(self):
+        self.tmp_dir = tempfile.mkdtemp()
+        self.csv_file = os.path.join(self.tmp_dir, 'data.csv')
+
+    def tearDown(self):
+        shutil.rmtree(self.tmp_dir)
+
+    def test_infer_numeric(self):
+        self.assertEqual(infer_field(['1', '-20', '', '300']),
+                         {"type": "Numeric", "precision": 3, "scale": 0, "format": "#####0"})
+        self.assertEqual(infer_field(['1.5', '0.25', '12']),
+                         {"type": "Numeric", "precision": 4, "scale": 2, "format": "#####0.00"})
+
+    def test_infer_numeric_as_text(self):
+        self.assertEqual(infer_field(['0', '0.5', '10']),
+                         {"type": "Numeric", "precision": 3, "scale": 1, "format": "#####0.0"})
+        # leading zeros are significant
+        self.assertEqual(infer_field(['01', '10']), {"type": "Text"})
+        self.assertEqual(infer_field(['-007']), {"type": "Text"})
+        # more digits than a Wave numeric holds
+        self.assertEqual(infer_field(['1234567890123456789']), {"type": "Text"})
+        self.assertEqual(infer_field(['123456789012.1234567']), {"type": "Text"})
+        self.assertEqual(infer_field(['123456789012345678'])["precision"], 18)
+
+    def test_infer_date(self):
+        self.assertEqual(infer_field(['2020-01-31', '2019-12-01']), {"type": "Date", "format": "yyyy-MM-dd"})
+        self.assertEqual(infer_field(['2020-01-31 10:00:00']), {"type": "Date", "format": "yyyy-MM-dd HH:mm:ss"})
+        self.assertEqual(infer_field(['01/31/2020']), {"type": "Date", "format": "MM/dd/yyyy"})
+        # an impossible month is not a date
+        self.assertEqual(infer_field(['2020-13-01']), {"type": "Text"})
+
+    def test_infer_text(self):
+        self.assertEqual(infer_field(['1', 'a']), {"type": "Text"})
+        self.assertEqual(infer_field(['', ' ']), {"type": "Text"})
+        self.assertEqual(infer_field(['1\n2']), {"type": "Text"})
+
+    def test_field_name(self):
+        self.assertEqual(field_name('Sales Amount'), 'Sales_Amount')
+        self.assertEqual(field_name('2010pop'), 'X2010pop')
+
+    def test_sample_rows(self):
+        with open(self.csv_file, 'w') as f:
+            f.write('id\n' + ''.join('%d\n' % i for i in range(1000)))
+        header, rows = sample_rows(self.csv_file, 10)
+        self.assertEqual(header, ['id'])
+        self.assertEqual(len(rows), 10)
+        self.assertEqual(sample_rows(self.csv_file, 10), (header, rows))
+
+    def test_write_metadata_template(self):
+        with open(self.csv_file, 'w') as f:
+            f.write('Region,Population,Updated\nWest,100,2020-01-01\n"East, North",2500,2020-02-01\n')
+        template = os.path.join(self.tmp_dir, 'metadata_template_demo.json')
+        write_metadata_template(self.csv_file, 'demo', template)
+        with open(template) as f:
+            metadata = json.load(f)
+        self.assertEqual(metadata, infer_metadata(self.csv_file, 'demo'))
+        self.assertEqual(metadata["fileFormat"]["numberOfLinesToIgnore"], 1)
+        fields = metadata["objects"][0]["fields"]
+        self.assertEqual([(f["name"], f["type"]) for f in fields],
+                         [("Region", "Text"), ("Population", "Numeric"), ("Updated", "Date")])
+        self.assertEqual(fields[1]["fullyQualifiedName"], "demo.Population")
+        self.assertFalse(fields[0]["isUniqueId"])
+
+
+if __name__ == '__main__':
+    unittest.main()
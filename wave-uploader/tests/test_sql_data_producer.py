@@ -0,0 +1,164 @@
+"""
+Copyright (c) 2018, Salesforce.com, Inc.
+All rights reserved.
+
+Redistribution and use in source and binary forms, with or without modification, are permitted provided that the following conditions are met:
+
+* Redistributions of source code must retain the above copyright notice, this list of conditions and the following disclaimer.
+
+* Redistributions in binary form must reproduce the above copyright notice, this list of conditions and the following disclaimer in the documentation and/or other materials provided with the distribution.
+
+* Neither the name of Salesforce.com nor the names of its contributors may be used to endorse or promote products derived from this software without specific prior written permission.
+
+THIS SOFTWARE IS PROVIDED BY THE COPYRIGHT HOLDERS AND CONTRIBUTORS "AS IS" AND ANY EXPRESS OR IMPLIED WARRANTIES, INCLUDING, BUT NOT LIMITED TO, THE IMPLIED WARRANTIES OF MERCHANTABILITY AND FITNESS FOR A PARTICULAR PURPOSE ARE DISCLAIMED. IN NO EVENT SHALL THE COPYRIGHT HOLDER OR CONTRIBUTORS BE LIABLE FOR ANY DIRECT, INDIRECT, INCIDENTAL, SPECIAL, EXEMPLARY, OR CONSEQUENTIAL DAMAGES (INCLUDING, BUT NOT LIMITED TO, PROCUREMENT OF SUBSTITUTE GOODS OR SERVICES; LOSS OF USE, DATA, OR PROFITS; OR BUSINESS INTERRUPTION) HOWEVER CAUSED AND ON ANY THEORY OF LIABILITY, WHETHER IN CONTRACT, STRICT LIABILITY, OR TORT (INCLUDING NEGLIGENCE OR OTHERWISE) ARISING IN ANY WAY OUT OF THE USE OF THIS SOFTWARE, EVEN IF ADVISED OF THE POSSIBILITY OF SUCH DAMAGE.
+"""
+
+# -*- coding: utf-8 -*-
+import os
+import shutil
+import tempfile
+import unittest
+from mock import Mock, patch
+from wave_uploader.sql_data_producer import SqlWaveDataProducer, partition_bounds, read_watermark
+from wave_common.utils import stitch_csv_files
+
+
+class FakeSqlProducer(SqlWaveDataProducer):
+    def __init__(self, dbConfig):
+        super().__init__(dbConfig)
+        self.headers = ['year', 'value']
+
+    def query(self):
+        return 'select year, value from facts;'
+
+    def name(self):
+        return 'FakeSqlProducer'
+
+
+def fake_connector():
+    connector = Mock()
+    connector.execute_query.return_value = ([(2000, 2009)], ['min', 'max'])
+    connector.stream_query.side_effect = lambda query, params=None: (iter([[(query[-4:], 1)]]), ['year', 'value'])
+    return connector
+
+
+class SqlWaveDataProducerTest(unittest.TestCase):
+    def setUp(self):
+        self.tmp_dir = tempfile.mkdtemp()
+        self.connector = fake_connector()
+        patcher = patch('wave_uploader.sql_data_producer.connection_pool')
+        self.pool = patcher.start()
+        self.addCleanup(patcher.stop)
+        self.pool.acquire.return_value = self.connector
+        self.pool.connection.return_value.__enter__.return_value = self.connector
+
+    def tearDown(self):
+        shutil.rmtree(self.tmp_dir)
+
+    def read_output(self):
+        files = os.listdir(self.tmp_dir)
+        self.assertEqual(len(files), 1)
+        with open(os.path.join(self.tmp_dir, files[0])) as f:
+            return f.read()
+
+    def test_partition_bounds(self):
+        self.assertEqual(partition_bounds(0, 10, 4), [0, 2, 5, 7, 10])
+        self.assertEqual(partition_bounds(1, 3, 4), [1, 2, 3])
+        self.assertEqual(partition_bounds(5, 5, 4), [5, 5])
+        self.assertEqual(partition_bounds(0.0, 1.0, 2), [0.0, 0.5, 1.0])
+
+    def test_stitch_csv_files(self):
+        slices = []
+        for i, content in enumerate([b'h\r\n1\r\n', b'h\r\n2\r\n3\r\n', b'h\r\n']):
+            slices.append(os.path.join(self.tmp_dir, 'slice%d' % i))
+            with open(slices[-1], 'wb') as f:
+                f.write(content)
+        stitch_csv_files(slices, os.path.join(self.tmp_dir, 'out.csv'))
+        self.assertEqual(self.read_output(), 'h\n1\n2\n3\n')
+
+    def test_pull(self):
+        producer = FakeSqlProducer(Mock())
+        producer.pull(self.tmp_dir)
+        self.assertEqual(self.read_output(), 'year,value\ncts;,1\n')
+        self.connector.stream_query.assert_called_once_with('select year, value from facts;', params=None)
+
+        producer.close()
+        self.pool.release.assert_called_once_with(producer.dbConfig, self.connector)
+
+    def test_pull_partitioned(self):
+        producer = FakeSqlProducer(Mock())
+        producer.partition_column = 'year'
+        producer.partitions = 3
+        producer.pull(self.tmp_dir)
+
+        queries = sorted(c[0][0] for c in self.connector.stream_query.call_args_list)
+        subquery = 'select * from (select year, value from facts) wave_slice where '
+        self.assertEqual(queries, [
+            subquery + '(year >= 2000 and year < 2003) or year is null',
+            subquery + 'year >= 2003 and year < 2006',
+            subquery + 'year >= 2006 and year <= 2009'])
+        self.assertEqual(self.pool.connection.call_count, 3)
+        # slices are stitched in range order under one header
+        self.assertEqual(self.read_output(), 'year,value\nnull,1\n2006,1\n2009,1\n')
+
+    def test_pull_partitioned_copy_export(self):
+        producer = FakeSqlProducer(Mock())
+        producer.partition_column = 'year'
+        producer.partitions = 2
+        producer.copy_export = True
+
+        def copy_query_to_file(query, file_name, header=None, params=None):
+            with open(file_name, 'w') as f:
+                f.write(','.join(header) + '\n' + query[-4:] + '\n')
+        self.connector.copy_query_to_file.side_effect = copy_query_to_file
+        producer.pull(self.tmp_dir)
+        self.assertEqual(self.read_output(), 'year,value\nnull\n2009\n')
+
+
+    def test_pull_incremental(self):
+        producer = FakeSqlProducer(Mock())
+        producer.watermark_column = 'year'
+        producer.watermark_file = os.path.join(self.tmp_dir, 'watermark')
+        base = 'select * from (select year, value from facts) wave_incremental'
+        data_folder = os.path.join(self.tmp_dir, 'data')
+
+        # the first run extracts everything up to the current maximum
+        producer.pull(data_folder)
+        self.connector.execute_query.assert_called_once_with(
+            'select max(year) from (' + base + ') wave_watermark', None)
+        self.connector.stream_query.assert_called_once_with(
+            base + ' where year <= %(high_watermark)s', params={'high_watermark': '2000'})
+        self.assertIsNone(read_watermark(producer.watermark_file))
+
+        producer.commit()
+        self.assertEqual(read_watermark(producer.watermark_file), '2000')
+
+        # the next run only extracts the newer rows
+        self.connector.execute_query.return_value = ([(2005,)], ['max'])
+        producer.pull(data_folder)
+        self.connector.stream_query.assert_called_with(
+            base + ' where year > %(low_watermark)s and year <= %(high_watermark)s',
+            params={'low_watermark': '2000', 'high_watermark': '2005'})
+
+        # a failed upload is not committed, so the same rows are extracted again
+        producer.pull(data_folder)
+        self.connector.stream_query.assert_called_with(
+            base + ' where year > %(low_watermark)s and year <= %(high_watermark)s',
+            params={'low_watermark': '2000', 'high_watermark': '2005'})
+        producer.commit()
+        self.assertEqual(read_watermark(producer.watermark_file), '2005')
+
+        # no new rows extracts nothing and keeps the watermark
+        self.connector.execute_query.return_value = ([(None,)], ['max'])
+        self.connector.stream_query.reset_mock()
+        files = sorted(os.listdir(data_folder))
+        producer.pull(data_folder)
+        self.assertEqual(sorted(os.listdir(data_folder)), files)
+        self.assertEqual(list(producer.stream()), [])
+        self.connector.stream_query.assert_not_called()
+        producer.commit()
+        self.assertEqual(read_watermark(producer.watermark_file), '2005')
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,65 @@
+"""
+Copyright (c) 2018, Salesforce.com, Inc.
+All rights reserved.
+
+Redistribution and use in source and binary forms, with or without modification, are permitted provided that the following conditions are met:
+
+* Redistributions of source code must retain the above copyright notice, this list of conditions and the following disclaimer.
+
+* Redistributions in binary form must reproduce the above copyright notice, this list of conditions and the following disclaimer in the documentation and/or other materials provided with the distribution.
+
+* Neither the name of Salesforce.com nor the names of its contributors may be used to endorse or promote products derived from this software without specific prior written permission.
+
+THIS SOFTWARE IS PROVIDED BY THE COPYRIGHT HOLDERS AND CONTRIBUTORS "AS IS" AND ANY EXPRESS OR IMPLIED WARRANTIES, INCLUDING, BUT NOT LIMITED TO, THE IMPLIED WARRANTIES OF MERCHANTABILITY AND FITNESS FOR A PARTICULAR PURPOSE ARE DISCLAIMED. IN NO EVENT SHALL THE COPYRIGHT HOLDER OR CONTRIBUTORS BE LIABLE FOR ANY DIRECT, INDIRECT, INCIDENTAL, SPECIAL, EXEMPLARY, OR CONSEQUENTIAL DAMAGES (INCLUDING, BUT NOT LIMITED TO, PROCUREMENT OF SUBSTITUTE GOODS OR SERVICES; LOSS OF USE, DATA, OR PROFITS; OR BUSINESS INTERRUPTION) HOWEVER CAUSED AND ON ANY THEORY OF LIABILITY, WHETHER IN CONTRACT, STRICT LIABILITY, OR TORT (INCLUDING NEGLIGENCE OR OTHERWISE) ARISING IN ANY WAY OUT OF THE USE OF THIS SOFTWARE, EVEN IF ADVISED OF THE POSSIBILITY OF SUCH DAMAGE.
+"""
+# -*- coding: utf-8 -*-
+
+
+import os
+import sys
+import unittest
+from configparser import ConfigParser
+sys.path.append(os.path.join(os.path.dirname(os.path.realpath(__file__)), '..', 'wave_uploader'))
+from uploader_config import Setup
+
+
+class SetupTest(unittest.TestCase):
+    def setUp(self):
+        self.config = ConfigParser()
+        self.config.read_dict({'Setup': {'dataProducers': 'testData1', 'endpoint': 'https://test.salesforce.com',
+                                         'rootPath': '.', 'dataFolder': 'data', 'authUrl': 'auth_url',
+                                         'resourceUrl': '/services/data/v47.0', 'is_verify_upload': 'true'}})
+
+    def testDefaults(self):
+        setup = Setup(self.config)
+        self.assertEqual(setup.upload_compression, 'none')
+        self.assertEqual(setup.upload_part_encoding, 'base64')
+
+    def testUploadCompression(self):
+        self.config.set('Setup', 'upload_compression', 'gzip')
+        self.assertEqual(Setup(self.config).upload_compression, 'gzip')
+
+        self.config.set('Setup', 'upload_compression', 'gzp')
+        with self.assertRaises(SystemExit):
+            Setup(self.config)
+
+    def testUploadPartEncoding(self):
+        self.config.set('Setup', 'upload_part_encoding', 'multipart')
+        self.assertEqual(Setup(self.config).upload_part_encoding, 'multipart')
+
+        self.config.set('Setup', 'upload_part_encoding', 'form-data')
+        with self.assertRaises(SystemExit):
+            Setup(self.config)
+
+    def testSkipUnchangedNeedsVerify(self):
+        self.config.set('Setup', 'skip_unchanged', 'true')
+        self.assertTrue(Setup(self.config).skip_unchanged)
+
+        # without verification a failed job would be skipped as unchanged by the next run
+        self.config.set('Setup', 'is_verify_upload', 'false')
+        with self.assertRaises(SystemExit):
+            Setup(self.config)
+
+
+if __name__ == '__main__':
+    unittest.main()
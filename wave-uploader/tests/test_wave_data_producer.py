@@ -0,0 +1,53 @@
+"""
+Copyright (c) 2018, Salesforce.com, Inc.
+All rights reserved.
+
+Redistribution and use in source and binary forms, with or without modification, are permitted provided that the following conditions are met:
+
+* Redistributions of source code must retain the above copyright notice, this list of conditions and the following disclaimer.
+
+* Redistributions in binary form must reproduce the above copyright notice, this list of conditions and the following disclaimer in the documentation and/or other materials provided with the distribution.
+
+* Neither the name of Salesforce.com nor the names of its contributors may be used to endorse or promote products derived from this software without specific prior written permission.
+
+THIS SOFTWARE IS PROVIDED BY THE COPYRIGHT HOLDERS AND CONTRIBUTORS "AS IS" AND ANY EXPRESS OR IMPLIED WARRANTIES, INCLUDING, BUT NOT LIMITED TO, THE IMPLIED WARRANTIES OF MERCHANTABILITY AND FITNESS FOR A PARTICULAR PURPOSE ARE DISCLAIMED. IN NO EVENT SHALL THE COPYRIGHT HOLDER OR CONTRIBUTORS BE LIABLE FOR ANY DIRECT, INDIRECT, INCIDENTAL, SPECIAL, EXEMPLARY, OR CONSEQUENTIAL DAMAGES (INCLUDING, BUT NOT LIMITED TO, PROCUREMENT OF SUBSTITUTE GOODS OR SERVICES; LOSS OF USE, DATA, OR PROFITS; OR BUSINESS INTERRUPTION) HOWEVER CAUSED AND ON ANY THEORY OF LIABILITY, WHETHER IN CONTRACT, STRICT LIABILITY, OR TORT (INCLUDING NEGLIGENCE OR OTHERWISE) ARISING IN ANY WAY OUT OF THE USE OF THIS SOFTWARE, EVEN IF ADVISED OF THE POSSIBILITY OF SUCH DAMAGE.
+"""
+
+# -*- coding: utf-8 -*-
+
+import os
+import shutil
+import tempfile
+import unittest
+from wave_uploader.wave_data_producer import StreamingWaveDataProducer, csv_chunks
+
+
+class FakeStreamingProducer(StreamingWaveDataProducer):
+    def stream(self):
+        return csv_chunks(['col1', 'col2'], [[(1, 'a'), (2, 'b')], [(3, 'c,d')]])
+
+    def name(self):
+        return 'FakeStreamingProducer'
+
+
+class StreamingWaveDataProducerTest(unittest.TestCase):
+    def setUp(self):
+        self.tmp_dir = tempfile.mkdtemp()
+
+    def tearDown(self):
+        shutil.rmtree(self.tmp_dir)
+
+    def test_csv_chunks(self):
+        chunks = list(FakeStreamingProducer().stream())
+        self.assertEqual(chunks, [b'col1,col2\r\n', b'1,a\r\n2,b\r\n', b'3,"c,d"\r\n'])
+
+    def test_pull_writes_stream(self):
+        FakeStreamingProducer().pull(self.tmp_dir)
+        files = os.listdir(self.tmp_dir)
+        self.assertEqual(len(files), 1)
+        with open(os.path.join(self.tmp_dir, files[0]), 'rb') as f:
+            self.assertEqual(f.read(), b'col1,col2\r\n1,a\r\n2,b\r\n3,"c,d"\r\n')
+
+
+if __name__ == '__main__':
+    unittest.main()
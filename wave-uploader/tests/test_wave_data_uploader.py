@@ -15,18 +15,30 @@ THIS SOFTWARE IS PROVIDED BY THE COPYRIGHT HOLDERS AND CONTRIBUTORS "AS IS" AND
 
 # -*- coding: utf-8 -*-
 
+import json
+import os
+import shutil
+import sys
+import tempfile
+import threading
 import unittest
 from mock import Mock, patch, MagicMock
 from wave_common.utils import get_current_file_path, save_file, create_dirs
-from wave_uploader.wave_data_uploader import WaveDataUploader
+sys.path.append(os.path.join(os.path.dirname(os.path.realpath(__file__)), '..', 'wave_uploader'))
+from uploader import WaveDataUploader
 
 class TestWaveDataUploader(unittest.TestCase):
     def setUp(self):
         self._dataUploader = WaveDataUploader(
             get_current_file_path(__file__) + "/../tests/test.ini", 'Overwrite')
+        self._dataUploader._wave_connector = Mock()
+        self._patchers = [patch('uploader.pendingUploads', return_value=[]), patch('uploader.subprocess')]
+        for patcher in self._patchers:
+            patcher.start()
 
     def tearDown(self):
-        pass
+        for patcher in self._patchers:
+            patcher.stop()
 
     def testExecuteOneProducer(self):
         mock_wave_uploader = Mock()
@@ -49,9 +61,9 @@ class TestWaveDataUploader(unittest.TestCase):
 
         self._dataUploader._producerConfigs = []
         self._dataUploader._producerConfigs.append(
-            MagicMock(producer=mock_producer1))
+            MagicMock(producer=mock_producer1, pipeline=False, rowDelta=None))
         self._dataUploader._producerConfigs.append(
-            MagicMock(producer=mock_producer2))
+            MagicMock(producer=mock_producer2, pipeline=False, rowDelta=None))
 
         with patch.object(self._dataUploader, '_waveUploader', return_value=mock_wave_uploader) as mock_method:
             self._dataUploader.execute()
@@ -59,5 +71,140 @@ class TestWaveDataUploader(unittest.TestCase):
             mock_producer2.pull.assert_called_once()
             self.assertEqual(mock_wave_uploader.uploadCsv.call_count, 2)
 
+    def testExecutePipelinedProducer(self):
+        mock_wave_uploader = Mock()
+        mock_producer = Mock(**{'name.return_value': 'mock_producer', 'stream.return_value': iter([b'a,b\n'])})
+        self._dataUploader._producerConfigs = [MagicMock(producer=mock_producer, pipeline=True, rowDelta=None)]
+
+        with patch.object(self._dataUploader, '_waveUploader', return_value=mock_wave_uploader):
+            self.assertTrue(self._dataUploader.execute())
+        mock_producer.pull.assert_not_called()
+        mock_wave_uploader.uploadCsv.assert_not_called()
+        mock_wave_uploader.uploadStream.assert_called_once()
+
+    def testExecuteProducersInParallel(self):
+        self._dataUploader._setup.producer_concurrency = 2
+        barrier = threading.Barrier(2, timeout=5)
+        attrs = {'name.return_value': 'mock_producer', 'pull.side_effect': lambda folder: barrier.wait()}
+        self._dataUploader._producerConfigs = [MagicMock(producer=Mock(**attrs), pipeline=False, rowDelta=None),
+                                                MagicMock(producer=Mock(**attrs), pipeline=False, rowDelta=None)]
+
+        with patch.object(self._dataUploader, '_waveUploader', return_value=Mock()):
+            # both pulls only return once they run at the same time
+            self.assertTrue(self._dataUploader.execute())
+        self.assertFalse(barrier.broken)
+
+    def testExecuteReportsFailedProducer(self):
+        mock_wave_uploader = Mock()
+        failing_producer = Mock(**{'name.return_value': 'failing', 'pull.side_effect': Exception('pull failed')})
+        good_producer = Mock(**{'name.return_value': 'good'})
+        self._dataUploader._producerConfigs = [MagicMock(producer=failing_producer, pipeline=False, rowDelta=None),
+                                                MagicMock(producer=good_producer, pipeline=False, rowDelta=None)]
+        self._dataUploader._producerConfigs[0].name = 'failing'
+        self._dataUploader._producerConfigs[1].name = 'good'
+
+        with patch.object(self._dataUploader, '_waveUploader', return_value=mock_wave_uploader):
+            with self.assertRaises(SystemExit):
+                self._dataUploader.execute()
+        good_producer.pull.assert_called_once()
+        self.assertEqual(mock_wave_uploader.uploadCsv.call_count, 1)
+        # the failing producer still releases its resources, but keeps its progress
+        failing_producer.commit.assert_not_called()
+        failing_producer.close.assert_called_once()
+        good_producer.close.assert_called_once()
+
+    def testExecuteClosesConnectionPool(self):
+        mock_producer = Mock(**{'name.return_value': 'mock_producer'})
+        self._dataUploader._producerConfigs = [MagicMock(producer=mock_producer, pipeline=False, rowDelta=None)]
+
+        with patch.object(self._dataUploader, '_waveUploader', return_value=Mock()), \
+                patch('uploader.connection_pool') as mock_pool:
+            self.assertTrue(self._dataUploader.execute())
+        mock_producer.open.assert_called_once()
+        mock_producer.commit.assert_called_once()
+        mock_producer.close.assert_called_once()
+        mock_pool.close_all.assert_called_once()
+
+    def testExecuteFiltersRowDelta(self):
+        data_folder = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, data_folder)
+        save_file(data_folder + '/data.csv', 'id\n1\n')
+        mock_producer = Mock(**{'name.return_value': 'mock_producer'})
+        row_delta = Mock(**{'filter.return_value': (1, 0)})
+        config = MagicMock(producer=mock_producer, pipeline=False, rowDelta=row_delta)
+        config.dataConfig.dataFolder = data_folder
+        self._dataUploader._producerConfigs = [config]
+        self._dataUploader._uploadMode = 'Append'
+
+        with patch.object(self._dataUploader, '_waveUploader', return_value=Mock()):
+            self.assertTrue(self._dataUploader.execute())
+        row_delta.discard_pending.assert_called_once()
+        row_delta.filter.assert_called_once_with(data_folder + '/data.csv', True)
+        row_delta.commit.assert_called_once()
+
+    def testExecuteSkipsFileWithoutNewRows(self):
+        data_folder = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, data_folder)
+        save_file(data_folder + '/data.csv', 'id\n1\n')
+        row_delta = Mock(**{'filter.return_value': (0, 1)})
+        config = MagicMock(producer=Mock(**{'name.return_value': 'mock_producer'}), pipeline=False, rowDelta=row_delta)
+        config.dataConfig.dataFolder = data_folder
+        self._dataUploader._producerConfigs = [config]
+        self._dataUploader._uploadMode = 'Append'
+
+        with patch.object(self._dataUploader, '_waveUploader', return_value=Mock()):
+            self.assertTrue(self._dataUploader.execute())
+        self.assertEqual(os.listdir(data_folder), [])
+
+    def testExecuteInfersMissingMetadata(self):
+        data_folder = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, data_folder)
+        save_file(data_folder + '/data.csv', 'id,amount\na,1.5\n')
+        template = data_folder + '/metadata_template_TestData.json'
+        config = MagicMock(producer=Mock(**{'name.return_value': 'mock_producer'}), pipeline=False, rowDelta=None)
+        config.dataConfig.dataFolder = data_folder
+        config.dataset = 'TestData'
+        self._dataUploader._producerConfigs = [config]
+        self._dataUploader._setup.infer_metadata = True
+
+        with patch.object(self._dataUploader, '_waveUploader', return_value=Mock()), \
+                patch('uploader.metadataTemplate', return_value=template):
+            self.assertTrue(self._dataUploader.execute())
+        with open(template) as f:
+            fields = json.load(f)['objects'][0]['fields']
+        self.assertEqual([field['type'] for field in fields], ['Text', 'Numeric'])
+
+    def testUpsertNeedsUniqueIdMetadata(self):
+        # the test dataset has no metadata template
+        with self.assertRaises(SystemExit):
+            WaveDataUploader(get_current_file_path(__file__) + "/../tests/test.ini", 'Upsert')
+        with patch('uploader.checkUpsertMetadata', return_value='Id') as mock_check:
+            WaveDataUploader(get_current_file_path(__file__) + "/../tests/test.ini", 'Upsert')
+        mock_check.assert_called_once_with('TestData')
+
+    def _producer_config(self, options):
+        """
+        :return: a copy of the test config with the options added to the testData producer
+        """
+        with open(get_current_file_path(__file__) + "/../tests/test.ini") as f:
+            config = f.read() + options
+        config_folder = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, config_folder)
+        save_file(config_folder + '/test.ini', config)
+        return config_folder + '/test.ini'
+
+    def testOverwriteRejectsWatermark(self):
+        configFile = self._producer_config('watermark_column=year\n')
+        # an incremental extract only holds the new rows, it cannot replace the dataset
+        with self.assertRaises(SystemExit):
+            WaveDataUploader(configFile, 'Overwrite')
+        WaveDataUploader(configFile, 'Append')
+
+    def testUpsertRejectsRowDeltaKeys(self):
+        with patch('uploader.checkUpsertMetadata', return_value='Id'):
+            with self.assertRaises(SystemExit):
+                WaveDataUploader(self._producer_config('row_delta=true\nrow_delta_keys=id\n'), 'Upsert')
+            WaveDataUploader(self._producer_config('row_delta=true\n'), 'Upsert')
+
 if __name__ == '__main__':
     unittest.main()
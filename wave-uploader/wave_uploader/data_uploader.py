@@ -22,18 +22,41 @@ This module provides a WaveUploader object to upload the saved csv data into Wav
 """
 import os
 import subprocess
-import urllib
-from urllib import request
 import json
 import base64
+import gzip
+import hashlib
+import shutil
 import time
-import sys
-from datetime import datetime, timedelta
+import threading
+import uuid
+import itertools
+from collections import namedtuple
+from concurrent.futures import ThreadPoolExecutor, FIRST_COMPLETED, wait
+import requests
 from wave_common import utils
 from wave_common import JsonUtils
 
 MB_CONVERSION = 1024*1024
 SEGMENT_MEGABYTES = 8 * MB_CONVERSION
+RETRY_BACKOFF_SECONDS = 2
+NO_COMPRESSION = 'none'
+GZIP_COMPRESSION = 'gzip'
+UPLOAD_COMPRESSIONS = (NO_COMPRESSION, GZIP_COMPRESSION)
+BASE64_ENCODING = 'base64'
+MULTIPART_ENCODING = 'multipart'
+PART_ENCODINGS = (BASE64_ENCODING, MULTIPART_ENCODING)
+MANIFEST_SUFFIX = '.manifest'
+FINGERPRINT_SUFFIX = '.fingerprint'
+# InsightsExternalData Status values after which a job does not change anymore
+COMPLETED_STATUSES = ('Completed', 'CompletedWithWarnings')
+FAILED_STATUSES = ('Failed', 'NotProcessed')
+# Status of a job whose Process action was not received yet
+NEW_STATUS = 'New'
+STATUS_QUERY_BATCH = 100
+UPSERT_OPERATION = 'Upsert'
+# metadata templates of the datasets, metadata_template_<dataset>.json
+METADATA_FOLDER = os.path.realpath(os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'metadata'))
 
 def erroCsv(csvFile):
     """
@@ -43,6 +66,49 @@ def erroCsv(csvFile):
     """
     return csvFile.replace('.csv', '_err.csv')
 
+def gzipFile(csvFile):
+    """
+    Rename the csv file with gzip extension
+    :param csvFile: input csv file name
+    :return: new file name
+    """
+    return csvFile + '.gz'
+
+def manifestFile(csvFile):
+    """
+    Rename the csv file with upload manifest notation
+    :param csvFile: input csv file name
+    :return: new file name
+    """
+    return csvFile + MANIFEST_SUFFIX
+
+def pendingUploads(dataFolder):
+    """
+    List the csv files of a data folder which still have an unfinished upload manifest.
+    :param dataFolder: producer data folder
+    :return: list of csv file names
+    """
+    pending = []
+    for dataFile in sorted(os.listdir(dataFolder)):
+        if dataFile.endswith(MANIFEST_SUFFIX):
+            csvFile = os.path.join(dataFolder, dataFile[:-len(MANIFEST_SUFFIX)])
+            if os.path.isfile(csvFile):
+                pending.append(csvFile)
+    return pending
+
+def fileFingerprint(csvFile, digest=None):
+    """
+    Hash the file in blocks, so large csv files are never read into memory at once.
+    :param csvFile: input csv file name
+    :param digest: optional hashlib object already fed with other inputs
+    :return: hex digest
+    """
+    digest = digest or hashlib.sha256()
+    with open(csvFile, 'rb') as f:
+        for block in iter(lambda: f.read(MB_CONVERSION), b''):
+            digest.update(block)
+    return digest.hexdigest()
+
 def schemaFile(csvFile):
     """
     Rename the csv file with schema notation and change to json file
@@ -51,6 +117,320 @@ def schemaFile(csvFile):
     """
     return csvFile.replace('.csv', '_schema.json')
 
+def metadataTemplate(dataset):
+    """
+    :param dataset: dataset name
+    :return: the metadata template file of the dataset under the metadata folder, it may not exist
+    """
+    return os.path.join(METADATA_FOLDER, "metadata_template_" + dataset + ".json")
+
+def metadataObjectName(csvFile):
+    """
+    Name of the metadata object of a csv file, from its base name without extension.
+    :param csvFile: csv file name
+    :return: object name
+    """
+    return "X" + os.path.basename(csvFile).replace(".csv", "").replace("-", "_")
+
+class MetadataCache:
+    """
+    Process wide cache of the metadata templates. A template is parsed once and reloaded only
+    when the modification time or the size of its file changes. The MetadataJson of every csv file is built from the parsed template,
+    csv file names are timestamped so their encodings are not kept.
+    """
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._templates = {}
+
+    def template(self, template):
+        """
+        :param template: metadata template file
+        :return: the parsed template, shared so it must not be modified, None if there is no template
+        """
+        try:
+            stat = os.stat(template)
+        except OSError:
+            return None
+        version = (stat.st_mtime, stat.st_size)
+        with self._lock:
+            cached = self._templates.get(template)
+            if cached is None or cached[0] != version:
+                with open(template, 'r') as f:
+                    cached = (version, json.load(f))
+                self._templates[template] = cached
+            return cached[1]
+
+    def metadata(self, template, objectName):
+        """
+        :param template: metadata template file
+        :param objectName: name of the metadata object
+        :return: metadata json and its base64 encoding, None if there is no template
+        """
+        parsed = self.template(template)
+        if parsed is None:
+            return None
+        data = dict(parsed)
+        data["objects"] = [dict(metadataObject) for metadataObject in data["objects"]]
+        data["objects"][0]["fullyQualifiedName"] = objectName
+        data["objects"][0]["name"] = objectName
+        data["objects"][0]["label"] = objectName
+        data["objects"][0]["description"] = objectName
+        metadataJson = json.dumps(data)
+        return metadataJson, base64.b64encode(metadataJson.encode('utf-8')).decode()
+
+metadata_cache = MetadataCache()
+
+def uniqueIdFields(metadata):
+    """
+    :param metadata: metadata json, type dict
+    :return: list of the fields declared with isUniqueId
+    """
+    return [field for metadataObject in metadata.get("objects", [])
+            for field in metadataObject.get("fields", []) if field.get("isUniqueId")]
+
+def checkUpsertMetadata(dataset):
+    """
+    Upsert matches rows by the unique id field, so the metadata of the dataset must declare
+    exactly one, and it must be a Text field.
+    :param dataset: dataset name
+    :return: name of the unique id field
+    """
+    template = metadataTemplate(dataset)
+    metadata = metadata_cache.template(template)
+    if metadata is None:
+        raise Exception('Upsert needs the metadata template ' + template)
+    fields = uniqueIdFields(metadata)
+    if len(fields) != 1:
+        raise Exception('Upsert needs exactly one isUniqueId field in %s, found %d' % (template, len(fields)))
+    if fields[0].get("type") != "Text":
+        raise Exception('the isUniqueId field %s of %s must be of type Text' % (fields[0].get("name"), template))
+    return fields[0].get("name")
+
+# a byte range of a file sent as one data part
+FileSlice = namedtuple('FileSlice', ['fileName', 'offset', 'length'])
+
+class MultipartPartBody:
+    """
+    File-like multipart/form-data body of one InsightsExternalDataPart. The raw part bytes
+    are read straight from the file slice while the request is sent, so the part is neither
+    base64 encoded nor held in memory.
+    """
+    def __init__(self, fileSlice, parentId, partNumber):
+        self.boundary = uuid.uuid4().hex
+        entity = json.dumps({"InsightsExternalDataId": parentId, "PartNumber": partNumber})
+        self._head = ('--%s\r\n'
+                      'Content-Disposition: form-data; name="entity_content"\r\n'
+                      'Content-Type: application/json\r\n\r\n'
+                      '%s\r\n'
+                      '--%s\r\n'
+                      'Content-Disposition: form-data; name="DataFile"; filename="%s"\r\n'
+                      'Content-Type: application/octet-stream\r\n\r\n'
+                      % (self.boundary, entity, self.boundary, os.path.basename(fileSlice.fileName))).encode('utf-8')
+        self._tail = ('\r\n--%s--\r\n' % self.boundary).encode('ascii')
+        self._length = len(self._head) + fileSlice.length + len(self._tail)
+        self._file = open(fileSlice.fileName, 'rb')
+        self._file.seek(fileSlice.offset)
+        self._remaining = fileSlice.length
+        self._position = 0
+
+    def content_type(self):
+        return 'multipart/form-data; boundary=' + self.boundary
+
+    def __len__(self):
+        return self._length
+
+    def read(self, size=-1):
+        if size is None or size < 0:
+            size = self._length
+        out = bytearray()
+        while len(out) < size and self._position < self._length:
+            wanted = size - len(out)
+            if self._position < len(self._head):
+                chunk = self._head[self._position:self._position + wanted]
+            elif self._remaining > 0:
+                chunk = self._file.read(min(wanted, self._remaining))
+                if not chunk:
+                    raise IOError('%s is shorter than expected' % self._file.name)
+                self._remaining -= len(chunk)
+            else:
+                offset = self._position - (self._length - len(self._tail))
+                chunk = self._tail[offset:offset + wanted]
+            out += chunk
+            self._position += len(chunk)
+        return bytes(out)
+
+    def close(self):
+        self._file.close()
+
+class UploadManifest:
+    """
+    On-disk record of an upload in progress, kept next to the csv file. It holds the
+    InsightsExternalData id, the part size, a fingerprint of the source and the
+    acknowledged part numbers with their byte offsets, so an interrupted upload can
+    continue with the missing parts only. Once every part is sent it is marked processed
+    before Process is requested, so a resumed upload does not request it twice.
+    """
+    def __init__(self, csvFile):
+        self.fileName = manifestFile(csvFile)
+        self.parentId = None
+        self.partSize = SEGMENT_MEGABYTES
+        self.source = None
+        self.parts = {}
+        self.processed = False
+        self._lock = threading.Lock()
+
+    def load(self):
+        """
+        Load the manifest from disk.
+        :return: True if an unfinished upload was found
+        """
+        if not os.path.isfile(self.fileName):
+            return False
+        try:
+            with open(self.fileName, 'r') as f:
+                content = json.load(f)
+            self.parentId = content['InsightsExternalDataId']
+            self.partSize = content['partSize']
+            self.source = content['source']
+            self.parts = dict((int(k), v) for k, v in content['parts'].items())
+            self.processed = content.get('processed', False)
+        except (ValueError, KeyError) as e:
+            print('ignore unreadable manifest %s: %s' % (self.fileName, e))
+            return False
+        return True
+
+    def start(self, parentId, partSize, source):
+        self.parentId = parentId
+        self.partSize = partSize
+        self.source = source
+        self.parts = {}
+        self.processed = False
+        self._save()
+
+    def acknowledge(self, partNumber):
+        """
+        Record a part as acknowledged by Wave. Safe to call from upload worker threads.
+        :param partNumber: 1-based part number
+        """
+        with self._lock:
+            self.parts[partNumber] = (partNumber - 1) * self.partSize
+            self._save()
+
+    def markProcessed(self):
+        """
+        Record that all parts are sent and Process is about to be requested.
+        """
+        self.processed = True
+        self._save()
+
+    def remove(self):
+        if os.path.isfile(self.fileName):
+            os.remove(self.fileName)
+
+    def _save(self):
+        content = {
+            "InsightsExternalDataId": self.parentId,
+            "partSize": self.partSize,
+            "source": self.source,
+            "parts": dict((str(k), v) for k, v in sorted(self.parts.items())),
+            "processed": self.processed
+        }
+        # write then rename so a crash never leaves a half written manifest
+        tmpFile = self.fileName + '.tmp'
+        with open(tmpFile, 'w') as f:
+            json.dump(content, f)
+        os.replace(tmpFile, self.fileName)
+
+class UploadFingerprints:
+    """
+    On-disk record of the fingerprints of the csv files processed by the last successful
+    upload of a dataset. Files with one of these fingerprints do not need to be uploaded again.
+    """
+    def __init__(self, fileName):
+        self.fileName = fileName
+
+    def load(self):
+        """
+        :return: set of fingerprints, empty if there is no readable record
+        """
+        if not os.path.isfile(self.fileName):
+            return set()
+        try:
+            with open(self.fileName, 'r') as f:
+                return set(json.load(f)['fingerprints'])
+        except (ValueError, KeyError) as e:
+            print('ignore unreadable fingerprints %s: %s' % (self.fileName, e))
+            return set()
+
+    def save(self, fingerprints):
+        tmpFile = self.fileName + '.tmp'
+        with open(tmpFile, 'w') as f:
+            json.dump({"fingerprints": sorted(fingerprints)}, f)
+        os.replace(tmpFile, self.fileName)
+
+class JobTracker:
+    """
+    Track the InsightsExternalData jobs of a run until Wave finished processing them.
+    The Status of every outstanding job is read with one query per poll, polling fast
+    at first and backing off up to maxDelay while jobs are still running.
+    """
+    def __init__(self, wave_connector, query_url, initialDelay=2, maxDelay=60, backoff=2, timeout=3600):
+        self._wave_connector = wave_connector
+        self._query_url = query_url
+        self._initialDelay = initialDelay
+        self._maxDelay = maxDelay
+        self._backoff = backoff
+        self._timeout = timeout
+        self._pending = []
+        self.results = {}
+
+    def add(self, jobId):
+        self._pending.append(jobId)
+
+    def pending(self):
+        return list(self._pending)
+
+    def poll(self):
+        """
+        Read the Status of all outstanding jobs once.
+        :return: dict of job id to (Status, StatusMessage) for jobs finished by this poll
+        """
+        finished = {}
+        for i in range(0, len(self._pending), STATUS_QUERY_BATCH):
+            batch = self._pending[i:i + STATUS_QUERY_BATCH]
+            soql = "SELECT Id, Status, StatusMessage FROM InsightsExternalData WHERE Id IN ('%s')" % "','".join(batch)
+            response = self._wave_connector.send_request('GET', self._query_url, params={'q': soql})
+            utils.check_response(response)
+            for record in response.json()['records']:
+                if record['Status'] in COMPLETED_STATUSES + FAILED_STATUSES:
+                    # ids from the query are 18 chars, the ids we track may be the 15 char form
+                    jobId = next((j for j in batch if record['Id'].startswith(j)), record['Id'])
+                    finished[jobId] = (record['Status'], record.get('StatusMessage'))
+        self._pending = [j for j in self._pending if j not in finished]
+        self.results.update(finished)
+        return finished
+
+    def wait(self):
+        """
+        Poll until every job finished, with a growing delay between polls.
+        :return: dict of job id to (Status, StatusMessage)
+        """
+        delay = self._initialDelay
+        deadline = time.time() + self._timeout
+        while self._pending:
+            for jobId, (status, message) in self.poll().items():
+                print('job %s %s %s' % (jobId, status, message or ''))
+            if not self._pending:
+                break
+            if time.time() + delay > deadline:
+                raise Exception('Timeout waiting for jobs to complete: ' + ",".join(self._pending))
+            time.sleep(delay)
+            delay = min(delay * self._backoff, self._maxDelay)
+        return self.results
+
+    def failed(self):
+        return dict((j, r) for j, r in self.results.items() if r[0] in FAILED_STATUSES)
+
 class WaveUploader:
     def __init__(self, wave_connector, data_set_id, dataset, mode, dataConfig, setup):
         # self._loginInfo = loginInfo
@@ -111,106 +491,133 @@ class WaveUploader:
         throw HttpError to be caught
         :param toBeProcessedFile:
         :param access_token:
-        :return:
+        :return: InsightsExternalData id of the processed job
         """
         print('uploading .....%s' % toBeProcessedFile)
 
-        #create an InsightsExternalData object
-        base64_meta_json = None
+        headers = {'Authorization': 'Bearer ' + access_token, 
+                    'Content-Type': 'application/json'}
+
+        # continue an interrupted upload of the same file, else create a new InsightsExternalData object
+        manifest = UploadManifest(toBeProcessedFile)
+        source = self._manifest_source(toBeProcessedFile)
+        resume = manifest.load() and manifest.source == source
+        if resume and manifest.processed:
+            # Process was requested before the interruption, only request it again if Wave never received it
+            status = self._job_status(manifest.parentId)
+            if status is None:
+                print('upload %s is unknown to Wave, upload again' % manifest.parentId)
+                resume = False
+            elif status != NEW_STATUS:
+                print('upload %s was already sent to processing' % manifest.parentId)
+                manifest.remove()
+                return manifest.parentId
+
+        if resume:
+            insight_object_parent_id = manifest.parentId
+            print('resume upload %s, %d parts already sent' % (insight_object_parent_id, len(manifest.parts)))
+        else:
+            insight_object_parent_id = self._create_external_data(toBeProcessedFile)
+            manifest.start(insight_object_parent_id, SEGMENT_MEGABYTES, source)
+
+        if not manifest.processed:
+            #no need to convert metadata since the file is already uploaded to the dataset when it was created
+            file_size_in_mb = float(os.path.getsize(toBeProcessedFile))/float(MB_CONVERSION)
+            print(str(file_size_in_mb) + ' MB')
+
+            # Wave accepts gzip compressed data parts for the Csv format
+            partsFile = toBeProcessedFile
+            if self._setup.upload_compression == GZIP_COMPRESSION:
+                partsFile = self.compressFile(toBeProcessedFile)
+                print('compressed to ' + str(float(os.path.getsize(partsFile))/float(MB_CONVERSION)) + ' MB')
 
-        metaJSONdata = self._metadata_for_dataset(toBeProcessedFile)
+            self._upload_parts(headers, insight_object_parent_id, partsFile, manifest)
+            print('POST done')
 
-        if metaJSONdata is not None:
-            base64_meta_json = base64.b64encode(bytearray(metaJSONdata, 'UTF-8'))
+            if partsFile != toBeProcessedFile:
+                os.remove(partsFile)
+            manifest.markProcessed()
+
+        self.send_data_request(headers, insight_object_parent_id)
+        manifest.remove()
+        return insight_object_parent_id
+
+    def _job_status(self, parentId):
+        """
+        Read the Status of an InsightsExternalData job.
+        :param parentId: InsightsExternalData id
+        :return: Status, None if the job is not found
+        """
+        soql = "SELECT Id, Status FROM InsightsExternalData WHERE Id = '%s'" % parentId
+        response = self._wave_connector.send_request('GET', self._request_url() + "/query/", params={'q': soql})
+        utils.check_response(response)
+        records = response.json()['records']
+        return records[0]['Status'] if records else None
+
+    def _manifest_source(self, toBeProcessedFile):
+        """
+        Fingerprint of the csv file and the upload settings a manifest is valid for.
+        """
+        stat = os.stat(toBeProcessedFile)
+        return {
+            "size": stat.st_size,
+            "mtime": stat.st_mtime,
+            "operation": self._mode,
+            "compression": self._setup.upload_compression,
+            "encoding": self._setup.upload_part_encoding
+        }
+
+    def _create_external_data(self, toBeProcessedFile):
+        """
+        Create the InsightsExternalData object for the csv file.
+        :param toBeProcessedFile: csv file name
+        :return: InsightsExternalData id
+        """
+        metadata = self._metadata_for_dataset(toBeProcessedFile)
 
         insight_object_data = {
             "Format": "Csv",
             "EdgemartAlias": self._dataset,
             "Operation": self._mode,
             "Action": "none",
-            "MetadataJson": base64_meta_json.decode() if base64_meta_json is not None else ''
+            "MetadataJson": metadata[1] if metadata is not None else ''
         }
         # JsonUtils.pretty_print(insight_object_data)
         # insight_object_data = json.dumps(insight_object_data)
-        headers = {'Authorization': 'Bearer ' + access_token, 
-                    'Content-Type': 'application/json'}
-
-        insight_object_parent_id = self._wave_connector.postInsightsExternalData(insight_object_data)
-
-        #no need to convert metadata since the file is already uploaded to the dataset when it was created
-        file_size_in_mb = float(os.path.getsize(toBeProcessedFile))/float(MB_CONVERSION)
-        print(str(file_size_in_mb) + ' MB')
-
-        #if file is > 8 MB then split the file
-        if( file_size_in_mb > 8):
-            fileparts = self.splitFile(toBeProcessedFile)
-            for i in range(len(fileparts)):
-                base64data = fileparts[i]
-                json_content = {
-                    "DataFile": base64data.decode('ascii'),
-                    "InsightsExternalDataId": insight_object_parent_id,
-                    "PartNumber": i+1
-                }
-                req = request.Request(self._request_external_data_part_url(), headers=headers, data=json.dumps(json_content).encode('ascii'))
-                with request.urlopen(req) as response:
-                    insight_part_response = response.read()
-                    insight_object_response = json.loads(insight_part_response)
-                    if('id' not in insight_object_response):
-                        raise Exception('Something went wrong with creating the InsightsExternalData object -- see error: ' +
-                            str(insight_part_response))
+        return self._wave_connector.postInsightsExternalData(insight_object_data)
 
-        else:
-            data = utils.read_file(toBeProcessedFile)
-            # with open(toBeProcessedFile, 'r') as f:
-            #     data = f.read()
-
-            base64data = base64.b64encode(bytearray(data, 'UTF-8'))
-
-            json_content = {
-                "DataFile": base64data.decode('ascii'),
-                "InsightsExternalDataId": insight_object_parent_id,
-                "PartNumber": 1
-            }
-
-            req = request.Request(self._request_external_data_part_url(), headers=headers, data=json.dumps(json_content).encode('ascii'))
-            with request.urlopen(req) as response:
-                insight_part_response = response.read()
-                print('POST done')
-                insight_object_response = json.loads(insight_part_response)
-                if('id' not in insight_object_response):
-                    raise Exception('Something went wrong with creating the InsightsExternalData object -- see error: ' +
-                        str(response.read()))
-
-        self.send_data_request(headers, insight_object_parent_id)
+    def _metadata_template(self):
+        """
+        :return: the metadata template file of the dataset, it may not exist
+        """
+        return metadataTemplate(self._dataset)
 
     def _metadata_for_dataset(self, csv_name):
         """
         search metadata file under metadata folder, if found, replace name with csvname
         :param csv_name: csv file name
-        :return: meta data file under metadata folder
+        :return: metadata json and its base64 encoding, None if the dataset has no template
         """
-        json_file = "metadata_template_" + self._dataset + ".json"
-        # remove folder path, remove file extension, replace - with _
-        csv_name = csv_name.split("/")[4]
-        csv_name = csv_name.replace(".csv", "")
-        csv_name = csv_name.replace("-", "_")
-
-        path =  os.path.realpath(os.path.join(os.getcwd(), os.path.dirname(__file__))) + "/../metadata"
-        filedir = os.path.join(path, json_file)
-
-        print(filedir)
-
-        if not os.path.isfile(filedir):
-            return None
+        return metadata_cache.metadata(self._metadata_template(), metadataObjectName(csv_name))
 
-        with open(filedir, 'r') as f:
-            data = json.load(f)
-            data["objects"][0]["fullyQualifiedName"] = "X" + csv_name
-            data["objects"][0]["name"] = "X" + csv_name
-            data["objects"][0]["label"] = "X" + csv_name
-            data["objects"][0]["description"] = "X" + csv_name
+    def _fingerprints(self):
+        """
+        :return: the fingerprint record of the dataset, next to the producer data folder
+        """
+        return UploadFingerprints(os.path.join(os.path.dirname(self._dataConfig.dataFolder),
+                                               self._dataset + FINGERPRINT_SUFFIX))
 
-        return json.dumps(data)
+    def _fingerprint(self, toBeProcessedFile):
+        """
+        Fingerprint of the csv content together with the operation and the metadata template,
+        so a changed schema or mode is uploaded again.
+        """
+        digest = hashlib.sha256(self._mode.encode('utf-8'))
+        template = self._metadata_template()
+        if os.path.isfile(template):
+            with open(template, 'rb') as f:
+                digest.update(f.read())
+        return fileFingerprint(toBeProcessedFile, digest)
 
     def _request_url(self):
          return self._wave_connector.get_api_url() + self._setup.resource_url
@@ -227,81 +634,176 @@ class WaveUploader:
         data = {
             "Action": "Process"
         }
-        try:
-            req = request.Request(send_data_url, headers=headers, data=json.dumps(data).encode('ascii'), method='PATCH')
-            request.urlopen(req)
-        except urllib.error.HTTPError as e:
-            raise Exception('' + str(e.code) + " " + str(e.read()))
-
-    def splitFile(self, toBeProcessedFile):
-        fileparts = []
-
-        with open(toBeProcessedFile, 'r') as f:
-            byte = f.read(SEGMENT_MEGABYTES)
-            while byte != "":
-                encoded_str = base64.b64encode(bytes(byte, "UTF-8")) #converting to a base64 string
-                fileparts.append(encoded_str)
-                byte = f.read(SEGMENT_MEGABYTES) #reading the file 10mb at a time
-        return fileparts
-
-    def checkStatus(self, access_token, dataset_id):
-        if dataset_id is None:
-            raise Exception("please provide dataset_id for status check")
-
-        url = self._request_url() + "/wave/datasets/" + dataset_id
-        headers = {'Authorization': 'Bearer ' + access_token}
-        counter = 0
-
-        while counter <= 300:  #timeout after 5 minutes
-            try:
-                print('check dataset status %d'%counter)
-                req = request.Request(url, headers=headers)
-                with request.urlopen(req) as response:
-                    content = response.read()
-                    response_json = json.loads(content)
-                    # print(content)
-
-                    if("lastModifiedDate" not in response_json):
-                        raise Exception('Something went wrong with making the request -- see error: ' + str(insight_part_response))
-
-                    last_modified_date = response_json["lastModifiedDate"]
-
-                    last_modified_date_split = last_modified_date.split("T")
-                    last_modified_date = last_modified_date_split[0]
-                    last_modified_time = last_modified_date_split[1]
-                    last_modified_time = last_modified_time.split(".")[0]
-
-                    last_modified_date = last_modified_date + "T" + last_modified_time
-                    last_modified_date = datetime.strptime(last_modified_date, "%Y-%m-%dT%H:%M:%S")
-                    print("last modified:" + str(last_modified_date))
+        response = self._wave_connector.send_request('PATCH', send_data_url, headers=headers, data=json.dumps(data).encode('ascii'))
+        if response.status_code >= 400:
+            raise Exception('' + str(response.status_code) + " " + response.text)
 
-                    currdate = datetime.utcnow()
-                    print("currdate:" + str(currdate))
-
-                    difference = currdate - last_modified_date
-                    one_hour = timedelta(minutes=60)
+    def _upload_parts(self, headers, parentId, toBeProcessedFile, manifest):
+        """
+        Upload the parts of the file not yet acknowledged in the manifest.
+        :param headers: request headers with the access token
+        :param parentId: InsightsExternalData id
+        :param toBeProcessedFile: csv file name
+        :param manifest: UploadManifest recording the acknowledged parts
+        :return:
+        """
+        uploaded = set(manifest.parts)
+        if self._setup.upload_part_encoding == MULTIPART_ENCODING:
+            parts = ((partNumber, fileSlice)
+                     for partNumber, fileSlice in enumerate(self.sliceFile(toBeProcessedFile, manifest.partSize), start=1)
+                     if partNumber not in uploaded)
+        else:
+            parts = self.splitFile(toBeProcessedFile, manifest.partSize, uploaded)
+        self._send_parts(headers, parentId, parts, manifest.acknowledge)
 
-                    if(last_modified_date.date() == currdate.date()): #check that lastmodified is within an hour from current time
-                        if(difference <= one_hour):
-                            break
-                
-                time.sleep(120)
-                counter += 3
+    def _send_parts(self, headers, parentId, parts, acknowledge=None, background=False):
+        """
+        Post the parts produced by the given iterable. With upload_concurrency > 1, or in
+        background mode, the parts are posted by a bounded thread pool while the next part is
+        produced; at most upload_concurrency parts are read ahead so memory stays bounded.
+        Returns only after every part has been acknowledged, any failure is raised.
+        :param headers: request headers with the access token
+        :param parentId: InsightsExternalData id
+        :param parts: iterable of (part number, part data)
+        :param acknowledge: optional callback with the part number of every acknowledged part
+        :param background: post parts in a worker even with upload_concurrency 1
+        :return:
+        """
+        concurrency = max(1, self._setup.upload_concurrency)
+
+        def upload(partNumber, partData):
+            self._upload_part(headers, parentId, partNumber, partData)
+            if acknowledge is not None:
+                acknowledge(partNumber)
+
+        if concurrency == 1 and not background:
+            # parts are read, encoded and sent one at a time so only the current part stays in memory
+            for partNumber, partData in parts:
+                upload(partNumber, partData)
+            return
+
+        with ThreadPoolExecutor(max_workers=concurrency) as executor:
+            pending = set()
+            for partNumber, partData in parts:
+                if len(pending) >= concurrency:
+                    done, pending = wait(pending, return_when=FIRST_COMPLETED)
+                    for future in done:
+                        future.result()
+                pending.add(executor.submit(upload, partNumber, partData))
+            for future in wait(pending).done:
+                future.result()
+
+    def _post_part(self, headers, parentId, partNumber, partData):
+        """
+        Send one InsightsExternalDataPart request, either as json with base64 encoded
+        DataFile or as multipart/form-data streamed from a file slice.
+        :return: requests response
+        """
+        # parts share the pooled keep-alive connections of the wave connector
+        url = self._request_external_data_part_url()
+        if isinstance(partData, FileSlice):
+            body = MultipartPartBody(partData, parentId, partNumber)
+            multipart_headers = dict(headers)
+            multipart_headers['Content-Type'] = body.content_type()
+            try:
+                return self._wave_connector.send_request('POST', url, headers=multipart_headers, data=body)
+            finally:
+                body.close()
+
+        json_content = {
+            "DataFile": partData.decode('ascii'),
+            "InsightsExternalDataId": parentId,
+            "PartNumber": partNumber
+        }
+        return self._wave_connector.send_request('POST', url, headers=headers, data=json.dumps(json_content).encode('ascii'))
 
-            except urllib.error.HTTPError as e:
-                raise Exception('HTTP Error ' + str(e.code) + ' : Request URI not found ' + str(e.read()))
+    def _upload_part(self, headers, parentId, partNumber, partData):
+        """
+        Post one InsightsExternalDataPart for the given InsightsExternalData object,
+        retrying this part alone up to upload_retries times.
+        :param headers: request headers with the access token
+        :param parentId: InsightsExternalData id
+        :param partNumber: 1-based part number
+        :param partData: base64 encoded part content as bytes, or a FileSlice for multipart
+        :return: InsightsExternalDataPart id
+        """
+        attempt = 0
+        while True:
+            try:
+                response = self._post_part(headers, parentId, partNumber, partData)
+                utils.check_response(response)
+                insight_object_response = response.json()
+                if('id' not in insight_object_response):
+                    raise Exception('Something went wrong with creating the InsightsExternalDataPart object -- see error: ' +
+                        str(response.content))
+                return insight_object_response['id']
+            except Exception as e:
+                attempt += 1
+                if attempt > self._setup.upload_retries:
+                    raise
+                print('retry part %d (attempt %d): %s' % (partNumber, attempt, e))
+                time.sleep(RETRY_BACKOFF_SECONDS * attempt)
+
+    def compressFile(self, toBeProcessedFile):
+        """
+        Gzip the csv file next to it as a stream, without loading it into memory.
+        mtime is fixed so the same csv always gives the same compressed bytes.
+        :param toBeProcessedFile: csv file name
+        :return: compressed file name
+        """
+        compressedFile = gzipFile(toBeProcessedFile)
+        with open(toBeProcessedFile, 'rb') as fin, open(compressedFile, 'wb') as raw_out:
+            with gzip.GzipFile(fileobj=raw_out, mode='wb', mtime=0) as fout:
+                shutil.copyfileobj(fin, fout, SEGMENT_MEGABYTES)
+        return compressedFile
 
-        if(counter >= 300):
-            sys.exit("Stopped due to timeout")
+    def splitFile(self, toBeProcessedFile, partSize=SEGMENT_MEGABYTES, skipParts=()):
+        """
+        Lazily split the file into base64 encoded parts. The file is read in binary, one part
+        at a time, so memory stays bounded by the part size whatever the file size is.
+        Skipped parts are seeked over without being read.
+        :param toBeProcessedFile: csv file name
+        :param partSize: raw bytes per part before encoding
+        :param skipParts: part numbers already uploaded
+        :return: generator of (part number, base64 encoded part as bytes)
+        """
+        with open(toBeProcessedFile, 'rb') as f:
+            for partNumber, fileSlice in enumerate(self.sliceFile(toBeProcessedFile, partSize), start=1):
+                if partNumber in skipParts:
+                    continue
+                f.seek(fileSlice.offset)
+                yield partNumber, base64.b64encode(f.read(fileSlice.length))
+
+    def sliceFile(self, toBeProcessedFile, partSize=SEGMENT_MEGABYTES):
+        """
+        Split the file into byte ranges of partSize without reading it.
+        An empty file still yields a single empty slice.
+        :param toBeProcessedFile: csv file name
+        :param partSize: bytes per part
+        :return: generator of FileSlice
+        """
+        fileSize = os.path.getsize(toBeProcessedFile)
+        yield FileSlice(toBeProcessedFile, 0, min(partSize, fileSize))
+        for offset in range(partSize, fileSize, partSize):
+            yield FileSlice(toBeProcessedFile, offset, min(partSize, fileSize - offset))
 
     def uploadCsv(self, dataset_id):
         """
-        Upload csv file to Wave.
+        Upload csv file to Wave. Nothing is sent when the data folder has no csv file.
         :return: return False if any error happens, else return True
         """
         self.removeLocalFiles()
+        if not os.path.isdir(self._dataConfig.dataFolder) or \
+                not any(dataFile.endswith('.csv') for dataFile in os.listdir(self._dataConfig.dataFolder)):
+            print('nothing to upload for ' + self._dataset)
+            return
         access_token = self._wave_connector.get_access_token()
         successFiles = []
+        tracker = JobTracker(self._wave_connector, self._request_url() + "/query/", timeout=self._setup.verify_timeout)
+        # fingerprints of the last successful upload, unchanged files are not sent again
+        fingerprints = self._fingerprints() if self._setup.skip_unchanged else None
+        previous = fingerprints.load() if fingerprints is not None else set()
+        processed = set()
         
         for dataFile in os.listdir(self._dataConfig.dataFolder):
             toBeProcessedFile = self._dataConfig.dataFolder + "/" + dataFile
@@ -312,15 +814,7 @@ class WaveUploader:
             # skip dirs
             if os.path.isdir(toBeProcessedFile):
                 continue
-            try:
-                self.uploadToWave(toBeProcessedFile, access_token)
-            except urllib.error.URLError as e:
-                JsonUtils.pretty_print(str(e.read()))
-                raise Exception('HTTP Error %s: -- see error: %s' %(e.code, str(e.read())))
 
-            if self._setup.is_verify == 'true':
-                self.checkStatus(access_token, dataset_id)
-            
             file = toBeProcessedFile
             file = file.split("/")
             csvFile = ""
@@ -329,7 +823,114 @@ class WaveUploader:
                 if('.csv' in elem):
                     csvFile = elem
 
+            if fingerprints is not None:
+                fingerprint = self._fingerprint(toBeProcessedFile)
+                processed.add(fingerprint)
+                if fingerprint in previous and not os.path.isfile(manifestFile(toBeProcessedFile)):
+                    print('skip unchanged .....%s' % toBeProcessedFile)
+                    successFiles.append(csvFile)
+                    continue
+
+            try:
+                tracker.add(self.uploadToWave(toBeProcessedFile, access_token))
+            except requests.exceptions.HTTPError as e:
+                JsonUtils.pretty_print(e.response.text)
+                raise Exception('HTTP Error %s: -- see error: %s' %(e.response.status_code, e.response.text))
+
             successFiles.append(csvFile)
 
+        # all jobs of the folder are uploaded first, then tracked together until processed
+        if self._setup.is_verify == 'true':
+            tracker.wait()
+            if tracker.failed():
+                raise Exception('Wave failed to process: ' + str(tracker.failed()))
+            # only files Wave reported as processed may be skipped next time
+            if fingerprints is not None:
+                fingerprints.save(processed)
         self.moveSuccessFiles(successFiles)
 
+    def uploadStream(self, chunks, dataset_id, partSize=SEGMENT_MEGABYTES):
+        """
+        Upload csv content while it is still being produced. The InsightsExternalData job is
+        created when the first chunk arrives and every part is posted as soon as it is full,
+        while the producer keeps extracting. The content is spooled into a csv file of the
+        data folder which is moved to the done folder on success.
+        :param chunks: iterable of csv bytes chunks, header first
+        :param dataset_id: dataset id
+        :param partSize: raw bytes per part
+        :return:
+        """
+        self.removeLocalFiles()
+        access_token = self._wave_connector.get_access_token()
+        headers = {'Authorization': 'Bearer ' + access_token,
+                    'Content-Type': 'application/json'}
+
+        chunks = iter(chunks)
+        first = next(chunks, None)
+        if first is None:
+            print('nothing to upload for ' + self._dataset)
+            return
+
+        toBeProcessedFile = utils.create_timestamp_csv(self._dataConfig.dataFolder)
+        print('streaming .....%s' % toBeProcessedFile)
+        insight_object_parent_id = self._create_external_data(toBeProcessedFile)
+        parts = self._spool_parts(itertools.chain([first], chunks), toBeProcessedFile, partSize)
+        self._send_parts(headers, insight_object_parent_id, parts, background=True)
+        print('POST done')
+        if os.path.isfile(gzipFile(toBeProcessedFile)):
+            os.remove(gzipFile(toBeProcessedFile))
+        self.send_data_request(headers, insight_object_parent_id)
+
+        if self._setup.is_verify == 'true':
+            tracker = JobTracker(self._wave_connector, self._request_url() + "/query/", timeout=self._setup.verify_timeout)
+            tracker.add(insight_object_parent_id)
+            tracker.wait()
+            if tracker.failed():
+                raise Exception('Wave failed to process: ' + str(tracker.failed()))
+
+        self.moveSuccessFiles([os.path.basename(toBeProcessedFile)])
+
+    def _spool_parts(self, chunks, toBeProcessedFile, partSize):
+        """
+        Append the chunks to the csv file and yield a part every time partSize bytes are written,
+        then the remainder once the chunks are exhausted. With gzip compression the chunks are
+        also compressed as one gzip stream next to the csv file and the parts are cut from it.
+        :return: generator of (part number, part data)
+        """
+        compressed = self._setup.upload_compression == GZIP_COMPRESSION
+        partsFile = gzipFile(toBeProcessedFile) if compressed else toBeProcessedFile
+        partNumber = 1
+        offset = 0
+        with open(toBeProcessedFile, 'wb') as f:
+            partsOut = open(partsFile, 'wb') if compressed else f
+            gzipOut = gzip.GzipFile(fileobj=partsOut, mode='wb', mtime=0) if compressed else None
+            try:
+                for chunk in chunks:
+                    f.write(chunk)
+                    if gzipOut is not None:
+                        gzipOut.write(chunk)
+                    while partsOut.tell() - offset >= partSize:
+                        partsOut.flush()
+                        yield partNumber, self._part_data(FileSlice(partsFile, offset, partSize))
+                        partNumber += 1
+                        offset += partSize
+                if gzipOut is not None:
+                    # writes the rest of the stream and the gzip trailer, partsOut stays open
+                    gzipOut.close()
+                partsOut.flush()
+                written = partsOut.tell()
+                if written > offset or partNumber == 1:
+                    yield partNumber, self._part_data(FileSlice(partsFile, offset, written - offset))
+            finally:
+                if compressed:
+                    partsOut.close()
+
+    def _part_data(self, fileSlice):
+        """
+        Part data of a file slice in the configured part encoding.
+        """
+        if self._setup.upload_part_encoding == MULTIPART_ENCODING:
+            return fileSlice
+        with open(fileSlice.fileName, 'rb') as f:
+            f.seek(fileSlice.offset)
+            return base64.b64encode(f.read(fileSlice.length))
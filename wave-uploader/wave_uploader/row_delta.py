@@ -0,0 +1,215 @@
+"""
+Copyright (c) 2018, Salesforce.com, Inc.
+All rights reserved.
+
+Redistribution and use in source and binary forms, with or without modification, are permitted provided that the following conditions are met:
+
+* Redistributions of source code must retain the above copyright notice, this list of conditions and the following disclaimer.
+
+* Redistributions in binary form must reproduce the above copyright notice, this list of conditions and the following disclaimer in the documentation and/or other materials provided with the distribution.
+
+* Neither the name of Salesforce.com nor the names of its contributors may be used to endorse or promote products derived from this software without specific prior written permission.
+
+THIS SOFTWARE IS PROVIDED BY THE COPYRIGHT HOLDERS AND CONTRIBUTORS "AS IS" AND ANY EXPRESS OR IMPLIED WARRANTIES, INCLUDING, BUT NOT LIMITED TO, THE IMPLIED WARRANTIES OF MERCHANTABILITY AND FITNESS FOR A PARTICULAR PURPOSE ARE DISCLAIMED. IN NO EVENT SHALL THE COPYRIGHT HOLDER OR CONTRIBUTORS BE LIABLE FOR ANY DIRECT, INDIRECT, INCIDENTAL, SPECIAL, EXEMPLARY, OR CONSEQUENTIAL DAMAGES (INCLUDING, BUT NOT LIMITED TO, PROCUREMENT OF SUBSTITUTE GOODS OR SERVICES; LOSS OF USE, DATA, OR PROFITS; OR BUSINESS INTERRUPTION) HOWEVER CAUSED AND ON ANY THEORY OF LIABILITY, WHETHER IN CONTRACT, STRICT LIABILITY, OR TORT (INCLUDING NEGLIGENCE OR OTHERWISE) ARISING IN ANY WAY OUT OF THE USE OF THIS SOFTWARE, EVEN IF ADVISED OF THE POSSIBILITY OF SUCH DAMAGE.
+"""
+# -*- coding: utf-8 -*-
+
+"""
+This module provides the row level delta of csv extracts against the rows already sent to a dataset.
+"""
+import csv
+import hashlib
+import os
+import shutil
+import tempfile
+
+from wave_common.utils import create_dirs
+
+# the index is split by the first digest byte, so only one bucket is held in memory at a time
+INDEX_BUCKETS = 256
+DIGEST_SIZE = 16
+ROW_NUMBER_SIZE = 5
+PENDING_SUFFIX = '.pending'
+RESET_FILE = 'reset.pending'
+# joins the values of a row before hashing, it does not appear in csv text
+VALUE_SEPARATOR = '\x1f'
+
+
+def row_digest(values):
+    """
+    :param values: list of csv values of a row
+    :return: the digest of the row, bytes
+    """
+    return hashlib.blake2b(VALUE_SEPARATOR.join(values).encode('utf-8'), digest_size=DIGEST_SIZE).digest()
+
+
+class _RecordingLines:
+    """
+    Line iterator which keeps the raw lines consumed by a csv reader, so a row can be copied
+    byte for byte even if it spans several lines.
+    """
+    def __init__(self, f):
+        self._f = f
+        self.lines = []
+
+    def __iter__(self):
+        return self
+
+    def __next__(self):
+        line = next(self._f)
+        self.lines.append(line)
+        return line
+
+    def take(self):
+        raw = ''.join(self.lines)
+        self.lines = []
+        return raw
+
+
+class RowDeltaIndex:
+    """
+    On-disk index of the digests of the rows already sent to a dataset, either of the whole
+    row or of the key columns. It is made of INDEX_BUCKETS sidecar files of fixed size digests.
+
+    filter removes the indexed rows from an Append extract and keeps the digests of the new
+    rows pending. commit adds them to the index once the upload succeeded. An Overwrite
+    extract is not filtered, it replaces the index on commit.
+    """
+    def __init__(self, indexFolder, keyColumns=None):
+        """
+        :param indexFolder: folder of the index files
+        :param keyColumns: optional list of the columns identifying a row, all columns if None
+        """
+        self.indexFolder = indexFolder
+        self.keyColumns = keyColumns
+
+    def _bucket_file(self, bucket):
+        return os.path.join(self.indexFolder, '%02x' % bucket)
+
+    @staticmethod
+    def _read_digests(fileName):
+        digests = set()
+        if os.path.isfile(fileName):
+            with open(fileName, 'rb') as f:
+                for block in iter(lambda: f.read(DIGEST_SIZE * 4096), b''):
+                    digests.update(block[i:i + DIGEST_SIZE] for i in range(0, len(block), DIGEST_SIZE))
+        return digests
+
+    def discard_pending(self):
+        """
+        Forget the digests of an extract which was never uploaded.
+        """
+        if not os.path.isdir(self.indexFolder):
+            return
+        for fileName in os.listdir(self.indexFolder):
+            if fileName.endswith(PENDING_SUFFIX):
+                os.remove(os.path.join(self.indexFolder, fileName))
+
+    def filter(self, csvFile, append=True):
+        """
+        Remove the rows already in the index from the csv file.
+        :param csvFile: csv file with a header line, rewritten in place
+        :param append: True in Append and Upsert mode, else the file is kept and replaces the index on commit
+        :return: number of rows kept and number of rows removed
+        """
+        create_dirs(self.indexFolder)
+        if not append:
+            open(os.path.join(self.indexFolder, RESET_FILE), 'w').close()
+        spoolFolder = tempfile.mkdtemp(dir=self.indexFolder)
+        try:
+            rowCount = self._spool_digests(csvFile, spoolFolder)
+            keep = self._new_rows(spoolFolder, rowCount, append)
+        finally:
+            shutil.rmtree(spoolFolder)
+        kept = sum(keep)
+        if kept < rowCount:
+            self._rewrite(csvFile, keep)
+        return kept, rowCount - kept
+
+    def _spool_digests(self, csvFile, spoolFolder):
+        """
+        Write the digest and the row number of every row into the spool file of its bucket.
+        :return: number of rows
+        """
+        spools = {}
+        rowCount = 0
+        try:
+            with open(csvFile, 'r', newline='') as f:
+                reader = csv.reader(f)
+                header = next(reader, None)
+                keys = None
+                if self.keyColumns and header is not None:
+                    keys = [header.index(column) for column in self.keyColumns]
+                for rowNumber, row in enumerate(reader):
+                    digest = row_digest([row[i] for i in keys] if keys else row)
+                    spool = spools.get(digest[0])
+                    if spool is None:
+                        spool = spools[digest[0]] = open(os.path.join(spoolFolder, '%02x' % digest[0]), 'wb')
+                    spool.write(digest + rowNumber.to_bytes(ROW_NUMBER_SIZE, 'big'))
+                    rowCount = rowNumber + 1
+        finally:
+            for spool in spools.values():
+                spool.close()
+        return rowCount
+
+    def _new_rows(self, spoolFolder, rowCount, append):
+        """
+        Check the spooled rows bucket by bucket against the index and the digests pending from
+        the other files of the run. Repeated rows of the file itself are all kept.
+        :return: bytearray with 1 for every row to keep
+        """
+        keep = bytearray(rowCount)
+        recordSize = DIGEST_SIZE + ROW_NUMBER_SIZE
+        for spoolName in os.listdir(spoolFolder):
+            bucket = int(spoolName, 16)
+            pendingFile = self._bucket_file(bucket) + PENDING_SUFFIX
+            known = self._read_digests(pendingFile)
+            sent = self._read_digests(self._bucket_file(bucket)) | known if append else set()
+            with open(os.path.join(spoolFolder, spoolName), 'rb') as spool, open(pendingFile, 'ab') as pending:
+                for block in iter(lambda: spool.read(recordSize * 4096), b''):
+                    for i in range(0, len(block), recordSize):
+                        digest = block[i:i + DIGEST_SIZE]
+                        if digest in sent:
+                            continue
+                        keep[int.from_bytes(block[i + DIGEST_SIZE:i + recordSize], 'big')] = 1
+                        if digest not in known:
+                            known.add(digest)
+                            pending.write(digest)
+        return keep
+
+    @staticmethod
+    def _rewrite(csvFile, keep):
+        """
+        Copy the header and the kept rows, unchanged, into a new version of the csv file.
+        """
+        tmpFile = csvFile + '.delta'
+        with open(csvFile, 'r', newline='') as f, open(tmpFile, 'w', newline='') as out:
+            lines = _RecordingLines(f)
+            reader = csv.reader(lines)
+            if next(reader, None) is not None:
+                out.write(lines.take())
+            for rowNumber, _ in enumerate(reader):
+                raw = lines.take()
+                if keep[rowNumber]:
+                    out.write(raw)
+        os.replace(tmpFile, csvFile)
+
+    def commit(self):
+        """
+        Add the pending digests to the index, once their rows are uploaded.
+        """
+        if not os.path.isdir(self.indexFolder):
+            return
+        resetFile = os.path.join(self.indexFolder, RESET_FILE)
+        if os.path.isfile(resetFile):
+            for bucket in range(INDEX_BUCKETS):
+                if os.path.isfile(self._bucket_file(bucket)):
+                    os.remove(self._bucket_file(bucket))
+        for bucket in range(INDEX_BUCKETS):
+            pendingFile = self._bucket_file(bucket) + PENDING_SUFFIX
+            if os.path.isfile(pendingFile):
+                with open(pendingFile, 'rb') as pending, open(self._bucket_file(bucket), 'ab') as index:
+                    shutil.copyfileobj(pending, index)
+                os.remove(pendingFile)
+        if os.path.isfile(resetFile):
+            os.remove(resetFile)
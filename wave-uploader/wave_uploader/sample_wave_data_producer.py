@@ -15,10 +15,9 @@ THIS SOFTWARE IS PROVIDED BY THE COPYRIGHT HOLDERS AND CONTRIBUTORS "AS IS" AND
 # -*- coding: utf-8 -*-
 
 import sys
-from wave_data_producer import WaveDataProducer
-from wave_common.utils import create_timestamp_csv
+from wave_data_producer import StreamingWaveDataProducer
 
-class SampleWaveDataProducer(WaveDataProducer):
+class SampleWaveDataProducer(StreamingWaveDataProducer):
     """
     This class is a sample data producer for test purpose.
     """
@@ -26,13 +25,10 @@ class SampleWaveDataProducer(WaveDataProducer):
     def __init__(self, dbCondig):
         pass
 
-    def pull(self, destinationFolder):
-        filename = create_timestamp_csv(destinationFolder)
-        with open(filename, 'w') as output_file:
-            output_file.write('line#,testfield1,testfield2\n')
-            for i in range(0, 100):
-                output_file.write(str(i) + ',' + 'test1, test2\n')
-        output_file.close()
+    def stream(self):
+        yield b'line#,testfield1,testfield2\n'
+        for i in range(0, 100):
+            yield (str(i) + ',' + 'test1, test2\n').encode('utf-8')
 
     def name(self):
         return 'SampleWaveDataProducer'
\ No newline at end of file
@@ -0,0 +1,159 @@
+"""
+Copyright (c) 2018, Salesforce.com, Inc.
+All rights reserved.
+
+Redistribution and use in source and binary forms, with or without modification, are permitted provided that the following conditions are met:
+
+* Redistributions of source code must retain the above copyright notice, this list of conditions and the following disclaimer.
+
+* Redistributions in binary form must reproduce the above copyright notice, this list of conditions and the following disclaimer in the documentation and/or other materials provided with the distribution.
+
+* Neither the name of Salesforce.com nor the names of its contributors may be used to endorse or promote products derived from this software without specific prior written permission.
+
+THIS SOFTWARE IS PROVIDED BY THE COPYRIGHT HOLDERS AND CONTRIBUTORS "AS IS" AND ANY EXPRESS OR IMPLIED WARRANTIES, INCLUDING, BUT NOT LIMITED TO, THE IMPLIED WARRANTIES OF MERCHANTABILITY AND FITNESS FOR A PARTICULAR PURPOSE ARE DISCLAIMED. IN NO EVENT SHALL THE COPYRIGHT HOLDER OR CONTRIBUTORS BE LIABLE FOR ANY DIRECT, INDIRECT, INCIDENTAL, SPECIAL, EXEMPLARY, OR CONSEQUENTIAL DAMAGES (INCLUDING, BUT NOT LIMITED TO, PROCUREMENT OF SUBSTITUTE GOODS OR SERVICES; LOSS OF USE, DATA, OR PROFITS; OR BUSINESS INTERRUPTION) HOWEVER CAUSED AND ON ANY THEORY OF LIABILITY, WHETHER IN CONTRACT, STRICT LIABILITY, OR TORT (INCLUDING NEGLIGENCE OR OTHERWISE) ARISING IN ANY WAY OUT OF THE USE OF THIS SOFTWARE, EVEN IF ADVISED OF THE POSSIBILITY OF SUCH DAMAGE.
+"""
+# -*- coding: utf-8 -*-
+
+"""
+This module infers the Wave metadata of a csv file from a sample of its rows.
+"""
+import csv
+import json
+import random
+import re
+
+SAMPLE_ROWS = 10000
+MAX_PRECISION = 18
+# Wave date formats and the patterns of their values, the most specific first
+DATE_FORMATS = [
+    ("yyyy-MM-dd'T'HH:mm:ss", r"\d{4}-(?:0[1-9]|1[0-2])-(?:0[1-9]|[12]\d|3[01])T(?:[01]\d|2[0-3]):[0-5]\d:[0-5]\d"),
+    ("yyyy-MM-dd HH:mm:ss", r"\d{4}-(?:0[1-9]|1[0-2])-(?:0[1-9]|[12]\d|3[01]) (?:[01]\d|2[0-3]):[0-5]\d:[0-5]\d"),
+    ("yyyy-MM-dd", r"\d{4}-(?:0[1-9]|1[0-2])-(?:0[1-9]|[12]\d|3[01])"),
+    ("yyyy/MM/dd", r"\d{4}/(?:0[1-9]|1[0-2])/(?:0[1-9]|[12]\d|3[01])"),
+    ("MM/dd/yyyy", r"(?:0[1-9]|1[0-2])/(?:0[1-9]|[12]\d|3[01])/\d{4}"),
+    ("dd.MM.yyyy", r"(?:0[1-9]|[12]\d|3[01])\.(?:0[1-9]|1[0-2])\.\d{4}"),
+]
+NUMBER = r"[-+]?\d+(?:\.\d+)?"
+
+
+def _block_pattern(value):
+    """
+    Pattern matching a block of newline separated values, so a whole column sample is checked
+    by one regular expression call instead of one call per value.
+    """
+    return re.compile(r"(?:" + value + r"\n)*")
+
+_NUMERIC_BLOCK = _block_pattern(NUMBER)
+_DATE_BLOCKS = [(dateFormat, _block_pattern(pattern)) for dateFormat, pattern in DATE_FORMATS]
+_INTEGER_DIGITS = re.compile(r"^[-+]?(\d+)", re.MULTILINE)
+_DECIMALS = re.compile(r"\.(\d+)$", re.MULTILINE)
+_LEADING_ZERO = re.compile(r"^[-+]?0\d", re.MULTILINE)
+
+
+def sample_rows(csvFile, sampleRows=SAMPLE_ROWS):
+    """
+    Reservoir sample of the rows of a csv file, read in a single streaming pass.
+    :param csvFile: csv file with a header line
+    :param sampleRows: maximum number of sampled rows
+    :return: header and sampled rows
+    """
+    sample = []
+    # fixed seed, the same file always gives the same metadata
+    generator = random.Random(0)
+    with open(csvFile, 'r', newline='') as f:
+        reader = csv.reader(f)
+        header = next(reader, [])
+        for rowNumber, row in enumerate(reader):
+            if rowNumber < sampleRows:
+                sample.append(row)
+            else:
+                index = generator.randint(0, rowNumber)
+                if index < sampleRows:
+                    sample[index] = row
+    return header, sample
+
+
+def infer_field(values):
+    """
+    Infer the type of a column from its sampled values, empty values are ignored. Numbers with
+    leading zeros or more than MAX_PRECISION digits are kept as Text.
+    :param values: list of str
+    :return: dict of the type attributes of the metadata field
+    """
+    values = [value.strip() for value in values if value.strip()]
+    if not values or any('\n' in value for value in values):
+        return {"type": "Text"}
+    block = "\n".join(values) + "\n"
+    # codes such as zip codes lose their leading zeros as numbers
+    if _NUMERIC_BLOCK.fullmatch(block) and not _LEADING_ZERO.search(block):
+        scale = max([len(decimals) for decimals in _DECIMALS.findall(block)] or [0])
+        digits = max(len(integer.lstrip('0') or '0') for integer in _INTEGER_DIGITS.findall(block))
+        precision = digits + scale
+        if precision > MAX_PRECISION:
+            return {"type": "Text"}
+        return {"type": "Numeric",
+                "precision": precision,
+                "scale": scale,
+                "format": "#####0" + ("." + "0" * scale if scale else "")}
+    for dateFormat, dateBlock in _DATE_BLOCKS:
+        if dateBlock.fullmatch(block):
+            return {"type": "Date", "format": dateFormat}
+    return {"type": "Text"}
+
+
+def field_name(column):
+    """
+    Wave field names start with a letter and only contain letters, digits and underscores.
+    """
+    name = re.sub(r"[^A-Za-z0-9_]", "_", column.strip()) or "field"
+    return name if name[0].isalpha() else "X" + name
+
+
+def infer_metadata(csvFile, dataset, sampleRows=SAMPLE_ROWS):
+    """
+    Infer the metadata of a csv file in the format of the metadata templates.
+    :param csvFile: csv file with a header line
+    :param dataset: dataset name
+    :param sampleRows: maximum number of sampled rows
+    :return: metadata, type dict
+    """
+    header, rows = sample_rows(csvFile, sampleRows)
+    fields = []
+    for i, column in enumerate(header):
+        name = field_name(column)
+        field = {
+            "description": column,
+            "fullyQualifiedName": dataset + "." + name,
+            "isMultiValue": False,
+            "isSystemField": False,
+            "isUniqueId": False,
+            "label": column,
+            "name": name
+        }
+        field.update(infer_field([row[i] for row in rows if i < len(row)]))
+        fields.append(field)
+    return {
+        "fileFormat": {
+            "charsetName": "UTF-8",
+            "fieldsDelimitedBy": ",",
+            "fieldsEnclosedBy": "\"",
+            "numberOfLinesToIgnore": 1
+        },
+        "objects": [{
+            "connector": "WaveUploader",
+            "description": dataset,
+            "fullyQualifiedName": dataset,
+            "label": dataset,
+            "name": dataset,
+            "fields": fields
+        }]
+    }
+
+
+def write_metadata_template(csvFile, dataset, template, sampleRows=SAMPLE_ROWS):
+    """
+    Infer the metadata of a csv file and save it as the metadata template of the dataset.
+    :param template: metadata template file to write
+    """
+    with open(template, 'w') as f:
+        json.dump(infer_metadata(csvFile, dataset, sampleRows), f, indent=4)
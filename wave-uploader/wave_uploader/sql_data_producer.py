@@ -0,0 +1,224 @@
+"""
+Copyright (c) 2018, Salesforce.com, Inc.
+All rights reserved.
+
+Redistribution and use in source and binary forms, with or without modification, are permitted provided that the following conditions are met:
+
+* Redistributions of source code must retain the above copyright notice, this list of conditions and the following disclaimer.
+
+* Redistributions in binary form must reproduce the above copyright notice, this list of conditions and the following disclaimer in the documentation and/or other materials provided with the distribution.
+
+* Neither the name of Salesforce.com nor the names of its contributors may be used to endorse or promote products derived from this software without specific prior written permission.
+
+THIS SOFTWARE IS PROVIDED BY THE COPYRIGHT HOLDERS AND CONTRIBUTORS "AS IS" AND ANY EXPRESS OR IMPLIED WARRANTIES, INCLUDING, BUT NOT LIMITED TO, THE IMPLIED WARRANTIES OF MERCHANTABILITY AND FITNESS FOR A PARTICULAR PURPOSE ARE DISCLAIMED. IN NO EVENT SHALL THE COPYRIGHT HOLDER OR CONTRIBUTORS BE LIABLE FOR ANY DIRECT, INDIRECT, INCIDENTAL, SPECIAL, EXEMPLARY, OR CONSEQUENTIAL DAMAGES (INCLUDING, BUT NOT LIMITED TO, PROCUREMENT OF SUBSTITUTE GOODS OR SERVICES; LOSS OF USE, DATA, OR PROFITS; OR BUSINESS INTERRUPTION) HOWEVER CAUSED AND ON ANY THEORY OF LIABILITY, WHETHER IN CONTRACT, STRICT LIABILITY, OR TORT (INCLUDING NEGLIGENCE OR OTHERWISE) ARISING IN ANY WAY OUT OF THE USE OF THIS SOFTWARE, EVEN IF ADVISED OF THE POSSIBILITY OF SUCH DAMAGE.
+"""
+# -*- coding: utf-8 -*-
+
+"""
+This module provides the base producer for data exported by a sql query from postgres.
+"""
+import os
+from abc import abstractmethod
+from concurrent.futures import ThreadPoolExecutor
+from numbers import Number
+
+from wave_common.db_connector import connection_pool
+from wave_common.utils import create_timestamp_csv, create_dirs, exception_handler, save_batches_as_csv, save_file, \
+    stitch_csv_files
+from wave_common.core_logger import Logger
+from wave_uploader.wave_data_producer import StreamingWaveDataProducer, csv_chunks
+
+PENDING_SUFFIX = '.pending'
+
+
+class SqlWaveDataProducer(StreamingWaveDataProducer):
+    """
+    A producer which writes the result of a sql query into a csv file. Subclasses implement
+    query() and set headers. The connection is borrowed from the shared pool on first use.
+
+    With partition_column and partitions set in the producer section, pull splits the value
+    range of the numeric partition column into slices, extracts them on parallel connections
+    and stitches the slice files into one csv file.
+
+    With watermark_column set, only the rows above the last uploaded value of that column are
+    extracted. The new high-water mark is saved by commit, once the upload succeeded.
+    """
+    # optional range partitioning of pull, set from the producer section
+    partition_column = None
+    partitions = 1
+    # optional incremental extraction, set from the producer section
+    watermark_column = None
+    watermark_file = None
+
+    def __init__(self, dbConfig):
+        self._logger = Logger.logger
+        self.dbConfig = dbConfig
+        self.headers = None
+        self._db_connector = None
+
+    @abstractmethod
+    def query(self):
+        """
+        :return: the sql query of the producer, type str
+        """
+        pass
+
+    def close(self):
+        if self._db_connector is not None:
+            connection_pool.release(self.dbConfig, self._db_connector)
+            self._db_connector = None
+
+    def commit(self):
+        """
+        Promote the high-water mark of the uploaded extraction.
+        """
+        if self.watermark_file and os.path.exists(self.watermark_file + PENDING_SUFFIX):
+            os.replace(self.watermark_file + PENDING_SUFFIX, self.watermark_file)
+            self._logger.info('%s watermark is %s' % (self.name(), read_watermark(self.watermark_file)))
+
+    def _connector(self):
+        if self._db_connector is None:
+            self._db_connector = connection_pool.acquire(self.dbConfig)
+        return self._db_connector
+
+    def stream(self):
+        query, params = self._extraction_query()
+        if query is None:
+            return iter(())
+        [batches, header] = self._connector().stream_query(query, params=params)
+        return csv_chunks(self.headers or header, batches)
+
+    def pull(self, targetFolder):
+        query, params = self._extraction_query()
+        if query is None:
+            return
+        create_dirs(targetFolder)
+        file_name = create_timestamp_csv(targetFolder)
+        self._logger.info('create file:' + file_name)
+        if self.partition_column and self.partitions > 1:
+            self._pull_partitioned(query, params, file_name)
+        else:
+            self._export(self._connector(), query, params, file_name)
+
+    def _extraction_query(self):
+        """
+        Restrict the query to the rows between the saved watermark and the current maximum of
+        the watermark column. The maximum is saved as the pending watermark.
+        :return: query and its parameters, None and None if no row is above the watermark
+        """
+        query = self.query()
+        if not self.watermark_column:
+            return query, None
+        column = self.watermark_column
+        query = "select * from (" + query.strip().rstrip(";") + ") wave_incremental"
+        conditions = []
+        params = {}
+        low = read_watermark(self.watermark_file)
+        if low is not None:
+            conditions.append(column + " > %(low_watermark)s")
+            params['low_watermark'] = low
+        [rows, _] = self._connector().execute_query(
+            "select max(" + column + ") from (" + where(query, conditions) + ") wave_watermark", params or None)
+        high = rows[0][0]
+        if high is None:
+            self._logger.info('%s has no rows above watermark %s' % (self.name(), low))
+            return None, None
+        # rows committed after the maximum was read are left to the next run
+        save_file(self.watermark_file + PENDING_SUFFIX, str(high))
+        conditions.append(column + " <= %(high_watermark)s")
+        params['high_watermark'] = str(high)
+        return where(query, conditions), params
+
+    def _export(self, connector, query, params, file_name):
+        """
+        Write the result of the query with the producer headers into a csv file.
+        """
+        if self.copy_export:
+            connector.copy_query_to_file(query, file_name, header=self.headers, params=params)
+        else:
+            [batches, header] = connector.stream_query(query, params=params)
+            save_batches_as_csv(file_name, self.headers or header, batches)
+
+    def _pull_partitioned(self, query, params, file_name):
+        slices = self._slice_queries(query, params)
+        slice_files = [file_name + '.slice%d' % i for i in range(len(slices))]
+        self._logger.info('extract %d slices of %s' % (len(slices), self.partition_column))
+        try:
+            with ThreadPoolExecutor(max_workers=len(slices)) as executor:
+                futures = [executor.submit(self._export_slice, slice_query, params, slice_file)
+                           for slice_query, slice_file in zip(slices, slice_files)]
+                for future in futures:
+                    future.result()
+            stitch_csv_files(slice_files, file_name)
+        finally:
+            for slice_file in slice_files:
+                if os.path.exists(slice_file):
+                    os.remove(slice_file)
+
+    def _export_slice(self, query, params, file_name):
+        with connection_pool.connection(self.dbConfig) as connector:
+            self._export(connector, query, params, file_name)
+
+    def _slice_queries(self, query, params):
+        """
+        Split the query into one query per range of the partition column. Rows with a null
+        partition value go into the first slice.
+        :return: list of queries
+        """
+        column = self.partition_column
+        subquery = "select * from (" + query.strip().rstrip(";") + ") wave_slice"
+        [rows, _] = self._connector().execute_query(
+            "select min(" + column + "), max(" + column + ") from (" + query.strip().rstrip(";") + ") wave_range",
+            params)
+        low, high = rows[0]
+        if low is None:
+            return [query]
+        if not isinstance(low, Number) or not isinstance(high, Number):
+            exception_handler("the partition column %s is not numeric." % column,
+                              Exception("partition column type exception"))
+        bounds = partition_bounds(low, high, self.partitions)
+        queries = []
+        for i in range(len(bounds) - 1):
+            condition = column + " >= " + str(bounds[i])
+            if i == len(bounds) - 2:
+                condition += " and " + column + " <= " + str(bounds[i + 1])
+            else:
+                condition += " and " + column + " < " + str(bounds[i + 1])
+            if i == 0:
+                condition = "(" + condition + ") or " + column + " is null"
+            queries.append(subquery + " where " + condition)
+        return queries
+
+
+def partition_bounds(low, high, partitions):
+    """
+    Split the closed range [low, high] into at most partitions ranges of equal width.
+    :return: list of the range bounds, lowest first
+    """
+    if low == high:
+        return [low, high]
+    if isinstance(low, int) and isinstance(high, int):
+        # integer bounds, so no slice is empty because of rounding
+        partitions = min(partitions, high - low)
+        return [low + (high - low) * i // partitions for i in range(partitions)] + [high]
+    return [low + (high - low) * i / partitions for i in range(partitions)] + [high]
+
+
+def where(query, conditions):
+    """
+    :return: the query restricted by all the conditions
+    """
+    if not conditions:
+        return query
+    return query + " where " + " and ".join(conditions)
+
+
+def read_watermark(file_name):
+    """
+    :param file_name: watermark file, type str
+    :return: the saved watermark, None if there is none yet
+    """
+    if file_name and os.path.isfile(file_name):
+        with open(file_name, 'r') as watermark_file:
+            return watermark_file.read().strip() or None
+    return None
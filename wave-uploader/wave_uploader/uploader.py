@@ -19,25 +19,30 @@
 wave data uploader
 
 Usage:
-  wave_uploader/uploader.py (<config_file>) (--append | --overwrite)
+  wave_uploader/uploader.py (<config_file>) (--append | --overwrite | --upsert)
   wave_uploader/uploader.py (-h | --help)
 
 Options:
   config_file       config file
   --append         append data in wave
   --overwrite      overwrite wave data
+  --upsert         insert or update wave data by the isUniqueId field of the metadata
   -h --help         Show this screen.
 """
 from docopt import docopt
 from configparser import ConfigParser
+from concurrent.futures import ThreadPoolExecutor
+import os
 import subprocess
 
 from wave_common.utils import exception_handler
 from wave_common.core_logger import Logger
 from wave_common.config import LoginInfo
 from wave_common.wave_connector import WaveConnector
+from wave_common.db_connector import connection_pool
 from uploader_config import Setup, ProducerConfig
-from data_uploader import WaveUploader
+from data_uploader import WaveUploader, pendingUploads, checkUpsertMetadata, metadataTemplate, UPSERT_OPERATION
+from schema_inference import write_metadata_template
 
 
 class WaveDataUploader:
@@ -57,7 +62,10 @@ class WaveDataUploader:
         self._setup = Setup(self._config)
         self._loginInfo = LoginInfo('wave-login', self._config)
 
-        self._wave_connector = WaveConnector(self._loginInfo, self._setup.auth_url, self._setup.resource_url)
+        self._wave_connector = WaveConnector(self._loginInfo, self._setup.auth_url, self._setup.resource_url,
+                                             pool_size=self._setup.http_pool_size,
+                                             timeout=self._setup.http_timeout,
+                                             keep_alive=self._setup.http_keep_alive)
 
         self._producerConfigs = []
         for name in self._setup.producers:
@@ -65,47 +73,169 @@ class WaveDataUploader:
                 name.strip(), self._config, self._setup.rootPath, self._setup.dataFolder)
             self._producerConfigs.append(producerConfig)
 
+        if self._uploadMode == UPSERT_OPERATION:
+            self._check_upsert()
+        if self._uploadMode == 'Overwrite':
+            self._check_incremental()
+
+    def _check_upsert(self):
+        """
+        Fail before pulling anything if a dataset cannot be upserted.
+        """
+        for producerConfig in self._producerConfigs:
+            # rows known by their keys would be dropped even when their other columns changed
+            if producerConfig.rowDelta is not None and producerConfig.rowDelta.keyColumns:
+                exception_handler("Unable to upsert " + producerConfig.dataset,
+                                  Exception('row_delta_keys drops the changed rows, use row_delta alone'))
+            try:
+                uniqueId = checkUpsertMetadata(producerConfig.dataset)
+                Logger.logger.info('upsert %s by %s' % (producerConfig.dataset, uniqueId))
+            except Exception as e:
+                exception_handler("Unable to upsert " + producerConfig.dataset, e)
+
+    def _check_incremental(self):
+        """
+        Fail before pulling anything if an incremental extract would replace a whole dataset.
+        """
+        for producerConfig in self._producerConfigs:
+            if getattr(producerConfig.producer, 'watermark_column', None):
+                exception_handler("Unable to overwrite " + producerConfig.dataset,
+                                  Exception('watermark_column needs --append or --upsert'))
+
     def _waveUploader(self, loginInfo, dataset_id,  dataset, uploadMode, dataConfig, setup):
         """
         this method is a stub methd for tests
         """
         return WaveUploader(loginInfo, dataset_id, dataset, uploadMode, dataConfig, setup)
 
+    def _run_producer(self, producerConfig):
+        """
+        Pull the data of one producer and upload it into its dataset, between the open and
+        close hooks of the producer.
+        :param producerConfig: ProducerConfig of the producer
+        """
+        producer = producerConfig.producer
+        print(type(producer))
+        producer.open()
+        try:
+            self._upload_producer(producer, producerConfig)
+        finally:
+            producer.close()
+
+    def _upload_producer(self, producer, producerConfig):
+        waveUploader = self._waveUploader(
+            self._wave_connector,
+            producerConfig.data_id,
+            producerConfig.dataset,
+            self._uploadMode,
+            producerConfig.dataConfig,
+            self._setup)
+        # an interrupted upload is resumed from its manifest instead of pulling new data
+        if pendingUploads(producerConfig.dataConfig.dataFolder):
+            Logger.logger.info('resume unfinished upload of ' + producerConfig.dataset)
+        else:
+            subprocess.call(
+                    '/bin/rm -rf ' + producerConfig.dataConfig.dataFolder + "/*.csv", shell=True)
+            if producerConfig.pipeline:
+                # parts are uploaded while the producer is still extracting
+                Logger.logger.info('pull from ' + producer.name() + ' and upload dataset ' + producerConfig.dataset)
+                waveUploader.uploadStream(producer.stream(), producerConfig.data_id)
+                producer.commit()
+                return
+            Logger.logger.info('pull from ' + producer.name())
+            producer.pull(producerConfig.dataConfig.dataFolder)
+            if producerConfig.rowDelta is not None:
+                self._filter_delta(producerConfig)
+        if self._setup.infer_metadata:
+            self._infer_metadata(producerConfig)
+        Logger.logger.info('upload dataset ' + producerConfig.dataset)
+        waveUploader.uploadCsv(producerConfig.data_id)
+        producer.commit()
+        if producerConfig.rowDelta is not None:
+            producerConfig.rowDelta.commit()
+
+    def _infer_metadata(self, producerConfig):
+        """
+        Write a metadata template inferred from the pulled data if the dataset has none yet.
+        """
+        template = metadataTemplate(producerConfig.dataset)
+        if os.path.isfile(template):
+            return
+        dataFolder = producerConfig.dataConfig.dataFolder
+        csvFiles = sorted(dataFile for dataFile in os.listdir(dataFolder) if dataFile.endswith('.csv'))
+        if csvFiles:
+            write_metadata_template(os.path.join(dataFolder, csvFiles[0]), producerConfig.dataset, template)
+            Logger.logger.info('inferred metadata template ' + template)
+
+    def _filter_delta(self, producerConfig):
+        """
+        Remove the rows already sent to the dataset from the pulled csv files in Append and Upsert
+        mode, and the files left without rows. In Overwrite mode the files are kept whole and replace
+        the row index once uploaded.
+        """
+        rowDelta = producerConfig.rowDelta
+        rowDelta.discard_pending()
+        dataFolder = producerConfig.dataConfig.dataFolder
+        append = self._uploadMode != 'Overwrite'
+        for dataFile in sorted(os.listdir(dataFolder)):
+            if dataFile.endswith('.csv'):
+                kept, removed = rowDelta.filter(os.path.join(dataFolder, dataFile), append)
+                Logger.logger.info('%s: %d new rows, %d rows already sent' % (dataFile, kept, removed))
+                # a file without new rows is not uploaded
+                if append and kept == 0:
+                    os.remove(os.path.join(dataFolder, dataFile))
+
+    def _run_producer_safely(self, producerConfig):
+        """
+        Run one producer and report its failure instead of raising, so other producers keep going.
+        wave_common helpers exit on errors, that SystemExit is reported as a failure too.
+        :return: None for success, else the error
+        """
+        try:
+            self._run_producer(producerConfig)
+            return None
+        except (Exception, SystemExit) as e:
+            Logger.logger.error('producer %s failed: %r' % (producerConfig.name, e))
+            return e
+
     def execute(self):
         """
-        Execute the Health Service Upload by given an starting timestamp with int type
+        Execute the Health Service Upload by given an starting timestamp with int type.
+        Up to producer_concurrency producers run at the same time, each one in its own data folder.
         :return: True for running success, False for failure
         """
         try:
             self._wave_connector.login()
-            for producerConfig in self._producerConfigs:
-                producer = producerConfig.producer
-                print(type(producer))
-                subprocess.call(
-                        '/bin/rm -rf ' + producerConfig.dataConfig.dataFolder + "/*.csv", shell=True)
-                Logger.logger.info('pull from ' + producer.name())
-                producer.pull(producerConfig.dataConfig.dataFolder)
-                Logger.logger.info('upload dataset ' + producerConfig.dataset)
-                waveUploader = self._waveUploader(
-                    self._wave_connector,
-                    producerConfig.data_id,
-                    producerConfig.dataset,
-                    self._uploadMode,
-                    producerConfig.dataConfig,
-                    self._setup)
-                waveUploader.uploadCsv(producerConfig.data_id)
-            return True
+            with ThreadPoolExecutor(max_workers=max(1, self._setup.producer_concurrency)) as executor:
+                errors = list(executor.map(self._run_producer_safely, self._producerConfigs))
         except Exception as e:
             print(e)
             info = "Error while executing."
             exception_handler(info, e)
             return False
+        finally:
+            connection_pool.close_all()
+            Logger.logger.info('database connection pool: %s' % connection_pool.stats())
+
+        failed = []
+        for producerConfig, error in zip(self._producerConfigs, errors):
+            if error is None:
+                Logger.logger.info('producer %s succeeded' % producerConfig.name)
+            else:
+                Logger.logger.error('producer %s failed' % producerConfig.name)
+                failed.append(producerConfig.name)
+        if failed:
+            exception_handler("Error while executing.", Exception('failed producers: ' + ",".join(failed)))
+            return False
+        return True
 
 
 def main(arguments):
     if arguments:
         if arguments['--overwrite']:
             uploader = WaveDataUploader(arguments['<config_file>'], 'Overwrite')
+        elif arguments['--upsert']:
+            uploader = WaveDataUploader(arguments['<config_file>'], UPSERT_OPERATION)
         else:
             uploader = WaveDataUploader(arguments['<config_file>'], 'Append')
         uploader.execute()
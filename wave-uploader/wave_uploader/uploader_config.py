@@ -13,8 +13,10 @@ Redistribution and use in source and binary forms, with or without modification,
 THIS SOFTWARE IS PROVIDED BY THE COPYRIGHT HOLDERS AND CONTRIBUTORS "AS IS" AND ANY EXPRESS OR IMPLIED WARRANTIES, INCLUDING, BUT NOT LIMITED TO, THE IMPLIED WARRANTIES OF MERCHANTABILITY AND FITNESS FOR A PARTICULAR PURPOSE ARE DISCLAIMED. IN NO EVENT SHALL THE COPYRIGHT HOLDER OR CONTRIBUTORS BE LIABLE FOR ANY DIRECT, INDIRECT, INCIDENTAL, SPECIAL, EXEMPLARY, OR CONSEQUENTIAL DAMAGES (INCLUDING, BUT NOT LIMITED TO, PROCUREMENT OF SUBSTITUTE GOODS OR SERVICES; LOSS OF USE, DATA, OR PROFITS; OR BUSINESS INTERRUPTION) HOWEVER CAUSED AND ON ANY THEORY OF LIABILITY, WHETHER IN CONTRACT, STRICT LIABILITY, OR TORT (INCLUDING NEGLIGENCE OR OTHERWISE) ARISING IN ANY WAY OUT OF THE USE OF THIS SOFTWARE, EVEN IF ADVISED OF THE POSSIBILITY OF SUCH DAMAGE.
 """
 
-from wave_common.utils import import_class, validate_config, create_dirs
+from wave_common.utils import import_class, validate_config, create_dirs, exception_handler
 from dbconfig import DBConfig, create_db_config_from_config
+from data_uploader import NO_COMPRESSION, UPLOAD_COMPRESSIONS, BASE64_ENCODING, PART_ENCODINGS
+from row_delta import RowDeltaIndex
 import sys
 
 class ProducerConfig:
@@ -46,6 +48,28 @@ class ProducerConfig:
         print(type(self.producer).__name__)
         validate_config(self.__dict__)
 
+        # optional, upload while a StreamingWaveDataProducer is still producing
+        self.pipeline = config.getboolean(name, 'pipeline', fallback=False)
+        # optional, let postgres render the csv with COPY TO STDOUT when the producer supports it
+        if config.getboolean(name, 'copy_export', fallback=False):
+            self.producer.copy_export = True
+        # optional, extract the query in range slices of a numeric column on parallel connections
+        partition_column = config.get(name, 'partition_column', fallback=None)
+        if partition_column:
+            self.producer.partition_column = partition_column
+            self.producer.partitions = config.getint(name, 'partitions', fallback=4)
+        # optional, only extract the rows above the last uploaded value of this column
+        watermark_column = config.get(name, 'watermark_column', fallback=None)
+        if watermark_column:
+            self.producer.watermark_column = watermark_column
+            self.producer.watermark_file = self.dataConfig.watermarkFile
+        # optional, only append the rows which were not sent before, identified by all or the key columns
+        self.rowDelta = None
+        if config.getboolean(name, 'row_delta', fallback=False):
+            keys = config.get(name, 'row_delta_keys', fallback=None)
+            self.rowDelta = RowDeltaIndex(self.dataConfig.deltaFolder,
+                                          [key.strip() for key in keys.split(',')] if keys else None)
+
 class DataConfig:
     """
     User defined data set configuration info.
@@ -54,6 +78,10 @@ class DataConfig:
         self.dataFolder = rootpath + '/' + datafolder + '/' + producername + "/data"
         self.doneFolder = rootpath + '/' + datafolder + '/' + producername + '/done'
         self.errorFolder = rootpath + '/' + datafolder + '/' + producername + '/errors'
+        # index of the rows already sent to the dataset, for row level delta uploads
+        self.deltaFolder = rootpath + '/' + datafolder + '/' + producername + '/delta'
+        # last extracted value of the watermark column of an incremental producer
+        self.watermarkFile = rootpath + '/' + datafolder + '/' + producername + '/watermark'
         validate_config(self.__dict__)
         create_dirs(self.dataFolder)
         create_dirs(self.doneFolder)
@@ -74,3 +102,41 @@ class Setup:
         self.is_verify = config.get(setupSection, 'is_verify_upload')
 
         validate_config(self.__dict__)
+
+        # optional upload tuning, 1 keeps the parts strictly sequential
+        self.upload_concurrency = config.getint(setupSection, 'upload_concurrency', fallback=1)
+        # optional number of producers pulled and uploaded at the same time
+        self.producer_concurrency = config.getint(setupSection, 'producer_concurrency', fallback=1)
+        self.upload_retries = config.getint(setupSection, 'upload_retries', fallback=3)
+        # optional data part compression, gzip or none
+        self.upload_compression = config.get(setupSection, 'upload_compression', fallback=NO_COMPRESSION)
+        validate_choice('upload_compression', self.upload_compression, UPLOAD_COMPRESSIONS)
+        # optional data part encoding, base64 json bodies or raw multipart bodies
+        self.upload_part_encoding = config.get(setupSection, 'upload_part_encoding', fallback=BASE64_ENCODING)
+        validate_choice('upload_part_encoding', self.upload_part_encoding, PART_ENCODINGS)
+        # optional seconds to wait for Wave to process the uploaded jobs when is_verify_upload is true
+        self.verify_timeout = config.getint(setupSection, 'verify_timeout', fallback=3600)
+        # optional http transport settings shared by every Wave request, the pool fits all part workers
+        self.http_pool_size = config.getint(setupSection, 'http_pool_size', fallback=max(10, self.upload_concurrency * self.producer_concurrency))
+        self.http_timeout = config.getfloat(setupSection, 'http_timeout', fallback=300)
+        self.http_keep_alive = config.getboolean(setupSection, 'http_keep_alive', fallback=True)
+        # optional, do not upload csv files identical to the ones of the last successful upload
+        self.skip_unchanged = config.getboolean(setupSection, 'skip_unchanged', fallback=False)
+        if self.skip_unchanged and self.is_verify != 'true':
+            exception_handler("skip_unchanged needs is_verify_upload=true.", Exception("invalid value exception"))
+        # optional, write a metadata template inferred from the data for datasets without one
+        self.infer_metadata = config.getboolean(setupSection, 'infer_metadata', fallback=False)
+
+
+def validate_choice(key, value, choices):
+    """
+    Stop with a clear message when an optional setting is not one of its supported values.
+    :param key: name of the setting
+    :param value: configured value
+    :param choices: supported values
+    :return:
+    """
+    if value not in choices:
+        exception_handler(
+            "the %s %s is not one of %s." % (key, value, ', '.join(choices)),
+            Exception("invalid value exception"))
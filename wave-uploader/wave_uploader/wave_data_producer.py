@@ -14,10 +14,16 @@ THIS SOFTWARE IS PROVIDED BY THE COPYRIGHT HOLDERS AND CONTRIBUTORS "AS IS" AND
 """
 # -*- coding: utf-8 -*-
 
+import csv
+import io
 from abc import ABCMeta, abstractmethod, abstractproperty
+from wave_common.utils import create_timestamp_csv
 
 
 class WaveDataProducer:
+    # database producers export with COPY (query) TO STDOUT instead of fetching rows when true,
+    # set by copy_export=true in the producer section
+    copy_export = False
 
     @abstractmethod
     def pull(self, datafolder):
@@ -26,3 +32,59 @@ class WaveDataProducer:
     @property
     def name(self):
         pass
+
+    def open(self):
+        """
+        Called before the producer is pulled or streamed.
+        """
+        pass
+
+    def commit(self):
+        """
+        Called once the pulled data is uploaded, save the progress of incremental producers here.
+        """
+        pass
+
+    def close(self):
+        """
+        Called once the upload of the producer is done or failed, release borrowed connections here.
+        """
+        pass
+
+
+class StreamingWaveDataProducer(WaveDataProducer):
+    """
+    A producer which yields its csv content in chunks, so the upload can start while the
+    data is still being extracted. Enable it with pipeline=true in the producer section.
+    """
+
+    @abstractmethod
+    def stream(self):
+        """
+        :return: generator of csv bytes chunks, header first
+        """
+        pass
+
+    def pull(self, datafolder):
+        file_name = create_timestamp_csv(datafolder)
+        with open(file_name, 'wb') as output_file:
+            for chunk in self.stream():
+                output_file.write(chunk)
+
+
+def csv_chunks(header, batches):
+    """
+    Encode batches of rows into csv bytes chunks, one chunk for the header and one per batch.
+    :param header: list of column names
+    :param batches: iterable of lists of rows
+    :return: generator of bytes
+    """
+    buffer = io.StringIO()
+    writer = csv.writer(buffer, delimiter=',')
+    writer.writerow(header)
+    yield buffer.getvalue().encode('utf-8')
+    for rows in batches:
+        buffer.seek(0)
+        buffer.truncate()
+        writer.writerows(rows)
+        yield buffer.getvalue().encode('utf-8')
@@ -14,9 +14,11 @@ THIS SOFTWARE IS PROVIDED BY THE COPYRIGHT HOLDERS AND CONTRIBUTORS "AS IS" AND
 """
 
 # -*- coding: utf-8 -*-
-from wave_common.db_connector import DatabaseConnector
+from wave_common.db_connector import DatabaseConnector, DatabaseConnectionPool
 
 import mock
+import os
+import tempfile
 import unittest
 from pgdb import Error
 
@@ -85,6 +87,76 @@ class DbConnectorTestSuite(unittest.TestCase):
         db_connector = DatabaseConnector(self.mock_database_config)
         db_connector.execute_query("fake-query-failure")
 
+    @mock.patch('wave_common.db_connector.connect')
+    def test_stream_query(self, mock_connect):
+        mock_cursor = mock.Mock()
+        mock_connect.return_value.cursor.return_value = mock_cursor
+        mock_cursor.description = [("col1",), ("col2",)]
+        mock_cursor.fetchall.side_effect = [[("r1c1", "r1c2"), ("r2c1", "r2c2")], [("r3c1", "r3c2")], []]
+        db_connector = DatabaseConnector(self.mock_database_config)
+
+        batches, header = db_connector.stream_query("select 1", batch_size=2, params={"low": 1})
+        self.assertEqual(header, ["col1", "col2"])
+        self.assertEqual(list(batches), [[("r1c1", "r1c2"), ("r2c1", "r2c2")], [("r3c1", "r3c2")]])
+        statements = [c[0][0] for c in mock_cursor.execute.call_args_list]
+        self.assertEqual(mock_cursor.execute.call_args_list[0][0][1], {"low": 1})
+        self.assertTrue(statements[0].startswith("DECLARE wave_stream_"))
+        self.assertTrue(statements[0].endswith(" NO SCROLL CURSOR FOR select 1"))
+        self.assertTrue(statements[1].startswith("FETCH FORWARD 2 FROM wave_stream_"))
+        self.assertTrue(statements[-1].startswith("CLOSE wave_stream_"))
+        mock_connect.return_value.commit.assert_called_once()
+
+        #executing query with failure
+        with self.assertRaises(SystemExit) as cm:
+            mock_cursor.execute.side_effect = Error("mock exception")
+            db_connector.stream_query("fake-query-failure")
+        self.assertEqual(cm.exception.code, 1)
+
+    @mock.patch('wave_common.db_connector.connect')
+    def test_copy_query_to_file(self, mock_connect):
+        mock_cursor = mock.Mock()
+        mock_connect.return_value.cursor.return_value = mock_cursor
+        mock_cursor.description = [("col1",), ("col2",)]
+        mock_cursor.rowcount = 2
+
+        def copy_to(stream, table, format=None, decode=None):
+            stream.write("r1c1,r1c2\n")
+            stream.write("r2c1,r2c2\n")
+        mock_cursor.copy_to.side_effect = copy_to
+        db_connector = DatabaseConnector(self.mock_database_config)
+        file_name = os.path.join(tempfile.mkdtemp(), "export.csv")
+
+        self.assertEqual(db_connector.copy_query_to_file("select 1;", file_name), 2)
+        with open(file_name) as f:
+            self.assertEqual(f.read(), "col1,col2\nr1c1,r1c2\nr2c1,r2c2\n")
+        mock_cursor.execute.assert_called_once_with("select * from (select 1) wave_export limit 0")
+        mock_cursor.copy_to.assert_called_once_with(mock.ANY, "select * from (select 1) wave_export",
+                                                    format='csv', decode=True)
+
+        # an explicit header skips the column lookup
+        mock_cursor.execute.reset_mock()
+        db_connector.copy_query_to_file("select 1", file_name, header=["Period"])
+        mock_cursor.execute.assert_not_called()
+        with open(file_name) as f:
+            self.assertEqual(f.readline(), "Period\n")
+
+        # parameters are bound into a temporary view, COPY takes none
+        mock_cursor.execute.reset_mock()
+        db_connector.copy_query_to_file("select 1 where a > %(low)s", file_name, header=["a"], params={"low": 1})
+        statements = [c[0] for c in mock_cursor.execute.call_args_list]
+        self.assertTrue(statements[0][0].startswith("CREATE TEMPORARY VIEW wave_export_"))
+        self.assertTrue(statements[0][0].endswith(" AS select * from (select 1 where a > %(low)s) wave_export"))
+        self.assertEqual(statements[0][1], {"low": 1})
+        self.assertTrue(statements[1][0].startswith("DROP VIEW wave_export_"))
+        self.assertTrue(mock_cursor.copy_to.call_args[0][1].startswith("select * from wave_export_"))
+        os.remove(file_name)
+
+        #exporting with failure
+        with self.assertRaises(SystemExit) as cm:
+            mock_cursor.copy_to.side_effect = Error("mock exception")
+            db_connector.copy_query_to_file("fake-query-failure", file_name)
+        self.assertEqual(cm.exception.code, 1)
+
     @mock.patch('wave_common.db_connector.connect')
     def test_execute_insertOrUpdate(self, mock_connect):
         #connecting to database
@@ -110,5 +182,61 @@ class DbConnectorTestSuite(unittest.TestCase):
         db_connector = DatabaseConnector(self.mock_database_config)
         db_connector.execute_insertOrUpdate("fake-query-failure")
 
+class DatabaseConnectionPoolTestSuite(unittest.TestCase):
+    def setUp(self):
+        self.mock_database_config = mock.Mock(hostname="hostname",
+                                                 database="database",
+                                                 username="username",
+                                                 password="password",
+                                                 timeout=5)
+        self.other_database_config = mock.Mock(hostname="hostname",
+                                                  database="other",
+                                                  username="username",
+                                                  password="password",
+                                                  timeout=5)
+
+    @mock.patch('wave_common.db_connector.connect')
+    def test_connections_are_reused(self, mock_connect):
+        mock_connect.side_effect = lambda **kwargs: mock.Mock(closed=False)
+        pool = DatabaseConnectionPool(pool_size=1)
+
+        with pool.connection(self.mock_database_config) as first:
+            pass
+        with pool.connection(self.mock_database_config) as second:
+            self.assertIs(second, first)
+            self.assertEqual(pool.stats()['in_use'], 1)
+        first._conn.commit.assert_called()
+
+        # another database section gets its own connection
+        with pool.connection(self.other_database_config) as other:
+            self.assertIsNot(other, first)
+        self.assertEqual(mock_connect.call_count, 2)
+        self.assertEqual(pool.stats(), {'created': 2, 'reused': 1, 'released': 3, 'discarded': 0,
+                                        'closed': 0, 'in_use': 0, 'idle': 2})
+
+        pool.close_all()
+        first._conn.close.assert_called_once()
+        self.assertEqual(pool.stats()['idle'], 0)
+        self.assertEqual(pool.stats()['closed'], 2)
+
+    @mock.patch('wave_common.db_connector.connect')
+    def test_full_or_broken_connections_are_discarded(self, mock_connect):
+        mock_connect.side_effect = lambda **kwargs: mock.Mock(closed=False)
+        pool = DatabaseConnectionPool(pool_size=1)
+
+        first = pool.acquire(self.mock_database_config)
+        second = pool.acquire(self.mock_database_config)
+        pool.release(self.mock_database_config, first)
+        pool.release(self.mock_database_config, second)
+        second._conn.close.assert_called_once()
+
+        broken = pool.acquire(self.mock_database_config)
+        broken._conn.commit.side_effect = Error("connection lost")
+        pool.release(self.mock_database_config, broken)
+        stats = pool.stats()
+        self.assertEqual(stats['discarded'], 2)
+        self.assertEqual(stats['idle'], 0)
+        self.assertEqual(stats['in_use'], 0)
+
 if __name__ == '__main__':
     unittest.main()
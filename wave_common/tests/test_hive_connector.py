@@ -0,0 +1,104 @@
+"""
+Copyright (c) 2018, Salesforce.com, Inc.
+All rights reserved.
+
+Redistribution and use in source and binary forms, with or without modification, are permitted provided that the following conditions are met:
+
+* Redistributions of source code must retain the above copyright notice, this list of conditions and the following disclaimer.
+
+* Redistributions in binary form must reproduce the above copyright notice, this list of conditions and the following disclaimer in the documentation and/or other materials provided with the distribution.
+
+* Neither the name of Salesforce.com nor the names of its contributors may be used to endorse or promote products derived from this software without specific prior written permission.
+
+THIS SOFTWARE IS PROVIDED BY THE COPYRIGHT HOLDERS AND CONTRIBUTORS "AS IS" AND ANY EXPRESS OR IMPLIED WARRANTIES, INCLUDING, BUT NOT LIMITED TO, THE IMPLIED WARRANTIES OF MERCHANTABILITY AND FITNESS FOR A PARTICULAR PURPOSE ARE DISCLAIMED. IN NO EVENT SHALL THE COPYRIGHT HOLDER OR CONTRIBUTORS BE LIABLE FOR ANY DIRECT, INDIRECT, INCIDENTAL, SPECIAL, EXEMPLARY, OR CONSEQUENTIAL DAMAGES (INCLUDING, BUT NOT LIMITED TO, PROCUREMENT OF SUBSTITUTE GOODS OR SERVICES; LOSS OF USE, DATA, OR PROFITS; OR BUSINESS INTERRUPTION) HOWEVER CAUSED AND ON ANY THEORY OF LIABILITY, WHETHER IN CONTRACT, STRICT LIABILITY, OR TORT (INCLUDING NEGLIGENCE OR OTHERWISE) ARISING IN ANY WAY OUT OF THE USE OF THIS SOFTWARE, EVEN IF ADVISED OF THE POSSIBILITY OF SUCH DAMAGE.
+"""
+
+# -*- coding: utf-8 -*-
+
+# -*- coding: utf-8 -*-
+from wave_common.hive_connector import HiveConnector
+
+import mock
+import os
+import shutil
+import tempfile
+import unittest
+from pyhive import hive
+
+STATE = hive.ttypes.TOperationState
+
+
+def fake_status(state):
+    return mock.Mock(operationState=state)
+
+
+class HiveConnectorTestSuite(unittest.TestCase):
+    def setUp(self):
+        self.mock_database_config = mock.Mock(hostname="hostname",
+                                                 database="database",
+                                                 username="username",
+                                                 password="password",
+                                                 timeout=5)
+        self.tmp_dir = tempfile.mkdtemp()
+
+    def tearDown(self):
+        shutil.rmtree(self.tmp_dir)
+
+    @mock.patch('wave_common.hive_connector.hive.Connection')
+    def test_stream_query(self, mock_connection):
+        mock_cursor = mock_connection.return_value.cursor.return_value
+        mock_cursor.poll.side_effect = [fake_status(STATE.RUNNING_STATE), fake_status(STATE.FINISHED_STATE)]
+        mock_cursor.description = [("col1",), ("col2",)]
+        mock_cursor.fetchmany.side_effect = [[(1, 2), (3, 4)], [(5, 6)], []]
+        connector = HiveConnector(self.mock_database_config)
+
+        batches, header = connector.stream_query("select 1", batch_size=2, poll_interval=0)
+        self.assertEqual(header, ["col1", "col2"])
+        self.assertEqual(list(batches), [[(1, 2), (3, 4)], [(5, 6)]])
+        mock_cursor.execute.assert_called_once_with("select 1", None, async_=True)
+        mock_cursor.fetchmany.assert_called_with(2)
+        self.assertEqual(mock_cursor.poll.call_count, 2)
+
+    @mock.patch('wave_common.hive_connector.hive.Connection')
+    def test_wait_for_failure(self, mock_connection):
+        mock_cursor = mock_connection.return_value.cursor.return_value
+        connector = HiveConnector(self.mock_database_config)
+
+        # the query failed on the server
+        mock_cursor.poll.return_value = fake_status(STATE.ERROR_STATE)
+        with self.assertRaises(SystemExit) as cm:
+            connector.wait_for(connector.submit_query("select 1"), poll_interval=0)
+        self.assertEqual(cm.exception.code, 1)
+
+        # the query is cancelled once it runs too long
+        mock_cursor.poll.return_value = fake_status(STATE.RUNNING_STATE)
+        with self.assertRaises(SystemExit):
+            connector.wait_for(connector.submit_query("select 1"), poll_interval=0, timeout=-1)
+        mock_cursor.cancel.assert_called_once()
+
+    @mock.patch('wave_common.hive_connector.hive.Connection')
+    def test_pull_partitions(self, mock_connection):
+        def cursor():
+            mock_cursor = mock.Mock()
+            mock_cursor.poll.return_value = fake_status(STATE.FINISHED_STATE)
+            mock_cursor.description = [("ds",), ("value",)]
+
+            def execute(query, params, async_=False):
+                mock_cursor.fetchmany.side_effect = [[(params['partition'], 1)], []]
+            mock_cursor.execute.side_effect = execute
+            return mock_cursor
+        mock_connection.return_value.cursor.side_effect = cursor
+        connector = HiveConnector(self.mock_database_config)
+        file_name = os.path.join(self.tmp_dir, "pull.csv")
+
+        count = connector.pull_partitions("select ds, value from t where ds = %(partition)s",
+                                          ["2020-01-01", "2020-01-02", "2020-01-03"], file_name, max_workers=2)
+        self.assertEqual(count, 3)
+        # one connection per partition besides the one of the connector
+        self.assertEqual(mock_connection.call_count, 4)
+        with open(file_name) as f:
+            self.assertEqual(f.read(), "ds,value\n2020-01-01,1\n2020-01-02,1\n2020-01-03,1\n")
+        self.assertEqual(os.listdir(self.tmp_dir), ["pull.csv"])
+
+if __name__ == '__main__':
+    unittest.main()
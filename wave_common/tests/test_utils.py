@@ -239,5 +239,13 @@ class UtilsTestSuite(unittest.TestCase):
         self.assertEquals(file_content[2], "2.1,2.2,2.3")
         self.assertEquals(file_content[3], "3.1,3.2,3.3")
 
+    def test_save_batches_as_csv(self):
+        file_name = self.tmp_dir + "/batches.csv"
+        batches = iter([[[1.1, 1.2], [2.1, 2.2]], [[3.1, 3.2]]])
+        self.assertEqual(utils.save_batches_as_csv(file_name, ["col1", "col2"], batches), 3)
+        with open(file_name, 'r') as csv_file:
+            file_content = [row.strip() for row in csv_file]
+        self.assertEqual(file_content, ["col1,col2", "1.1,1.2", "2.1,2.2", "3.1,3.2"])
+
 if __name__ == '__main__':
     unittest.main()
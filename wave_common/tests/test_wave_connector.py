@@ -216,6 +216,24 @@ class WaveConnectorTestSuite(unittest.TestCase):
         self.assertEqual(cm.exception.code, 1)
 
 
+    @mock.patch('wave_common.wave_connector.requests.Session.request')
+    def test_send_request(self, mock_request):
+        wave_connector = WaveConnector(self.mock_login_config, "http://test.com", "/resource", pool_size=4, timeout=30)
+        adapter = wave_connector._session.get_adapter("https://fake_url")
+        self.assertEqual(adapter._pool_maxsize, 4)
+
+        mock_request.return_value.status_code = 200
+        result = wave_connector.send_request("POST", "https://fake_url/part", data=b"fake-data")
+        self.assertEqual(result.status_code, 200)
+        mock_request.assert_called_once_with("POST", "https://fake_url/part", data=b"fake-data", timeout=30)
+
+        wave_connector.send_request("GET", "https://fake_url/status", timeout=5)
+        self.assertEqual(mock_request.call_args[1]["timeout"], 5)
+
+    def test_no_keep_alive(self):
+        wave_connector = WaveConnector(self.mock_login_config, "http://test.com", "/resource", keep_alive=False)
+        self.assertEqual(wave_connector._session.headers["Connection"], "close")
+
     @mock.patch('wave_common.wave_connector.requests.post')
     # @mock.patch('shd.wave_connector.requests.Session.get')
     def test_fetch_data_by_name(self, mock_post):
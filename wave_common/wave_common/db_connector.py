@@ -13,15 +13,25 @@ Redistribution and use in source and binary forms, with or without modification,
 THIS SOFTWARE IS PROVIDED BY THE COPYRIGHT HOLDERS AND CONTRIBUTORS "AS IS" AND ANY EXPRESS OR IMPLIED WARRANTIES, INCLUDING, BUT NOT LIMITED TO, THE IMPLIED WARRANTIES OF MERCHANTABILITY AND FITNESS FOR A PARTICULAR PURPOSE ARE DISCLAIMED. IN NO EVENT SHALL THE COPYRIGHT HOLDER OR CONTRIBUTORS BE LIABLE FOR ANY DIRECT, INDIRECT, INCIDENTAL, SPECIAL, EXEMPLARY, OR CONSEQUENTIAL DAMAGES (INCLUDING, BUT NOT LIMITED TO, PROCUREMENT OF SUBSTITUTE GOODS OR SERVICES; LOSS OF USE, DATA, OR PROFITS; OR BUSINESS INTERRUPTION) HOWEVER CAUSED AND ON ANY THEORY OF LIABILITY, WHETHER IN CONTRACT, STRICT LIABILITY, OR TORT (INCLUDING NEGLIGENCE OR OTHERWISE) ARISING IN ANY WAY OUT OF THE USE OF THIS SOFTWARE, EVEN IF ADVISED OF THE POSSIBILITY OF SUCH DAMAGE.
 """
 from pgdb import connect
+from contextlib import contextmanager
+import csv
+import itertools
 import sys
+import threading
 from .utils import exception_handler
 from .core_logger import Logger
 from sqlalchemy.orm import sessionmaker
 
+DEFAULT_FETCH_SIZE = 10000
+# idle connections kept per database config
+DEFAULT_POOL_SIZE = 4
+
 """
 This module provides the database connector and multiple methods with postgres.
 """
 class DatabaseConnector(object):
+    _cursor_ids = itertools.count()
+
     def __init__(self, database_config):
         self._logger = Logger.logger
         self._dbConfig = database_config
@@ -61,17 +71,18 @@ class DatabaseConnector(object):
         """
         return self._conn.cursor()
 
-    def execute_query(self, sql_query):
+    def execute_query(self, sql_query, params=None):
         """
         This method is used to execute the sql query and return results.
         :param sql_query: type str
+        :param params: optional dict of parameters bound to the %(name)s placeholders of the query
         :return: rows and header
         """
         if self._conn:
             self._logger.info("executing sql query")
             cur = self.get_cursor()
             try:
-                cur.execute(sql_query)
+                cur.execute(sql_query, params)
                 res = cur.fetchall()
                 self._logger.info("executing done")
                 return res, [col[0] for col in cur.description]
@@ -81,6 +92,87 @@ class DatabaseConnector(object):
         else:
             self._logger.error("PGDB not connected!")
 
+    def stream_query(self, sql_query, batch_size=DEFAULT_FETCH_SIZE, params=None):
+        """
+        This method is used to execute the sql query with a server side cursor. Rows are
+        fetched batch_size at a time, so the whole result is never held in memory.
+        :param sql_query: type str
+        :param batch_size: rows per fetch, type int
+        :param params: optional dict of parameters bound to the %(name)s placeholders of the query
+        :return: generator of row batches and header
+        """
+        if self._conn:
+            self._logger.info("executing sql query with server side cursor")
+            cursor_name = "wave_stream_%d" % next(self._cursor_ids)
+            cur = self.get_cursor()
+            try:
+                cur.execute("DECLARE " + cursor_name + " NO SCROLL CURSOR FOR " + sql_query, params)
+                fetch = "FETCH FORWARD %d FROM %s" % (batch_size, cursor_name)
+                cur.execute(fetch)
+                header = [col[0] for col in cur.description]
+                first = cur.fetchall()
+            except Exception as e:
+                info = "Unable to execute the query!"
+                exception_handler(info, e)
+            return self._fetch_batches(cur, cursor_name, fetch, first), header
+        else:
+            self._logger.error("PGDB not connected!")
+
+    def _fetch_batches(self, cur, cursor_name, fetch, batch):
+        """
+        Yield the batches of a server side cursor until it is exhausted, then close it.
+        """
+        try:
+            while batch:
+                yield batch
+                cur.execute(fetch)
+                batch = cur.fetchall()
+            cur.execute("CLOSE " + cursor_name)
+            self._conn.commit()
+            self._logger.info("executing done")
+        except Exception as e:
+            info = "Unable to fetch the query results!"
+            exception_handler(info, e)
+
+    def copy_query_to_file(self, sql_query, file_name, header=None, params=None):
+        """
+        This method is used to export the query result as csv with COPY (query) TO STDOUT,
+        so postgres renders the csv and the rows are streamed straight into the file.
+        :param sql_query: type str
+        :param file_name: csv file to write, type str
+        :param header: list of column names written as the first line, the query columns if None
+        :param params: optional dict of parameters bound to the %(name)s placeholders of the query
+        :return: number of rows written
+        """
+        if self._conn:
+            self._logger.info("exporting sql query with copy")
+            query = "select * from (" + sql_query.strip().rstrip(";") + ") wave_export"
+            cur = self.get_cursor()
+            try:
+                if params:
+                    # COPY takes no parameters, so they are bound into a temporary view
+                    view_name = "wave_export_%d" % next(self._cursor_ids)
+                    cur.execute("CREATE TEMPORARY VIEW " + view_name + " AS " + query, params)
+                    query = "select * from " + view_name
+                if header is None:
+                    cur.execute(query + " limit 0")
+                    header = [col[0] for col in cur.description]
+                with open(file_name, "w", newline="") as csv_file:
+                    csv.writer(csv_file, delimiter=',', lineterminator='\n').writerow(header)
+                    cur.copy_to(csv_file, query, format='csv', decode=True)
+                rowcount = cur.rowcount
+                if params:
+                    # the connection goes back to the pool, so the view must not outlive the export
+                    cur.execute("DROP VIEW " + view_name)
+                self._conn.commit()
+                self._logger.info("exporting done")
+                return rowcount
+            except Exception as e:
+                info = "Unable to export the query!"
+                exception_handler(info, e)
+        else:
+            self._logger.error("PGDB not connected!")
+
     def execute_insertOrUpdate(self, sql_query):
         if self._conn:
             try:
@@ -91,6 +183,18 @@ class DatabaseConnector(object):
         else:
             self._logger.error("PGDB not connected!")
 
+    def is_connected(self):
+        """
+        :return: True if the connection is open
+        """
+        return bool(self._conn) and not getattr(self._conn, 'closed', False)
+
+    def commit(self):
+        """
+        Commit the open transaction, errors are raised to the caller.
+        """
+        self._conn.commit()
+
     def commit_and_close(self):
         if self._conn:
             try:
@@ -100,3 +204,107 @@ class DatabaseConnector(object):
                 exception_handler(info, e)
         else:
             self._logger.error("PGDB not connected!")
+
+
+class DatabaseConnectionPool(object):
+    """
+    This class keeps warm DatabaseConnectors keyed by database config. Producers reading the
+    same database section share the idle connections instead of connecting on their own.
+    """
+
+    def __init__(self, pool_size=DEFAULT_POOL_SIZE):
+        """
+        :param pool_size: idle connections kept per database config, type int
+        """
+        self._logger = Logger.logger
+        self._pool_size = pool_size
+        self._lock = threading.Lock()
+        self._idle = {}
+        self._stats = {'created': 0, 'reused': 0, 'released': 0, 'discarded': 0, 'closed': 0, 'in_use': 0}
+
+    @staticmethod
+    def _key(database_config):
+        return (database_config.hostname, database_config.database, database_config.username,
+                database_config.password)
+
+    def acquire(self, database_config):
+        """
+        Borrow a connector for the database config, connecting only if no idle one is left.
+        :param database_config: DBConfig
+        :return: DatabaseConnector
+        """
+        with self._lock:
+            idle = self._idle.get(self._key(database_config), [])
+            connector = idle.pop() if idle else None
+            self._stats['in_use'] += 1
+            if connector is not None:
+                self._stats['reused'] += 1
+                return connector
+            self._stats['created'] += 1
+        try:
+            return DatabaseConnector(database_config)
+        except BaseException:
+            with self._lock:
+                self._stats['in_use'] -= 1
+            raise
+
+    def release(self, database_config, connector):
+        """
+        Return a borrowed connector. Its transaction is committed and it is kept for the next
+        producer, unless the connection is gone or the pool for the config is full.
+        :param database_config: DBConfig
+        :param connector: DatabaseConnector
+        """
+        keep = connector.is_connected()
+        if keep:
+            try:
+                connector.commit()
+            except Exception as e:
+                self._logger.warning("dropping database connection: %s" % e)
+                keep = False
+        with self._lock:
+            self._stats['in_use'] -= 1
+            idle = self._idle.setdefault(self._key(database_config), [])
+            if keep and len(idle) < self._pool_size:
+                idle.append(connector)
+                self._stats['released'] += 1
+                return
+            self._stats['discarded'] += 1
+        if connector.is_connected():
+            connector.commit_and_close()
+
+    @contextmanager
+    def connection(self, database_config):
+        """
+        Borrow a connector for the duration of a with block.
+        :param database_config: DBConfig
+        """
+        connector = self.acquire(database_config)
+        try:
+            yield connector
+        finally:
+            self.release(database_config, connector)
+
+    def close_all(self):
+        """
+        Close every idle connection, borrowed ones are closed when they are released.
+        """
+        with self._lock:
+            idle = [connector for connectors in self._idle.values() for connector in connectors]
+            self._idle = {}
+            self._stats['closed'] += len(idle)
+        for connector in idle:
+            connector.commit_and_close()
+
+    def stats(self):
+        """
+        :return: dict of pool counters, idle is the number of warm connections kept right now
+        """
+        with self._lock:
+            stats = dict(self._stats)
+            stats['idle'] = sum(len(connectors) for connectors in self._idle.values())
+            return stats
+
+
+# pool shared by all the producers of a process
+connection_pool = DatabaseConnectionPool()
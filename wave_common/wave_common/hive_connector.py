@@ -17,13 +17,24 @@ THIS SOFTWARE IS PROVIDED BY THE COPYRIGHT HOLDERS AND CONTRIBUTORS "AS IS" AND
 
 
 from pyhive import hive
+from concurrent.futures import ThreadPoolExecutor
+import os
 import sys
-from utils import exception_handler
-from core_logger import Logger
+import time
+from .utils import exception_handler, save_batches_as_csv, stitch_csv_files
+from .core_logger import Logger
 
 
 HIVE_PORT = 10000
 AUTH = "LDAP"
+DEFAULT_FETCH_SIZE = 10000
+# seconds between two status polls of an asynchronous query
+POLL_INTERVAL = 5
+# partitions pulled at the same time, each one on its own connection
+DEFAULT_PARTITION_WORKERS = 4
+
+_STATE = hive.ttypes.TOperationState
+_RUNNING_STATES = (_STATE.INITIALIZED_STATE, _STATE.PENDING_STATE, _STATE.RUNNING_STATE)
 
 """
 This module provides the database connector and multiple methods with hive.
@@ -81,3 +92,117 @@ class HiveConnector(object):
                 exception_handler(info, e)
         else:
             self._logger.error("PGDB not connected!")
+
+    def submit_query(self, sql_query, params=None):
+        """
+        This method is used to submit the sql query without waiting for its result.
+        :param sql_query: type str
+        :param params: optional dict of parameters bound to the %(name)s placeholders of the query
+        :return: the cursor of the running query
+        """
+        cur = self.get_cursor()
+        try:
+            cur.execute(sql_query, params, async_=True)
+            return cur
+        except Exception as e:
+            info = "Unable to submit the query!"
+            exception_handler(info, e)
+
+    def wait_for(self, cur, poll_interval=POLL_INTERVAL, timeout=None):
+        """
+        This method is used to poll the status of a submitted query until it is finished.
+        :param cur: cursor returned by submit_query
+        :param poll_interval: seconds between two polls
+        :param timeout: optional seconds after which the query is cancelled
+        :return: the cursor, ready to be fetched
+        """
+        started = time.time()
+        try:
+            state = cur.poll().operationState
+            while state in _RUNNING_STATES:
+                if timeout is not None and time.time() - started > timeout:
+                    cur.cancel()
+                    raise Exception("query timed out after %d seconds" % timeout)
+                time.sleep(poll_interval)
+                state = cur.poll().operationState
+            if state != _STATE.FINISHED_STATE:
+                raise Exception("query ended in state " + _STATE._VALUES_TO_NAMES.get(state, str(state)))
+            return cur
+        except Exception as e:
+            info = "Unable to execute the query!"
+            exception_handler(info, e)
+
+    def stream_query(self, sql_query, batch_size=DEFAULT_FETCH_SIZE, params=None, poll_interval=POLL_INTERVAL):
+        """
+        This method is used to run the sql query asynchronously and fetch its rows batch_size
+        at a time, so the whole result is never held in memory.
+        :param sql_query: type str
+        :param batch_size: rows per fetch, type int
+        :param params: optional dict of parameters bound to the %(name)s placeholders of the query
+        :param poll_interval: seconds between two status polls
+        :return: generator of row batches and header
+        """
+        if self.conn:
+            self._logger.info("executing sql query")
+            cur = self.wait_for(self.submit_query(sql_query, params), poll_interval)
+            return self._fetch_batches(cur, batch_size), [desc[0] for desc in cur.description]
+        else:
+            self._logger.error("Hive not connected!")
+
+    def _fetch_batches(self, cur, batch_size):
+        """
+        Yield the fetchmany batches of a finished query until it is exhausted.
+        """
+        try:
+            batch = cur.fetchmany(batch_size)
+            while batch:
+                yield batch
+                batch = cur.fetchmany(batch_size)
+            cur.close()
+            self._logger.info("executing done")
+        except Exception as e:
+            info = "Unable to fetch the query results!"
+            exception_handler(info, e)
+
+    def pull_partitions(self, sql_query, partitions, file_name, header=None,
+                        max_workers=DEFAULT_PARTITION_WORKERS, batch_size=DEFAULT_FETCH_SIZE):
+        """
+        This method is used to run the sql query once per partition, concurrently on separate
+        connections, and merge the results into one csv file in partition order.
+        :param sql_query: query with a %(partition)s placeholder, e.g. "... where ds = %(partition)s"
+        :param partitions: list of partition values, each one bound to %(partition)s
+        :param file_name: csv file to write, type str
+        :param header: list of column names, the query columns if None
+        :param max_workers: partitions pulled at the same time
+        :param batch_size: rows per fetch, type int
+        :return: number of rows written
+        """
+        partition_files = [file_name + '.partition%d' % i for i in range(len(partitions))]
+        try:
+            with ThreadPoolExecutor(max_workers=max(1, min(max_workers, len(partitions)))) as executor:
+                futures = [executor.submit(self._pull_partition, sql_query, partition, partition_file,
+                                           header, batch_size)
+                           for partition, partition_file in zip(partitions, partition_files)]
+                count = sum(future.result() for future in futures)
+            stitch_csv_files(partition_files, file_name)
+            return count
+        finally:
+            for partition_file in partition_files:
+                if os.path.exists(partition_file):
+                    os.remove(partition_file)
+
+    def _pull_partition(self, sql_query, partition, file_name, header, batch_size):
+        """
+        Pull one partition into its own csv file on a new connection.
+        """
+        self._logger.info("pulling partition " + str(partition))
+        connector = HiveConnector(self.dbConfig)
+        try:
+            [batches, columns] = connector.stream_query(sql_query, batch_size, params={'partition': partition})
+            return save_batches_as_csv(file_name, header or columns, batches)
+        finally:
+            connector.close()
+
+    def close(self):
+        if self.conn:
+            self.conn.close()
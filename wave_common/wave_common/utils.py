@@ -353,4 +353,37 @@ def save_as_csv(file_name, header, rows):
         writer.writerow(header)
         for row in rows:
             # print(row)
-            writer.writerow(row)
\ No newline at end of file
+            writer.writerow(row)
+
+def save_batches_as_csv(file_name, header, batches):
+    """
+    Write the header and row batches into a csv file one batch at a time, so only the
+    current batch is held in memory.
+    :param file_name: type str
+    :param header: list of column names
+    :param batches: iterable of lists of rows
+    :return: number of rows written
+    """
+    count = 0
+    with open(file_name, "w") as csv_file:
+        writer = csv.writer(csv_file, delimiter=',')
+        writer.writerow(header)
+        for rows in batches:
+            writer.writerows(rows)
+            count += len(rows)
+    return count
+
+def stitch_csv_files(slice_files, file_name):
+    """
+    Concatenate csv slice files into one csv file with a single header line, removing the slices.
+    :param slice_files: csv files starting with the same header line
+    :param file_name: target csv file
+    """
+    with open(file_name, 'wb') as output_file:
+        for i, slice_file in enumerate(slice_files):
+            with open(slice_file, 'rb') as input_file:
+                header = input_file.readline()
+                if i == 0:
+                    output_file.write(header)
+                shutil.copyfileobj(input_file, output_file)
+            os.remove(slice_file)
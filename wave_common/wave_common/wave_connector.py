@@ -15,27 +15,39 @@ THIS SOFTWARE IS PROVIDED BY THE COPYRIGHT HOLDERS AND CONTRIBUTORS "AS IS" AND
 import urllib
 
 import requests
+from requests.adapters import HTTPAdapter
 from .utils import check_response, exception_handler, Logger
 from .core_logger import Logger
 import json
 
 
+DEFAULT_POOL_SIZE = 10
+
 """
 This module provides the connector and multiple methods with Wave Analytics.
 """
 class WaveConnector(object):
 
-    def __init__(self, login_config, auth_url, resource_url):
+    def __init__(self, login_config, auth_url, resource_url, pool_size=DEFAULT_POOL_SIZE, timeout=None, keep_alive=True):
         """
         :param login_config: login config object
         :param dashboard_config: dashboard config object
+        :param pool_size: max pooled connections kept per host
+        :param timeout: seconds to wait for the server, None waits forever
+        :param keep_alive: reuse connections between requests
         """
         self._logger = Logger.logger
         self.login_config = login_config
         self._auth_url = auth_url
         self._resource_url = resource_url
         self._api_url = ""
+        self._timeout = timeout
         self._session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=pool_size, pool_maxsize=pool_size)
+        self._session.mount('https://', adapter)
+        self._session.mount('http://', adapter)
+        if not keep_alive:
+            self._session.headers.update({'Connection': 'close'})
         self._access_token = None
 
     def login(self):
@@ -69,6 +81,17 @@ class WaveConnector(object):
     def get_api_url(self):
         return self._api_url
 
+    def send_request(self, method, url, **kwargs):
+        """
+        Send a request through the pooled session, so callers reuse warm connections.
+        The configured timeout applies unless one is given.
+        :param method: http method, type str
+        :param url: full request url, type str
+        :return: requests http response
+        """
+        kwargs.setdefault('timeout', self._timeout)
+        return self._session.request(method, url, **kwargs)
+
     def _request_url(self):
         return self.get_api_url() + self._resource_url
 
@@ -185,7 +208,7 @@ class WaveConnector(object):
     def postInsightsExternalData(self, json_obj):
             try:
                 print(self._request_external_data_url())
-                response = self._session.post(self._request_external_data_url(), json=json_obj)
+                response = self._session.post(self._request_external_data_url(), json=json_obj, timeout=self._timeout)
                 insight_object_parent_id = ""
                 content = response.content
                 # print(str(content))